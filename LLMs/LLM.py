@@ -4,7 +4,13 @@ import re
 import torch
 
 from utils.logger import setup_logger
-from constants.constants import LLM_LOG_FILE, LLM_LOG_NAME, CLEANING_PROMPT
+from utils.metrics import get_metrics
+from constants.constants import (LLM_LOG_FILE, LLM_LOG_NAME, CLEANING_PROMPT, METRIC_PROMPT_TOKENS,
+                                 METRIC_COMPLETION_TOKENS, METRIC_CLEANING_PROMPT_TOKENS,
+                                 METRIC_CLEANING_COMPLETION_TOKENS, DEFAULT_LLM_BATCH_SIZE)
+
+# Regular expression to match specific tags and their content (up to 20 characters)
+TAGS_PATTERN = re.compile(r'<(ROUND|RANK|PLAYER)>.{0,20}?</\1>', re.DOTALL)
 
 
 class LLM(ABC):
@@ -25,6 +31,7 @@ class LLM(ABC):
         self.token = token
         self.device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
         self.__logger = setup_logger(LLM_LOG_NAME, LLM_LOG_FILE)
+        self.__metrics = get_metrics()
         self.__logger.info(f"LLM initialized with model: {model_name} on device: {self.device}")
 
     @abstractmethod
@@ -43,6 +50,37 @@ class LLM(ABC):
         """
         pass
 
+    def record_tokens(self, prompt_tokens: int, completion_tokens: int, cleaning: bool = False) -> None:
+        """
+        Record the number of prompt and completion tokens of a generation in the competition metrics. The tokens of
+        the cleaning pass are counted apart, so the completion tokens are the tokens of the documents generated.
+
+        :param prompt_tokens: Number of tokens in the prompt.
+        :param completion_tokens: Number of generated tokens.
+        :param cleaning: Whether the generation is a cleaning pass (a generation with clean set to False).
+        """
+        self.__metrics.increment(METRIC_CLEANING_PROMPT_TOKENS if cleaning else METRIC_PROMPT_TOKENS, prompt_tokens,
+                                 model=self.model_name)
+        self.__metrics.increment(METRIC_CLEANING_COMPLETION_TOKENS if cleaning else METRIC_COMPLETION_TOKENS,
+                                 completion_tokens, model=self.model_name)
+
+    def generate_batch(self, prompts: list, max_tokens: int, clean: bool = True, force_max_tokens: bool = False,
+                       batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> list:
+        """
+        Generate documents for several prompts. Backends that can decode several sequences together override this
+        method; by default every prompt is generated on its own.
+
+        :param prompts: List of (user prompt, system prompt) tuples.
+        :param max_tokens: Maximum number of tokens for the generated documents.
+        :param clean: Whether to clean the documents of extraneous text or not.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated documents.
+        :param batch_size: Number of sequences decoded together, for backends that batch their inputs.
+
+        :return: List of the results of generate_prompt, one per prompt.
+        """
+        return [self.generate_prompt(user, system, max_tokens, clean=clean, force_max_tokens=force_max_tokens)
+                for user, system in prompts]
+
     def clean_document(self, doc: str, max_tokens: int, model=None) -> str:
         """
         Clean the generated document to remove unnecessary prompts and tags.
@@ -59,20 +97,51 @@ class LLM(ABC):
             # Generate the cleaned document using the LLM
             cleaned_document = model.generate_prompt(doc, CLEANING_PROMPT, max_tokens, clean=False)
 
-            # Regular expression to match and remove specific tags and their content (up to 20 characters)
-            pattern = re.compile(r'<(ROUND|RANK|PLAYER)>.{0,20}?</\1>', re.DOTALL)
-            cleaned_document = re.sub(pattern, '', cleaned_document)
+            return self.__strip_tags(cleaned_document)
+        except Exception as e:
+            self.__logger.error(f"Error cleaning document: {e}")
+            raise
+
+    def clean_documents(self, docs: list, max_tokens: int, model=None,
+                        batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> list:
+        """
+        Clean several generated documents, running the cleaning pass of all of them through generate_batch.
 
-            # Remove specific tags and strip extra whitespace
-            cleaned_document = (
-                cleaned_document.replace("<DOC>", "")
-                .replace("<TEXT>", "")
-                .replace("</DOC>", "")
-                .replace("</TEXT>", "")
-                .strip()
-            )
+        :param docs: List of raw generated documents.
+        :param max_tokens: Maximum number of tokens allowed for the cleaned documents.
+        :param model: Instance of the LLM model used for generating the cleaned documents.
+        :param batch_size: Number of sequences decoded together.
+        :return: List of cleaned document texts.
+        """
+        if model is None:
+            self.__logger.error("Model not provided for document cleaning.")
+            raise ValueError("Model must be provided to clean the document.")
+        try:
+            # Generate the cleaned documents using the LLM
+            cleaned_documents = model.generate_batch([(doc, CLEANING_PROMPT) for doc in docs], max_tokens,
+                                                     clean=False, batch_size=batch_size)
 
-            return cleaned_document
+            return [self.__strip_tags(cleaned_document) for cleaned_document in cleaned_documents]
         except Exception as e:
-            self.__logger.error(f"Error cleaning document: {e}")
+            self.__logger.error(f"Error cleaning documents: {e}")
             raise
+
+    @staticmethod
+    def __strip_tags(cleaned_document: str) -> str:
+        """
+        Remove the leftover competition tags from a cleaned document.
+
+        :param cleaned_document: Document returned by the cleaning pass.
+        :return: Document text without tags and surrounding whitespace.
+        """
+        # Remove the tags that carry content (round, rank and player)
+        cleaned_document = re.sub(TAGS_PATTERN, '', cleaned_document)
+
+        # Remove specific tags and strip extra whitespace
+        return (
+            cleaned_document.replace("<DOC>", "")
+            .replace("<TEXT>", "")
+            .replace("</DOC>", "")
+            .replace("</TEXT>", "")
+            .strip()
+        )
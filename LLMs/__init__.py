@@ -2,6 +2,9 @@
 
 from .hugging_face_llm import HuggingFaceLLM
 from .mlx_llm import MLXLLM
+from .served_llm import ServedLLM
+from .partitioned_llm import PartitionedLLM
+from .managed_llm import ManagedLLM
 from .LLM import LLM
 
-__all__ = ['LLM', "HuggingFaceLLM", "MLXLLM"]
+__all__ = ['LLM', "HuggingFaceLLM", "MLXLLM", "ServedLLM", "PartitionedLLM", "ManagedLLM"]
@@ -0,0 +1,476 @@
+import argparse
+import os
+import threading
+from concurrent.futures import Future
+
+import torch
+import transformers
+
+from utils.logger import setup_logger
+from utils.resources import parse_cores, pin_current_thread
+from utils.service import ServiceClient, serve, resolve_authkey
+from constants.constants import (GENERATION_SERVER_LOG_FILE, GENERATION_SERVER_LOG_NAME,
+                                 DEFAULT_GENERATION_SERVER_MAX_BATCH_SIZE, GENERATION_SERVER_AUTHKEY_ENV,
+                                 DEFAULT_GENERATION_SERVER_PORT, LOCAL_HOST)
+
+# In-process servers shared by every agent of the process, by model name
+SERVERS = {}
+SERVERS_LOCK = threading.Lock()
+
+
+class Sequence:
+    """
+        A generation request taking part in the running batch.
+    """
+
+    def __init__(self, prompt_ids: list, max_new_tokens: int, temperature: float, top_p: float, top_k: int):
+        """
+        Initialize the Sequence.
+
+        :param prompt_ids: Token IDs of the prompt.
+        :param max_new_tokens: Maximum number of tokens to generate.
+        :param temperature: Sampling temperature, greedy decoding if not positive.
+        :param top_p: Nucleus sampling probability mass.
+        :param top_k: Number of most likely tokens sampled from, all of them if 0.
+        """
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.top_k = top_k
+        self.generated = []
+        self.future = Future()
+
+
+class GenerationServer:
+    """
+        Class responsible for serving the generations of a Hugging Face model to every player and game of a process
+        with continuous (iteration-level) batching. A background thread decodes one token for every sequence of the
+        running batch at each step; finished sequences leave the batch and waiting requests join it at the next
+        step, so the model stays busy whatever the lengths of the prompts and of the completions.
+    """
+
+    def __init__(self, model_name: str, token: str = None,
+                 max_batch_size: int = DEFAULT_GENERATION_SERVER_MAX_BATCH_SIZE, cores=None, threads: int = None):
+        """
+        Initialize the GenerationServer and start its decoding thread.
+
+        :param model_name: Name of the model to serve.
+        :param token: Token to use for the model.
+        :param max_batch_size: Maximum number of sequences decoded together.
+        :param cores: Core set the decoding thread is pinned to (e.g. "0-3"), all cores if not provided.
+        :param threads: Number of torch threads of the decoding thread (the number of cores if not provided).
+        """
+        self.model_name = model_name
+        self.__max_batch_size = max_batch_size
+        self.__cores = parse_cores(cores) if cores is not None else None
+        self.__threads = threads
+        self.__logger = setup_logger(GENERATION_SERVER_LOG_NAME, GENERATION_SERVER_LOG_FILE)
+
+        try:
+            self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_name, token=token)
+            self.__model = transformers.AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.bfloat16,
+                                                                              device_map="auto", token=token)
+            self.__model.eval()
+        except Exception as e:
+            self.__logger.error(f"Error initializing generation server model: {e}")
+            raise
+
+        generation_config = self.__model.generation_config
+        eos_token_ids = generation_config.eos_token_id
+        eos_token_ids = eos_token_ids if isinstance(eos_token_ids, list) else [eos_token_ids]
+        self.__eos_token_ids = {token_id for token_id in eos_token_ids + [self.tokenizer.eos_token_id]
+                                if token_id is not None}
+        self.default_top_p = generation_config.top_p if generation_config.top_p is not None else 1.0
+        self.default_top_k = generation_config.top_k or 0
+
+        # Running batch: sequences, left-padded attention mask, key/value cache, next input tokens and positions
+        self.__sequences = []
+        self.__attention_mask = None
+        self.__cache = None
+        self.__next_tokens = None
+        self.__positions = None
+
+        self.__waiting = []
+        self.__closed = False
+        self.__condition = threading.Condition()
+        self.__tokenizer_lock = threading.Lock()
+        self.__thread = threading.Thread(target=self.__run, name=f"generation-server-{model_name}", daemon=True)
+        self.__thread.start()
+        self.__logger.info(f"Generation server started for model: {model_name}, batch size: {max_batch_size}")
+
+    def submit(self, messages: list, max_new_tokens: int, temperature: float, top_p: float = None,
+               top_k: int = None) -> Future:
+        """
+        Queue a generation; it joins the running batch at the next decoding step with a free slot.
+        The chat template is applied in the calling thread, so a template error is raised here.
+
+        :param messages: Messages of the prompt.
+        :param max_new_tokens: Maximum number of tokens to generate.
+        :param temperature: Sampling temperature, greedy decoding if not positive.
+        :param top_p: Nucleus sampling probability mass, the model's default if not provided.
+        :param top_k: Number of most likely tokens sampled from, the model's default if not provided.
+        :return: Future of the (generated text, prompt tokens, completion tokens) tuple.
+        """
+        with self.__tokenizer_lock:
+            prompt_ids = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True)
+        if isinstance(prompt_ids, dict) or hasattr(prompt_ids, "input_ids"):
+            prompt_ids = prompt_ids["input_ids"]
+        sequence = Sequence(list(prompt_ids), max_new_tokens, temperature,
+                            self.default_top_p if top_p is None else top_p,
+                            self.default_top_k if top_k is None else top_k)
+
+        with self.__condition:
+            if self.__closed:
+                raise RuntimeError(f"The generation server of {self.model_name} is closed.")
+            self.__waiting.append(sequence)
+            self.__condition.notify()
+        return sequence.future
+
+    def generate(self, messages: list, max_new_tokens: int, temperature: float, top_p: float = None,
+                 top_k: int = None) -> tuple:
+        """
+        Generate a text and wait for it.
+
+        :param messages: Messages of the prompt.
+        :param max_new_tokens: Maximum number of tokens to generate.
+        :param temperature: Sampling temperature, greedy decoding if not positive.
+        :param top_p: Nucleus sampling probability mass, the model's default if not provided.
+        :param top_k: Number of most likely tokens sampled from, the model's default if not provided.
+        :return: Tuple of the generated text, prompt tokens and completion tokens.
+        """
+        return self.submit(messages, max_new_tokens, temperature, top_p, top_k).result()
+
+    def close(self) -> None:
+        """
+        Stop the decoding thread; the requests still waiting or running are failed.
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+        self.__thread.join()
+        self.__logger.info(f"Generation server of {self.model_name} closed.")
+
+    def __run(self) -> None:
+        """
+        Decoding loop: admit the waiting requests into the free slots of the batch, then decode one token for every
+        running sequence.
+        """
+        if self.__cores or self.__threads:
+            try:
+                pin_current_thread(self.__cores, self.__threads)
+            except OSError as e:
+                self.__logger.warning(f"Decoding thread of {self.model_name} runs on every core: {e}")
+
+        while True:
+            with self.__condition:
+                while not self.__waiting and not self.__sequences and not self.__closed:
+                    self.__condition.wait()
+                if self.__closed:
+                    break
+                admitted = self.__waiting[:self.__max_batch_size - len(self.__sequences)]
+                del self.__waiting[:len(admitted)]
+
+            try:
+                with torch.inference_mode():
+                    if admitted:
+                        self.__prefill(admitted)
+                    if self.__sequences:
+                        self.__decode()
+            except Exception as e:
+                self.__logger.error(f"Error in generation server step: {e}")
+                self.__fail(admitted + self.__sequences, e)
+                self.__reset()
+
+        with self.__condition:
+            waiting, self.__waiting = self.__waiting, []
+        self.__fail(waiting + self.__sequences, RuntimeError(f"The generation server of {self.model_name} is closed."))
+        self.__reset()
+
+    def __prefill(self, sequences: list) -> None:
+        """
+        Process the prompts of the admitted sequences, sample their first token and merge them into the batch.
+
+        :param sequences: Admitted sequences.
+        """
+        length = max(len(sequence.prompt_ids) for sequence in sequences)
+        pad_token_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else \
+            next(iter(self.__eos_token_ids))
+        input_ids = torch.tensor([[pad_token_id] * (length - len(sequence.prompt_ids)) + sequence.prompt_ids
+                                  for sequence in sequences], device=self.__model.device)
+        attention_mask = torch.tensor([[0] * (length - len(sequence.prompt_ids)) + [1] * len(sequence.prompt_ids)
+                                       for sequence in sequences], device=self.__model.device)
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+
+        outputs = self.__model(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                               use_cache=True)
+        next_tokens = self.__sample(outputs.logits[:, -1, :], sequences)
+        cache = self.__to_legacy(outputs.past_key_values)
+        positions = attention_mask.sum(-1)
+
+        if self.__sequences:
+            # Align both batches on the right, padding the shorter one on the left
+            width = max(self.__attention_mask.shape[1], length)
+            self.__attention_mask = torch.cat([self.__pad(self.__attention_mask, width),
+                                               self.__pad(attention_mask, width)])
+            self.__cache = tuple(tuple(torch.cat([self.__pad(running, width), self.__pad(new, width)])
+                                       for running, new in zip(running_layer, new_layer))
+                                 for running_layer, new_layer in zip(self.__cache, cache))
+            self.__next_tokens = torch.cat([self.__next_tokens, next_tokens])
+            self.__positions = torch.cat([self.__positions, positions])
+        else:
+            self.__attention_mask, self.__cache = attention_mask, cache
+            self.__next_tokens, self.__positions = next_tokens, positions
+        self.__sequences += sequences
+
+        self.__collect(next_tokens.tolist(), len(self.__sequences) - len(sequences))
+
+    def __decode(self) -> None:
+        """
+        Decode one token for every sequence of the batch.
+        """
+        self.__attention_mask = torch.cat(
+            [self.__attention_mask, self.__attention_mask.new_ones((len(self.__sequences), 1))], dim=-1)
+        outputs = self.__model(input_ids=self.__next_tokens[:, None], attention_mask=self.__attention_mask,
+                               position_ids=self.__positions[:, None], past_key_values=self.__from_legacy(self.__cache),
+                               use_cache=True)
+        self.__cache = self.__to_legacy(outputs.past_key_values)
+        self.__next_tokens = self.__sample(outputs.logits[:, -1, :], self.__sequences)
+        self.__positions = self.__positions + 1
+
+        self.__collect(self.__next_tokens.tolist(), 0)
+
+    def __collect(self, tokens: list, offset: int) -> None:
+        """
+        Append the sampled tokens to their sequences, then resolve the finished sequences and remove them from the
+        batch.
+
+        :param tokens: Sampled tokens, for the sequences of the batch from offset on.
+        :param offset: Position in the batch of the first sequence of the tokens.
+        """
+        finished = []
+        for index, token in enumerate(tokens, start=offset):
+            sequence = self.__sequences[index]
+            if token in self.__eos_token_ids:
+                finished.append(index)
+                continue
+            sequence.generated.append(token)
+            if len(sequence.generated) >= sequence.max_new_tokens:
+                finished.append(index)
+
+        if not finished:
+            return
+
+        for index in finished:
+            sequence = self.__sequences[index]
+            with self.__tokenizer_lock:
+                text = self.tokenizer.decode(sequence.generated, skip_special_tokens=True)
+            sequence.future.set_result((text, len(sequence.prompt_ids), len(sequence.generated)))
+
+        finished = set(finished)
+        keep = [index for index in range(len(self.__sequences)) if index not in finished]
+        if not keep:
+            self.__reset()
+            return
+
+        keep_index = torch.tensor(keep, device=self.__attention_mask.device)
+        self.__sequences = [self.__sequences[index] for index in keep]
+        self.__attention_mask = self.__attention_mask.index_select(0, keep_index)
+        self.__next_tokens = self.__next_tokens.index_select(0, keep_index)
+        self.__positions = self.__positions.index_select(0, keep_index)
+
+        # Drop the columns that only pad the remaining sequences
+        start = int(self.__attention_mask.any(0).int().argmax())
+        self.__attention_mask = self.__attention_mask[:, start:]
+        self.__cache = tuple(tuple(tensor.index_select(0, keep_index)[:, :, start:] for tensor in layer)
+                             for layer in self.__cache)
+
+    @staticmethod
+    def __sample(logits: torch.Tensor, sequences: list) -> torch.Tensor:
+        """
+        Sample the next token of every sequence with its own temperature, top-p and top-k.
+
+        :param logits: Logits of the next token, one row per sequence.
+        :param sequences: Sequences of the rows.
+        :return: Tensor of the sampled tokens.
+        """
+        logits = logits.float()
+        greedy = logits.argmax(-1)
+        temperatures = torch.tensor([sequence.temperature for sequence in sequences], device=logits.device)
+        if not bool((temperatures > 0).any()):
+            return greedy
+
+        probabilities = torch.softmax(logits / temperatures.clamp(min=1e-5)[:, None], dim=-1)
+        sorted_probabilities, sorted_tokens = probabilities.sort(dim=-1, descending=True)
+        top_p = torch.tensor([sequence.top_p for sequence in sequences], device=logits.device)
+        top_k = torch.tensor([sequence.top_k or logits.shape[-1] for sequence in sequences], device=logits.device)
+        ranks = torch.arange(logits.shape[-1], device=logits.device)[None, :]
+        removed = ((sorted_probabilities.cumsum(-1) - sorted_probabilities) > top_p[:, None]) | \
+                  (ranks >= top_k[:, None])
+        sorted_probabilities = sorted_probabilities.masked_fill(removed, 0.0)
+        sampled = sorted_tokens.gather(-1, torch.multinomial(sorted_probabilities, 1)).squeeze(-1)
+        return torch.where(temperatures > 0, sampled, greedy)
+
+    @staticmethod
+    def __pad(tensor: torch.Tensor, width: int) -> torch.Tensor:
+        """
+        Pad a mask (batch, length) or a cache tensor (batch, heads, length, dim) on the left up to width positions.
+
+        :param tensor: Tensor to pad.
+        :param width: Length to pad to.
+        :return: Padded tensor.
+        """
+        dim = 1 if tensor.dim() == 2 else 2
+        missing = width - tensor.shape[dim]
+        if missing == 0:
+            return tensor
+        shape = list(tensor.shape)
+        shape[dim] = missing
+        return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+    @staticmethod
+    def __to_legacy(cache) -> tuple:
+        """
+        Get the (key, value) tensors of every layer of a model cache.
+
+        :param cache: Cache returned by the model.
+        :return: Tuple of (key, value) tuples, one per layer.
+        """
+        if hasattr(cache, "to_legacy_cache"):
+            return cache.to_legacy_cache()
+        if hasattr(cache, "layers"):
+            return tuple((layer.keys, layer.values) for layer in cache.layers)
+        return cache
+
+    @staticmethod
+    def __from_legacy(cache: tuple):
+        """
+        Build the model cache of the (key, value) tensors of every layer.
+
+        :param cache: Tuple of (key, value) tuples, one per layer.
+        :return: Cache to pass to the model.
+        """
+        if hasattr(transformers.DynamicCache, "from_legacy_cache"):
+            return transformers.DynamicCache.from_legacy_cache(cache)
+        return transformers.DynamicCache(cache)
+
+    @staticmethod
+    def __fail(sequences: list, error: Exception) -> None:
+        for sequence in sequences:
+            if not sequence.future.done():
+                sequence.future.set_exception(error)
+
+    def __reset(self) -> None:
+        self.__sequences = []
+        self.__attention_mask, self.__cache, self.__next_tokens, self.__positions = None, None, None, None
+
+
+class GenerationClient(ServiceClient):
+    """
+        Client of a generation server listening on a local socket, with the generate interface of GenerationServer.
+        Every thread uses a connection of its own, so the requests of concurrent players are batched by the server.
+    """
+
+    def __init__(self, address: str, authkey: str = None):
+        """
+        Initialize the GenerationClient.
+
+        :param address: Address of the server, as host:port.
+        :param authkey: Authentication key of the server, the GENERATION_SERVER_AUTHKEY_ENV environment variable if
+                        not provided.
+        """
+        super().__init__(address, resolve_authkey(authkey, GENERATION_SERVER_AUTHKEY_ENV))
+
+    def generate(self, messages: list, max_new_tokens: int, temperature: float, top_p: float = None,
+                 top_k: int = None) -> tuple:
+        """
+        Generate a text on the server and wait for it.
+
+        :param messages: Messages of the prompt.
+        :param max_new_tokens: Maximum number of tokens to generate.
+        :param temperature: Sampling temperature, greedy decoding if not positive.
+        :param top_p: Nucleus sampling probability mass, the model's default if not provided.
+        :param top_k: Number of most likely tokens sampled from, the model's default if not provided.
+        :return: Tuple of the generated text, prompt tokens and completion tokens.
+        """
+        return self.request(messages, max_new_tokens, temperature, top_p, top_k)
+
+
+def get_generation_server(model_name: str, token: str = None,
+                          max_batch_size: int = DEFAULT_GENERATION_SERVER_MAX_BATCH_SIZE, cores=None,
+                          threads: int = None) -> GenerationServer:
+    """
+    Get the in-process generation server of a model, starting it on first use, so every agent using the model
+    shares its batch.
+
+    :param model_name: Name of the model.
+    :param token: Token to use for the model.
+    :param max_batch_size: Maximum number of sequences decoded together, used when the server is started.
+    :param cores: Core set of the decoding thread, used when the server is started.
+    :param threads: Number of torch threads of the decoding thread, used when the server is started.
+    :return: GenerationServer of the model.
+    """
+    with SERVERS_LOCK:
+        if model_name not in SERVERS:
+            SERVERS[model_name] = GenerationServer(model_name, token, max_batch_size, cores, threads)
+        return SERVERS[model_name]
+
+
+def close_generation_servers() -> None:
+    """
+    Close the in-process generation servers.
+    """
+    with SERVERS_LOCK:
+        servers = list(SERVERS.values())
+        SERVERS.clear()
+    for server in servers:
+        server.close()
+
+
+def serve_generation(server: GenerationServer, address: str, authkey: str = None) -> None:
+    """
+    Serve a generation server on a local socket until interrupted; the requests of all the connections share the
+    running batch.
+
+    :param server: GenerationServer to serve.
+    :param address: Address to listen on, as host:port.
+    :param authkey: Authentication key of the clients, the GENERATION_SERVER_AUTHKEY_ENV environment variable if not
+                    provided.
+    """
+    try:
+        serve(address, resolve_authkey(authkey, GENERATION_SERVER_AUTHKEY_ENV), server.generate,
+              setup_logger(GENERATION_SERVER_LOG_NAME, GENERATION_SERVER_LOG_FILE),
+              f"Generation server of {server.model_name}")
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a model with continuous batching on a local socket")
+    parser.add_argument("--model_name", type=str, required=True, help="Name of the Hugging Face model to serve")
+    parser.add_argument("--address", type=str, default=f"{LOCAL_HOST}:{DEFAULT_GENERATION_SERVER_PORT}",
+                        help="Address to listen on, as host:port")
+    parser.add_argument("--token", type=str, default=None, help="Token to use for the model")
+    parser.add_argument("--max_batch_size", type=int, default=DEFAULT_GENERATION_SERVER_MAX_BATCH_SIZE,
+                        help="Maximum number of sequences decoded together")
+    parser.add_argument("--authkey", type=str, default=None,
+                        help=f"Authentication key of the clients (the {GENERATION_SERVER_AUTHKEY_ENV} environment "
+                             f"variable by default)")
+    parser.add_argument("--cores", type=str, default=None, help="Cores of the decoding thread (e.g. 0-7)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Torch threads of the decoding thread (the number of cores by default)")
+    parser.add_argument("--log_folder", type=str, default=".", help="Folder of the server logs")
+    args = parser.parse_args()
+
+    from utils.logger import set_competition_hash_folder
+    os.makedirs(args.log_folder, exist_ok=True)
+    set_competition_hash_folder(args.log_folder)
+
+    # Checked before loading the model
+    authkey = resolve_authkey(args.authkey, GENERATION_SERVER_AUTHKEY_ENV)
+    serve_generation(GenerationServer(args.model_name, args.token, args.max_batch_size, args.cores, args.threads),
+                     args.address, authkey)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,9 @@ import torch
 
 from LLMs.LLM import LLM
 from utils.logger import setup_logger
-from constants.constants import HUGGING_FACE_LLM_LOG_FILE, HUGGING_FACE_LLM_LOG_NAME
+from utils.metrics import get_metrics
+from constants.constants import (HUGGING_FACE_LLM_LOG_FILE, HUGGING_FACE_LLM_LOG_NAME, STAGE_GENERATION,
+                                 STAGE_CLEANING, STAGE_TRIMMING, DEFAULT_LLM_BATCH_SIZE)
 
 
 class HuggingFaceLLM(LLM):
@@ -25,6 +27,7 @@ class HuggingFaceLLM(LLM):
         self.__generate_flags = kwargs
 
         self.__logger = setup_logger(HUGGING_FACE_LLM_LOG_NAME, HUGGING_FACE_LLM_LOG_FILE)
+        self.__metrics = get_metrics()
         self.__logger.info(f"Hugging Face LLM model initialized successfully with model: {model_name}")
 
         try:
@@ -33,6 +36,11 @@ class HuggingFaceLLM(LLM):
                                                  model_kwargs={"torch_dtype": torch.bfloat16}, device_map="auto",
                                                  token=self.token)
             self.__tokenizer = transformers.AutoTokenizer.from_pretrained(self.model_name)
+
+            # Batched generation pads the prompts on the left, with the end-of-sequence token if there is no padding
+            if self.__model.tokenizer.pad_token is None:
+                self.__model.tokenizer.pad_token = self.__model.tokenizer.eos_token
+            self.__model.tokenizer.padding_side = "left"
         except Exception as e:
             self.__logger.error(f"Error initializing hugging face model: {e}")
             raise
@@ -57,20 +65,25 @@ class HuggingFaceLLM(LLM):
                 {"role": "user", "content": user}
             ]
 
-            # Generate text based on device type
-            try:
-                result = self.__model(messages, max_new_tokens=max_tokens, temperature=self.temperature, do_sample=True,
-                                      **self.__generate_flags)[0]['generated_text'][-1]["content"]
-            except Exception as e:
-                # Modify the messages for the second attempt
-                messages = [{"role": "user", "content": f"{system} {user}"}]
-
+            # Generate text based on device type (the cleaning pass is accounted as its own stage)
+            with self.__metrics.timer(STAGE_GENERATION if clean else STAGE_CLEANING, model=self.model_name):
                 try:
                     result = self.__model(messages, max_new_tokens=max_tokens, temperature=self.temperature,
                                           do_sample=True, **self.__generate_flags)[0]['generated_text'][-1]["content"]
                 except Exception as e:
-                    self.__logger.error(f"Error in generating prompt on second attempt: {e}")
-                    raise
+                    # Modify the messages for the second attempt
+                    messages = [{"role": "user", "content": f"{system} {user}"}]
+
+                    try:
+                        result = self.__model(messages, max_new_tokens=max_tokens, temperature=self.temperature,
+                                              do_sample=True,
+                                              **self.__generate_flags)[0]['generated_text'][-1]["content"]
+                    except Exception as e:
+                        self.__logger.error(f"Error in generating prompt on second attempt: {e}")
+                        raise
+
+            if self.__metrics.enabled:
+                self.__record_tokens(messages, result, cleaning=not clean)
 
             # Clean the generated document
             if clean:
@@ -78,7 +91,8 @@ class HuggingFaceLLM(LLM):
 
                 # Trim the generated document to max_tokens length
                 if force_max_tokens:
-                    cleaned_result = self.__trim_tokens(cleaned_result, max_tokens)
+                    with self.__metrics.timer(STAGE_TRIMMING, model=self.model_name):
+                        cleaned_result = self.__trim_tokens(cleaned_result, max_tokens)
 
                 return cleaned_result, result
             else:
@@ -87,6 +101,74 @@ class HuggingFaceLLM(LLM):
             self.__logger.error(f"Error in generating prompt: {e}")
             raise
 
+    def generate_batch(self, prompts: list, max_tokens: int, clean: bool = True, force_max_tokens: bool = False,
+                       batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> list:
+        """
+        Generate documents for several prompts, decoding up to batch_size sequences together.
+
+        :param prompts: List of (user prompt, system prompt) tuples.
+        :param max_tokens: Maximum number of tokens for the generated documents.
+        :param clean: Whether to clean the documents of extraneous text or not.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated documents.
+        :param batch_size: Number of sequences decoded together.
+
+        :return: List of (cleaned document, generated document) tuples, or of generated documents when clean is False.
+        """
+        try:
+            # Construct the message structures
+            conversations = [[{"role": "system", "content": system}, {"role": "user", "content": user}]
+                             for user, system in prompts]
+
+            # Generate the texts (the cleaning pass is accounted as its own stage)
+            with self.__metrics.timer(STAGE_GENERATION if clean else STAGE_CLEANING, model=self.model_name):
+                try:
+                    outputs = self.__model(conversations, batch_size=batch_size, max_new_tokens=max_tokens,
+                                           temperature=self.temperature, do_sample=True, **self.__generate_flags)
+                except Exception as e:
+                    # Modify the messages for the second attempt
+                    conversations = [[{"role": "user", "content": f"{system} {user}"}] for user, system in prompts]
+
+                    try:
+                        outputs = self.__model(conversations, batch_size=batch_size, max_new_tokens=max_tokens,
+                                               temperature=self.temperature, do_sample=True, **self.__generate_flags)
+                    except Exception as e:
+                        self.__logger.error(f"Error in generating batch on second attempt: {e}")
+                        raise
+
+            results = [output[0]['generated_text'][-1]["content"] for output in outputs]
+
+            if self.__metrics.enabled:
+                for messages, result in zip(conversations, results):
+                    self.__record_tokens(messages, result, cleaning=not clean)
+
+            if not clean:
+                return results
+
+            # Clean the generated documents together
+            cleaned_results = self.clean_documents(results, max_tokens, self, batch_size=batch_size)
+
+            # Trim the generated documents to max_tokens length
+            if force_max_tokens:
+                with self.__metrics.timer(STAGE_TRIMMING, model=self.model_name):
+                    cleaned_results = [self.__trim_tokens(cleaned_result, max_tokens)
+                                       for cleaned_result in cleaned_results]
+
+            return list(zip(cleaned_results, results))
+        except Exception as e:
+            self.__logger.error(f"Error in generating batch: {e}")
+            raise
+
+    def __record_tokens(self, messages: list, result: str, cleaning: bool = False) -> None:
+        """
+        Record the prompt and completion tokens of a generation in the competition metrics.
+
+        :param messages: Messages of the prompt.
+        :param result: Generated text.
+        :param cleaning: Whether the generation is a cleaning pass.
+        """
+        self.record_tokens(len(self.__tokenizer.apply_chat_template(messages, add_generation_prompt=True)),
+                           len(self.__tokenizer.encode(result, add_special_tokens=False)), cleaning)
+
     def __trim_tokens(self, input_string: str, max_tokens: int) -> str:
         """
         Trims the input string to ensure that it contains no more than max_tokens tokens.
@@ -0,0 +1,63 @@
+from LLMs.LLM import LLM
+from LLMs.model_manager import ModelManager
+from utils.logger import setup_logger
+from constants.constants import MANAGED_LLM_LOG_FILE, MANAGED_LLM_LOG_NAME, DEFAULT_LLM_BATCH_SIZE
+
+
+class ManagedLLM(LLM):
+    """
+        ManagedLLM class for generating text with an LLM loaded on demand by the model manager, which may unload it
+        between generations to keep the resident models within its memory budget. Managed LLMs of the same model and
+        generation settings share one loaded copy. Inherits from the base LLM class.
+    """
+
+    def __init__(self, manager: ModelManager, model_name: str, temperature: float, token: str, loader: callable,
+                 memory_gb: float = None, settings: dict = None):
+        """
+        Initialize the ManagedLLM, without loading its model.
+
+        :param manager: Model manager loading the model.
+        :param model_name: Name of the model to use for text generation.
+        :param temperature: Temperature parameter for controlling randomness in generation.
+        :param token: Token to use for the model.
+        :param loader: Function building the LLM generating the documents.
+        :param memory_gb: Memory of the loaded model in GB, estimated from its weight files if not provided.
+        :param settings: Generation settings of the loaded LLM; managed LLMs of the same model and settings share it.
+        """
+        super().__init__(model_name, temperature, token)
+        self.__manager = manager
+        self.__entry = manager.register(model_name, loader, memory_gb, token, settings)
+        self.__logger = setup_logger(MANAGED_LLM_LOG_NAME, MANAGED_LLM_LOG_FILE)
+        self.__logger.info(f"Managed LLM registered with model: {model_name}")
+
+    def generate_prompt(self, user: str, system: str, max_tokens: int, clean: bool = True,
+                        force_max_tokens: bool = False) -> str:
+        """
+        Generate a text document based on user and system prompts, loading the model first if it is not resident.
+
+        :param user: The user prompt.
+        :param system: The system prompt.
+        :param max_tokens: Maximum number of tokens for the generated document.
+        :param clean: Whether to clean the document of extraneous text or not.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated document.
+
+        :return: The generated document as a string.
+        """
+        with self.__manager.use(self.__entry) as llm:
+            return llm.generate_prompt(user, system, max_tokens, clean, force_max_tokens)
+
+    def generate_batch(self, prompts: list, max_tokens: int, clean: bool = True, force_max_tokens: bool = False,
+                       batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> list:
+        """
+        Generate documents for several prompts, loading the model first if it is not resident.
+
+        :param prompts: List of (user prompt, system prompt) tuples.
+        :param max_tokens: Maximum number of tokens for the generated documents.
+        :param clean: Whether to clean the documents of extraneous text or not.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated documents.
+        :param batch_size: Number of sequences decoded together, for backends that batch their inputs.
+
+        :return: List of the results of generate_prompt, one per prompt.
+        """
+        with self.__manager.use(self.__entry) as llm:
+            return llm.generate_batch(prompts, max_tokens, clean, force_max_tokens, batch_size)
@@ -1,7 +1,9 @@
 from LLMs.LLM import LLM
 from utils.logger import setup_logger
+from utils.metrics import get_metrics
 
-from constants.constants import MLX_LLM_LOG_FILE, MLX_LLM_LOG_NAME
+from constants.constants import (MLX_LLM_LOG_FILE, MLX_LLM_LOG_NAME, STAGE_GENERATION, STAGE_CLEANING,
+                                 STAGE_TRIMMING)
 
 
 class MLXLLM(LLM):
@@ -23,6 +25,7 @@ class MLXLLM(LLM):
         self.__generate_flags = kwargs
 
         self.__logger = setup_logger(MLX_LLM_LOG_NAME, MLX_LLM_LOG_FILE)
+        self.__metrics = get_metrics()
         self.__logger.info(f"MLX LLM model initialized successfully with model: {model_name}")
 
         try:
@@ -53,25 +56,30 @@ class MLXLLM(LLM):
                 {"role": "user", "content": user}
             ]
 
-            # Generate text based on device type
-            try:
-                from mlx_lm import generate
-                input_ids = self.__tokenizer.apply_chat_template(messages, add_generation_prompt=True)
-                formatted_prompt = self.__tokenizer.decode(input_ids)
-                result = generate(self.__model, self.__tokenizer, formatted_prompt, max_tokens=max_tokens,
-                                  temp=self.temperature, **self.__generate_flags)
-            except Exception as e:
-                # Modify the messages for the second attempt
-                messages = [{"role": "user", "content": f"{system} {user}"}]
-
+            # Generate text based on device type (the cleaning pass is accounted as its own stage)
+            with self.__metrics.timer(STAGE_GENERATION if clean else STAGE_CLEANING, model=self.model_name):
                 try:
+                    from mlx_lm import generate
                     input_ids = self.__tokenizer.apply_chat_template(messages, add_generation_prompt=True)
                     formatted_prompt = self.__tokenizer.decode(input_ids)
                     result = generate(self.__model, self.__tokenizer, formatted_prompt, max_tokens=max_tokens,
                                       temp=self.temperature, **self.__generate_flags)
                 except Exception as e:
-                    self.__logger.error(f"Error in generating prompt on second attempt: {e}")
-                    raise
+                    # Modify the messages for the second attempt
+                    messages = [{"role": "user", "content": f"{system} {user}"}]
+
+                    try:
+                        input_ids = self.__tokenizer.apply_chat_template(messages, add_generation_prompt=True)
+                        formatted_prompt = self.__tokenizer.decode(input_ids)
+                        result = generate(self.__model, self.__tokenizer, formatted_prompt, max_tokens=max_tokens,
+                                          temp=self.temperature, **self.__generate_flags)
+                    except Exception as e:
+                        self.__logger.error(f"Error in generating prompt on second attempt: {e}")
+                        raise
+
+            if self.__metrics.enabled:
+                self.record_tokens(len(input_ids), len(self.__tokenizer.encode(result, add_special_tokens=False)),
+                                   cleaning=not clean)
 
             # Clean the generated document
             if clean:
@@ -79,7 +87,8 @@ class MLXLLM(LLM):
 
                 # Trim the generated document to max_tokens length
                 if force_max_tokens:
-                    cleaned_result = self.__trim_tokens(cleaned_result, max_tokens)
+                    with self.__metrics.timer(STAGE_TRIMMING, model=self.model_name):
+                        cleaned_result = self.__trim_tokens(cleaned_result, max_tokens)
 
                 return cleaned_result, result
             else:
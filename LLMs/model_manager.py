@@ -0,0 +1,302 @@
+import gc
+import glob
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from constants.constants import (MODEL_MANAGER_LOG_FILE, MODEL_MANAGER_LOG_NAME, STAGE_MODEL_LOAD, METRIC_MODEL_LOADS,
+                                 METRIC_MODEL_EVICTIONS, MODEL_WEIGHTS_PATTERNS, BYTES_PER_GB)
+
+
+def weight_files(model_name: str, token: str = None) -> list:
+    """
+    Find the weight files of a model: in its folder for a local model, or in the Hugging Face cache (downloading them
+    if needed) for a model of the hub. Safetensors weights are preferred to PyTorch ones, as loading them maps the
+    files in memory.
+
+    :param model_name: Name or path of the model.
+    :param token: Token to use for the model.
+    :return: List of paths to the weight files, empty if they cannot be found.
+    """
+    folder = model_name
+    if not os.path.isdir(model_name):
+        try:
+            from huggingface_hub import snapshot_download
+            folder = snapshot_download(model_name, token=token, allow_patterns=list(MODEL_WEIGHTS_PATTERNS))
+        except Exception:
+            return []
+
+    for pattern in MODEL_WEIGHTS_PATTERNS:
+        files = sorted(glob.glob(os.path.join(folder, pattern)))
+        if files:
+            return files
+    return []
+
+
+class ModelEntry:
+    """
+        Model known to the ModelManager: how to load it, its estimated memory, the number of LLMs sharing it and,
+        while it is resident, the loaded model and the number of generations using it.
+    """
+
+    def __init__(self, name: str, loader: callable, memory_bytes: int = None, token: str = None):
+        """
+        Initialize the ModelEntry.
+
+        :param name: Name of the model.
+        :param loader: Function loading the model.
+        :param memory_bytes: Memory of the loaded model in bytes, estimated from its weight files if not provided.
+        :param token: Token to use for the model.
+        """
+        self.name = name
+        self.loader = loader
+        self.memory_bytes = memory_bytes
+        self.token = token
+        self.files = None
+        self.model = None
+        self.references = 0
+        self.users = 0
+        self.loading = False
+        self.reserved = False
+
+
+class ModelManager:
+    """
+        Class responsible for keeping the LLMs of a process within a memory budget. Models are loaded on first use and
+        stay resident while the budget allows it; loading a model that does not fit evicts the least recently used
+        models not generating at that time. The LLMs registering the same model with the same generation settings
+        share one entry, so they load a single copy of it. A model's memory is estimated from the size of its weight
+        files (bf16 weights take as much memory as on disk), unless given in its configuration. A disabled manager is
+        not used by the agents, which load their models at setup as usual.
+    """
+
+    def __init__(self):
+        """
+        Initialize a disabled ModelManager.
+        """
+        self.enabled = False
+        self.budget_bytes = None
+        self.__entries = {}
+        self.__resident = OrderedDict()
+        self.__condition = threading.Condition()
+        self.__stats = {"loads": 0, "hits": 0, "evictions": 0, "load_seconds": 0.0}
+        self.__logger = setup_logger(MODEL_MANAGER_LOG_NAME, MODEL_MANAGER_LOG_FILE)
+        self.__metrics = get_metrics()
+
+    def configure(self, budget_gb: float = None) -> None:
+        """
+        Enable the manager with a memory budget, or disable it.
+
+        :param budget_gb: Memory budget of the resident models in GB, None to disable the manager.
+        """
+        self.enabled = budget_gb is not None
+        self.budget_bytes = int(budget_gb * BYTES_PER_GB) if budget_gb is not None else None
+        if self.enabled:
+            self.__logger.info(f"Model manager enabled with a budget of {budget_gb} GB")
+
+    def register(self, name: str, loader: callable, memory_gb: float = None, token: str = None,
+                 settings: dict = None) -> ModelEntry:
+        """
+        Register a model, loaded on first use. A model already registered with the same settings is shared: its entry
+        is returned with one more reference, and the loader of the first registration loads it.
+
+        :param name: Name of the model.
+        :param loader: Function loading the model.
+        :param memory_gb: Memory of the loaded model in GB, estimated from its weight files if not provided.
+        :param token: Token to use for the model.
+        :param settings: Generation settings of the loaded model (e.g. its temperature), which the LLMs sharing it
+                         must have in common.
+        :return: ModelEntry of the model, to use it.
+        """
+        key = (name, repr(sorted((settings or {}).items())))
+        with self.__condition:
+            entry = self.__entries.get(key)
+            if entry is None:
+                entry = self.__entries[key] = ModelEntry(name, loader, None, token)
+            if memory_gb and entry.memory_bytes is None and not entry.reserved:
+                entry.memory_bytes = int(memory_gb * BYTES_PER_GB)
+            entry.references += 1
+            references = entry.references
+        self.__logger.info(f"Registered model {name}, shared by {references} LLMs")
+        return entry
+
+    @contextmanager
+    def use(self, entry: ModelEntry):
+        """
+        Context manager using a model: the model is loaded if it is not resident and cannot be evicted until the
+        context exits.
+
+        :param entry: ModelEntry of the model.
+        :return: The loaded model.
+        """
+        self.__acquire(entry)
+        try:
+            yield entry.model
+        finally:
+            with self.__condition:
+                entry.users -= 1
+                self.__condition.notify_all()
+
+    def prefetch(self, name: str) -> None:
+        """
+        Read the weight files of a model ahead into the page cache, in the background, so that its next load maps
+        them from memory instead of disk. Does nothing for resident models.
+
+        :param name: Name of the model.
+        """
+        with self.__condition:
+            entries = [entry for entry in self.__entries.values() if entry.name == name and entry.model is None]
+        if entries and hasattr(os, "posix_fadvise"):
+            threading.Thread(target=self.__read_ahead, args=(entries[0],), daemon=True).start()
+
+    def get_stats(self) -> dict:
+        """
+        Get the statistics of the manager.
+
+        :return: Dictionary of the loads, hits and evictions, the time spent loading and the resident models.
+        """
+        with self.__condition:
+            return {**self.__stats, "resident": [entry.name for entry in self.__resident.values()],
+                    "resident_bytes": self.__resident_bytes()}
+
+    def unload_all(self) -> None:
+        """
+        Unload every resident model.
+        """
+        with self.__condition:
+            for entry in list(self.__resident.values()):
+                self.__unload(entry)
+        self.__logger.info(f"Model manager unloaded every model: {self.get_stats()}")
+
+    def __acquire(self, entry: ModelEntry) -> None:
+        """
+        Mark a model as used, loading it first when it is not resident.
+
+        :param entry: ModelEntry of the model.
+        """
+        with self.__condition:
+            # Another generation may be loading the same model
+            while entry.loading:
+                self.__condition.wait()
+            entry.users += 1
+            if entry.model is not None:
+                self.__resident.move_to_end(id(entry))
+                self.__stats["hits"] += 1
+                return
+            entry.loading = True
+
+        try:
+            if entry.memory_bytes is None:
+                entry.files = weight_files(entry.name, entry.token)
+                entry.memory_bytes = sum(os.path.getsize(path) for path in entry.files)
+
+            with self.__condition:
+                self.__make_room(entry)
+                entry.reserved = True
+
+            start = time.perf_counter()
+            with self.__metrics.timer(STAGE_MODEL_LOAD, model=entry.name):
+                model = entry.loader()
+            load_seconds = time.perf_counter() - start
+        except Exception as e:
+            self.__logger.error(f"Error loading model {entry.name}: {e}")
+            with self.__condition:
+                entry.users -= 1
+                entry.loading = False
+                entry.reserved = False
+                self.__condition.notify_all()
+            raise
+
+        with self.__condition:
+            entry.model = model
+            entry.loading = False
+            self.__resident[id(entry)] = entry
+            self.__stats["loads"] += 1
+            self.__stats["load_seconds"] += load_seconds
+            self.__condition.notify_all()
+        self.__metrics.increment(METRIC_MODEL_LOADS, model=entry.name)
+        self.__logger.info(f"Loaded model {entry.name} ({entry.memory_bytes / BYTES_PER_GB:.1f} GB) in "
+                           f"{load_seconds:.1f}s, resident: {self.__resident_bytes() / BYTES_PER_GB:.1f} GB")
+
+    def __make_room(self, entry: ModelEntry) -> None:
+        """
+        Evict the least recently used idle models until the model fits in the budget, waiting for the models in use
+        (or being loaded) to become idle. A model larger than the budget is loaded once nothing else is resident.
+        Called with the condition held.
+
+        :param entry: ModelEntry of the model to load.
+        """
+        while self.__resident_bytes() and self.__resident_bytes() + entry.memory_bytes > self.budget_bytes:
+            idle = [resident for resident in self.__resident.values() if resident.users == 0]
+            if idle:
+                self.__unload(idle[0])
+            else:
+                self.__condition.wait()
+
+    def __unload(self, entry: ModelEntry) -> None:
+        """
+        Unload a resident model and release its memory. Called with the condition held.
+
+        :param entry: ModelEntry of the model.
+        """
+        del self.__resident[id(entry)]
+        entry.model = None
+        entry.reserved = False
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        self.__stats["evictions"] += 1
+        self.__metrics.increment(METRIC_MODEL_EVICTIONS, model=entry.name)
+        self.__logger.info(f"Evicted model {entry.name} ({entry.memory_bytes / BYTES_PER_GB:.1f} GB)")
+
+    def __resident_bytes(self) -> int:
+        """
+        Get the memory of the resident models and of the models being loaded. Called with the condition held.
+
+        :return: Memory in bytes.
+        """
+        return sum(entry.memory_bytes for entry in self.__entries.values() if entry.reserved)
+
+    def __read_ahead(self, entry: ModelEntry) -> None:
+        """
+        Advise the kernel to read the weight files of a model ahead.
+
+        :param entry: ModelEntry of the model.
+        """
+        try:
+            if entry.files is None:
+                entry.files = weight_files(entry.name, entry.token)
+            for path in entry.files:
+                descriptor = os.open(path, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(descriptor)
+        except OSError as e:
+            self.__logger.warning(f"Error reading ahead the weights of model {entry.name}: {e}")
+
+
+# Manager shared by every agent of the process, created on first use (its logger needs the competition folder)
+MODEL_MANAGER = None
+MODEL_MANAGER_LOCK = threading.Lock()
+
+
+def get_model_manager() -> ModelManager:
+    """
+    Get the model manager of the process.
+
+    :return: ModelManager shared by every agent.
+    """
+    global MODEL_MANAGER
+    with MODEL_MANAGER_LOCK:
+        if MODEL_MANAGER is None:
+            MODEL_MANAGER = ModelManager()
+        return MODEL_MANAGER
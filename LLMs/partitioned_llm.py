@@ -0,0 +1,52 @@
+from LLMs.LLM import LLM
+from utils.resources import CorePartition
+from constants.constants import DEFAULT_LLM_BATCH_SIZE
+
+
+class PartitionedLLM(LLM):
+    """
+        PartitionedLLM class for running the generations of an LLM on a core partition of its own, so that it does
+        not compete for the cores of the other models running concurrently. Inherits from the base LLM class.
+    """
+
+    def __init__(self, llm: LLM, partition: CorePartition):
+        """
+        Initialize the PartitionedLLM.
+
+        :param llm: LLM generating the documents.
+        :param partition: Core partition the generations run on.
+        """
+        super().__init__(llm.model_name, llm.temperature, llm.token)
+        self.__llm = llm
+        self.__partition = partition
+
+    def generate_prompt(self, user: str, system: str, max_tokens: int, clean: bool = True,
+                        force_max_tokens: bool = False) -> str:
+        """
+        Generate a text document based on user and system prompts, on the LLM's core partition.
+
+        :param user: The user prompt.
+        :param system: The system prompt.
+        :param max_tokens: Maximum number of tokens for the generated document.
+        :param clean: Whether to clean the document of extraneous text or not.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated document.
+
+        :return: The generated document as a string.
+        """
+        return self.__partition.run(self.__llm.generate_prompt, user, system, max_tokens, clean, force_max_tokens)
+
+    def generate_batch(self, prompts: list, max_tokens: int, clean: bool = True, force_max_tokens: bool = False,
+                       batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> list:
+        """
+        Generate documents for several prompts, on the LLM's core partition.
+
+        :param prompts: List of (user prompt, system prompt) tuples.
+        :param max_tokens: Maximum number of tokens for the generated documents.
+        :param clean: Whether to clean the documents of extraneous text or not.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated documents.
+        :param batch_size: Number of sequences decoded together, for backends that batch their inputs.
+
+        :return: List of the results of generate_prompt, one per prompt.
+        """
+        return self.__partition.run(self.__llm.generate_batch, prompts, max_tokens, clean, force_max_tokens,
+                                    batch_size)
@@ -0,0 +1,151 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import transformers
+
+from LLMs.LLM import LLM
+from LLMs.generation_server import get_generation_server, GenerationClient
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from constants.constants import (SERVED_LLM_LOG_FILE, SERVED_LLM_LOG_NAME, STAGE_GENERATION, STAGE_CLEANING,
+                                 STAGE_TRIMMING, DEFAULT_GENERATION_SERVER_MAX_BATCH_SIZE, DEFAULT_LLM_BATCH_SIZE,
+                                 CONFIG_RESOURCES_CORES_HEADER, CONFIG_RESOURCES_THREADS_HEADER)
+
+
+class ServedLLM(LLM):
+    """
+        ServedLLM class for generating text through a generation server shared by every agent using the same model,
+        either in the process or on a local socket. The server batches the concurrent generations of all players and
+        games continuously. Inherits from the base LLM class.
+    """
+
+    def __init__(self, model_name: str, temperature: float, token: str, server=True,
+                 max_batch_size: int = DEFAULT_GENERATION_SERVER_MAX_BATCH_SIZE,
+                 authkey: str = None, resources: dict = None, **kwargs):
+        """
+        Initialize the ServedLLM with the specified model name and temperature.
+
+        :param model_name: Name of the model to use for text generation.
+        :param temperature: Temperature parameter for controlling randomness in generation.
+        :param token: Token to use for the model.
+        :param server: True for the in-process server of the model, or the host:port address of a local server.
+        :param max_batch_size: Maximum number of sequences decoded together by the in-process server.
+        :param authkey: Authentication key of a local server, the GENERATION_SERVER_AUTHKEY_ENV environment
+                        variable if not provided.
+        :param resources: Cores and threads of the in-process server's decoding thread, if any.
+        """
+        super().__init__(model_name, temperature, token)
+
+        self.__logger = setup_logger(SERVED_LLM_LOG_NAME, SERVED_LLM_LOG_FILE)
+        self.__metrics = get_metrics()
+
+        # Sampling flags the server applies per sequence, the others are not supported by its decoding loop
+        self.__top_p = kwargs.pop("top_p", None)
+        self.__top_k = kwargs.pop("top_k", None)
+        if kwargs:
+            self.__logger.warning(f"Generation flags not supported by the generation server are ignored: "
+                                  f"{sorted(kwargs)}")
+
+        try:
+            if server is True:
+                resources = resources or {}
+                self.__server = get_generation_server(model_name, token, max_batch_size,
+                                                      resources.get(CONFIG_RESOURCES_CORES_HEADER),
+                                                      resources.get(CONFIG_RESOURCES_THREADS_HEADER))
+                self.__tokenizer = self.__server.tokenizer
+            else:
+                if resources:
+                    self.__logger.warning("The cores of a local generation server are set when starting it, the "
+                                          "resources of the agent are ignored")
+                self.__server = GenerationClient(server, authkey)
+                self.__tokenizer = transformers.AutoTokenizer.from_pretrained(model_name, token=token)
+        except Exception as e:
+            self.__logger.error(f"Error initializing served model: {e}")
+            raise
+
+        self.__logger.info(f"Served LLM initialized successfully with model: {model_name}, server: {server}")
+
+    def generate_prompt(self, user: str, system: str, max_tokens: int, clean: bool = True,
+                        force_max_tokens: bool = False) -> str:
+        """
+        Generate a text document based on user and system prompts.
+
+        :param user: The user prompt.
+        :param system: The system prompt.
+        :param max_tokens: Maximum number of tokens for the generated document.
+        :param clean: Whether to clean the document of extraneous text or not.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated document.
+
+        :return: The generated document as a string.
+        """
+        try:
+            # Construct the message structure
+            messages = [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ]
+
+            # Generate text on the server (the cleaning pass is accounted as its own stage)
+            with self.__metrics.timer(STAGE_GENERATION if clean else STAGE_CLEANING, model=self.model_name):
+                try:
+                    result, prompt_tokens, completion_tokens = self.__server.generate(
+                        messages, max_tokens, self.temperature, self.__top_p, self.__top_k)
+                except Exception as e:
+                    # Modify the messages for the second attempt
+                    messages = [{"role": "user", "content": f"{system} {user}"}]
+
+                    try:
+                        result, prompt_tokens, completion_tokens = self.__server.generate(
+                            messages, max_tokens, self.temperature, self.__top_p, self.__top_k)
+                    except Exception as e:
+                        self.__logger.error(f"Error in generating prompt on second attempt: {e}")
+                        raise
+
+            self.record_tokens(prompt_tokens, completion_tokens, cleaning=not clean)
+
+            # Clean the generated document
+            if clean:
+                cleaned_result = self.clean_document(result, max_tokens, self)
+
+                # Trim the generated document to max_tokens length
+                if force_max_tokens:
+                    with self.__metrics.timer(STAGE_TRIMMING, model=self.model_name):
+                        cleaned_result = self.__trim_tokens(cleaned_result, max_tokens)
+
+                return cleaned_result, result
+            else:
+                return result
+        except Exception as e:
+            self.__logger.error(f"Error in generating prompt: {e}")
+            raise
+
+    def generate_batch(self, prompts: list, max_tokens: int, clean: bool = True, force_max_tokens: bool = False,
+                       batch_size: int = DEFAULT_LLM_BATCH_SIZE) -> list:
+        """
+        Generate documents for several prompts, submitting up to batch_size of them to the server at once.
+
+        :param prompts: List of (user prompt, system prompt) tuples.
+        :param max_tokens: Maximum number of tokens for the generated documents.
+        :param clean: Whether to clean the documents of extraneous text or not.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated documents.
+        :param batch_size: Number of generations in flight.
+
+        :return: List of the results of generate_prompt, one per prompt.
+        """
+        with ThreadPoolExecutor(max_workers=batch_size) as executor:
+            # Every generation runs in a copy of the caller's context, to keep its metrics labels
+            futures = [executor.submit(contextvars.copy_context().run, self.generate_prompt, user, system, max_tokens,
+                                       clean, force_max_tokens)
+                       for user, system in prompts]
+            return [future.result() for future in futures]
+
+    def __trim_tokens(self, input_string: str, max_tokens: int) -> str:
+        """
+        Trims the input string to ensure that it contains no more than max_tokens tokens.
+
+        :param input_string: The string to be tokenized and trimmed.
+        :param max_tokens: The maximum number of tokens allowed.
+        :return: The trimmed string with no more than max_tokens tokens.
+        """
+        tokens = self.__tokenizer.encode(input_string)[:max_tokens]
+        return self.__tokenizer.decode(tokens, skip_special_tokens=True)
@@ -1,14 +1,24 @@
+import numpy as np
 import pandas as pd
 
 from agents.agent import Agent
+from competition.feedback_index import FeedbackIndex
+from competition.prompt_manager import PromptManager
 from players.llm_player import LLMPlayer
 from competition.warm_start import WarmStart
+from LLMs.LLM import LLM
 from LLMs.hugging_face_llm import HuggingFaceLLM
 from LLMs.mlx_llm import MLXLLM
+from LLMs.served_llm import ServedLLM
+from LLMs.partitioned_llm import PartitionedLLM
+from LLMs.managed_llm import ManagedLLM
+from LLMs.model_manager import get_model_manager
 from utils.logger import setup_logger
+from utils.resources import CorePartition
 from constants.constants import (LLM_AGENT_LOG_FILE, LLM_AGENT_LOG_NAME, DEFAULT_LLM_AGENT_DEPTH,
-                                 HISTORY_ROUND_COLUMN, HISTORY_RANK_COLUMN, HISTORY_PLAYER_COLUMN,
-                                 MLX_IDENTIFIER, CONFIG_LLM_MODEL_NAME_HEADER)
+                                 MLX_IDENTIFIER, CONFIG_LLM_MODEL_NAME_HEADER, CONFIG_LLM_SERVER_HEADER,
+                                 CONFIG_RESOURCES_HEADER, CONFIG_RESOURCES_CORES_HEADER,
+                                 CONFIG_RESOURCES_THREADS_HEADER, CONFIG_LLM_MEMORY_HEADER)
 
 
 class LLMAgent(Agent):
@@ -16,40 +26,52 @@ class LLMAgent(Agent):
         An agent that manages players and feedback in a competition, specifically using Large Language Models (LLMs).
     """
 
-    def __init__(self, name: str, character: str, llm: dict, prompt_format: str, queries_df: pd.DataFrame,
-                 warm_start: WarmStart, pairwise: bool = False, depth: int = DEFAULT_LLM_AGENT_DEPTH):
+    def __init__(self, name: str, character: str, llm: dict | LLM, prompt_format: str, queries_df: pd.DataFrame,
+                 warm_start: WarmStart, pairwise: bool = False, depth: int = DEFAULT_LLM_AGENT_DEPTH,
+                 lazy_players: bool = False):
         """
         Initialize the LLMAgent with the provided configuration.
 
         :param name: Name of the agent.
         :param character: Character the agent will assume during the competition.
-        :param llm: Configuration for the Large Language Model.
+        :param llm: Configuration for the Large Language Model, or an LLM instance.
         :param prompt_format: Format string for generating prompts.
         :param queries_df: DataFrame containing the queries.
         :param pairwise: Whether to use pairwise feedback.
         :param depth: The depth of rounds to consider for feedback.
+        :param lazy_players: Whether the players are built window by window rather than for every query at setup.
         """
-        super().__init__(name, character, prompt_format, queries_df, warm_start)
+        super().__init__(name, character, prompt_format, queries_df, warm_start, lazy_players)
         self.__pairwise = pairwise
         self.__depth = depth
+        self.__prompt_manager = PromptManager(prompt_format)
+        self.__players = {}
         self.__logger = setup_logger(LLM_AGENT_LOG_NAME, LLM_AGENT_LOG_FILE)
 
         self.__setup_llm(llm)
-        self.build_players()
+        if not lazy_players:
+            self.build_players()
 
-    def build_players(self) -> None:
+    def build_players(self, queries=None) -> None:
         """
         Build the players for each query the agent is responsible for.
+
+        :param queries: Rows (query ID, initial document, query) of the queries to build players for, every query of
+                        the agent if not provided.
         """
         try:
-            self.__players = {query_id: LLMPlayer(name=self.name, character=self.character, llm=self.llm,
-                                                  prompt_format=self.prompt_format, query=query, query_id=query_id,
-                                                  init_document=init_doc, feedback_func=self.generate_feedback)
-                              for query_id, init_doc, query in self.queries}
+            # The players share the agent's prompt manager and feedback function
+            feedback_func = self.generate_feedback
+            players = {query_id: LLMPlayer(name=self.name, character=self.character, llm=self.llm,
+                                           prompt_format=self.prompt_format, query=query, query_id=query_id,
+                                           init_document=init_doc, feedback_func=feedback_func,
+                                           prompt_manager=self.__prompt_manager)
+                       for query_id, init_doc, query in (self.queries if queries is None else queries)}
             if self.warm_start:
-                for player in self.__players.values():
+                for player in players.values():
                     self.set_player(player, player.get_name(), player.get_query_id())
-            self.__logger.info(f"Players built successfully for agent: {self.name}")
+            self.__players.update(players)
+            self.__logger.info(f"{len(players)} players built successfully for agent: {self.name}")
         except Exception as e:
             self.__logger.error(f"Error building players for agent {self.name}: {e}")
             raise
@@ -57,18 +79,52 @@ class LLMAgent(Agent):
     def __setup_llm(self, llm_config):
         """
         Set up the LLM (Large Language Model) based on the configuration.
+
+        :param llm_config: Configuration of the LLM, or an LLM instance to use as is.
         """
         try:
-            if MLX_IDENTIFIER in llm_config[CONFIG_LLM_MODEL_NAME_HEADER]:
-                self.llm = MLXLLM(**llm_config)
+            if isinstance(llm_config, LLM):
+                # An already built LLM (e.g. a stand-in used by the benchmarks)
+                self.llm = llm_config
             else:
-                self.llm = HuggingFaceLLM(**llm_config)
+                llm_config = dict(llm_config)
+                resources = llm_config.pop(CONFIG_RESOURCES_HEADER, None)
+                memory_gb = llm_config.pop(CONFIG_LLM_MEMORY_HEADER, None)
+                if llm_config.get(CONFIG_LLM_SERVER_HEADER):
+                    # Generations go through the generation server shared by every agent using the model
+                    self.llm = ServedLLM(**llm_config, resources=resources)
+                else:
+                    llm_class = MLXLLM if MLX_IDENTIFIER in llm_config[CONFIG_LLM_MODEL_NAME_HEADER] \
+                        else HuggingFaceLLM
+                    manager = get_model_manager()
+                    if manager.enabled:
+                        # The model is loaded when the agent generates, within the memory budget of the process
+                        self.llm = ManagedLLM(manager, llm_config[CONFIG_LLM_MODEL_NAME_HEADER],
+                                              llm_config.get("temperature"), llm_config.get("token"),
+                                              lambda: llm_class(**llm_config), memory_gb, llm_config)
+                    else:
+                        self.llm = llm_class(**llm_config)
+
+                    if resources:
+                        # Generations run on the agent's own cores, without competing with the other models
+                        self.llm = PartitionedLLM(self.llm, CorePartition(
+                            self.name, resources.get(CONFIG_RESOURCES_CORES_HEADER),
+                            resources.get(CONFIG_RESOURCES_THREADS_HEADER)))
 
             self.__logger.info("LLM initialized successfully")
         except KeyError as e:
             self.__logger.error(f"Missing LLM configuration key: {e}")
             raise
 
+    def retire_players(self, query_ids: list) -> None:
+        """
+        Release the players of finished games.
+
+        :param query_ids: IDs of the queries of the games.
+        """
+        for query_id in query_ids:
+            self.__players.pop(query_id, None)
+
     def get_player(self, query_id: int) -> LLMPlayer:
         """
         Retrieve the player associated with the given query id.
@@ -82,11 +138,19 @@ class LLMAgent(Agent):
             self.__logger.error(f"Player for query '{query_id}' not found.")
             raise
 
-    def generate_feedback(self, feedback: pd.DataFrame, player_name: str, round: int):
+    def get_feedback_depth(self) -> int:
+        """
+        Get the number of latest rounds the agent reads as feedback.
+
+        :return: Number of rounds.
+        """
+        return max(self.__depth, 1)
+
+    def generate_feedback(self, feedback: FeedbackIndex, player_name: str, round: int):
         """
         Generate feedback for the next round based on the competition history.
 
-        :param feedback: DataFrame containing the feedback from previous rounds.
+        :param feedback: FeedbackIndex of the game's ranked documents from previous rounds.
         :param player_name: Name of the player requesting feedback.
         :param round: Current round number.
         :return: Tuple containing pairwise feedback and all feedback.
@@ -94,31 +158,23 @@ class LLMAgent(Agent):
         try:
             pairwise_feedback, all_feedback = None, None
 
-            # Filter feedback for relevant rounds
-            feedback = feedback[(feedback[HISTORY_ROUND_COLUMN] >= round - self.__depth) &
-                                (feedback[HISTORY_ROUND_COLUMN] != 0)]
+            # Relevant rounds, latest first (the initial documents of round 0 are never used as feedback)
+            rounds = range(round - 1, max(round - self.__depth, 1) - 1, -1)
 
             if self.__pairwise:
                 # For each round, select 2 random players for pairwise feedback
-                pairwise_feedback = pd.concat(
-                    [feedback[feedback[HISTORY_ROUND_COLUMN] == int(round)].sample(2)
-                     for round in feedback[HISTORY_ROUND_COLUMN].unique()],
-                    ignore_index=True
-                )
-                pairwise_feedback = pairwise_feedback.sort_values([HISTORY_ROUND_COLUMN, HISTORY_RANK_COLUMN],
-                                                                  ascending=[False, True])
+                records = []
+                for _round in rounds:
+                    round_records = feedback.get_round(_round)
+                    if round_records:
+                        selected = np.random.choice(len(round_records), 2, replace=False)
+                        records.extend(sorted((round_records[i] for i in selected), key=lambda record: record.rank))
+                pairwise_feedback = FeedbackIndex.to_frame(records)
             else:
-                # Filter feedback for the player in the current round
-                feedback = feedback[~((feedback[HISTORY_PLAYER_COLUMN] == player_name) &
-                                      (feedback[HISTORY_ROUND_COLUMN] == round - 1))]
-
-                # Collect all feedback for each round
-                all_feedback = pd.concat(
-                    [feedback[feedback[HISTORY_ROUND_COLUMN] == int(round)] for round in feedback['round'].unique()],
-                    ignore_index=True
-                )
-                all_feedback = all_feedback.sort_values([HISTORY_ROUND_COLUMN, HISTORY_RANK_COLUMN],
-                                                        ascending=[False, True])
+                # Collect all feedback for each round, without the player's own document of the last round
+                records = [record for _round in rounds for record in feedback.get_round(_round)
+                           if not (record.player == player_name and record.round == round - 1)]
+                all_feedback = FeedbackIndex.to_frame(records)
 
             return pairwise_feedback, all_feedback
         except Exception as e:
@@ -3,6 +3,8 @@ from abc import ABC, abstractmethod
 import pandas as pd
 
 from players.player import Player
+from competition.feedback_index import FeedbackIndex
+from competition.round_store import RoundStore
 from competition.warm_start import WarmStart
 from utils.logger import setup_logger
 from constants.constants import AGENT_LOG_FILE, AGENT_LOG_NAME
@@ -15,7 +17,7 @@ class Agent(ABC):
     """
 
     def __init__(self, name: str, character: str, prompt_format: str, queries_df: pd.DataFrame,
-                 warm_start: WarmStart = None):
+                 warm_start: WarmStart = None, lazy_players: bool = False):
         """
         Initialize the Agent with the provided configuration.
 
@@ -24,27 +26,42 @@ class Agent(ABC):
         :param prompt_format: Format string for generating prompts.
         :param queries_df: DataFrame containing the queries.
         :param warm_start: WarmStart instance for the competition.
+        :param lazy_players: Whether the players are built window by window with build_players, rather than for every
+                             query at setup.
         """
         self.name = name
         self.character = character
         self.prompt_format = prompt_format
-        self.queries = queries_df.values
+        self.lazy_players = lazy_players
+        self.queries = None if lazy_players else queries_df.values
         self.warm_start = warm_start
         self.history = []
         self.__logger = setup_logger(AGENT_LOG_NAME, AGENT_LOG_FILE)
 
-    def set_history(self, history: pd.DataFrame) -> None:
+    def set_history(self, history: RoundStore) -> None:
         """
         Set the history of the agent for the competition.
 
-        :param history: DataFrame containing the agent's history.
+        :param history: RoundStore containing the competition history.
         """
         self.history = history
 
     @abstractmethod
-    def build_players(self) -> None:
+    def build_players(self, queries=None) -> None:
         """
         Build the players for each query the agent is responsible for.
+
+        :param queries: Rows (query ID, initial document, query) of the queries to build players for, every query of
+                        the agent if not provided.
+        """
+        pass
+
+    @abstractmethod
+    def retire_players(self, query_ids: list) -> None:
+        """
+        Release the players of finished games.
+
+        :param query_ids: IDs of the queries of the games.
         """
         pass
 
@@ -57,12 +74,20 @@ class Agent(ABC):
         :return: Player instance for the provided query.
         """
 
+    def get_feedback_depth(self) -> int:
+        """
+        Get the number of latest rounds the agent reads as feedback.
+
+        :return: Number of rounds.
+        """
+        return 1
+
     @abstractmethod
-    def generate_feedback(self, feedback: pd.DataFrame, player_name: str, round: int):
+    def generate_feedback(self, feedback: FeedbackIndex, player_name: str, round: int):
         """
         Generate feedback for the next round based on the competition history.
 
-        :param feedback: DataFrame containing the feedback from previous rounds.
+        :param feedback: FeedbackIndex of the game's ranked documents from previous rounds.
         :param player_name: Name of the player requesting feedback.
         :param round: Current round number.
         :return: Tuple containing pairwise feedback and all feedback.
@@ -77,9 +102,11 @@ class Agent(ABC):
         :param player_name: Name of the player.
         :param query_id: ID of the query.
         """
-        round, document, init_document, rank, game_history = self.warm_start.set_player(player_name, query_id)
-        if game_history is None:
+        round, document, init_document, rank, feedback_index = self.warm_start.set_player(player_name, query_id)
+        if feedback_index is None:
             return
         player.set_rank(rank), player.set_round(round)
-        player.set_document(document), player.set_init_document(init_document)
-        player.generate_feedback(game_history)
+        player.set_document(document)
+        if init_document is not None:
+            player.set_init_document(init_document)
+        player.generate_feedback(feedback_index)
@@ -2,11 +2,11 @@ import pandas as pd
 import torch
 
 from agents.agent import Agent
+from competition.feedback_index import FeedbackIndex
 from competition.warm_start import WarmStart
 from players.static_player import StaticPlayer
 from utils.logger import setup_logger
-from constants.constants import (HISTORY_PLAYER_COLUMN, HISTORY_ROUND_COLUMN, STATIC_AGENT_LOG_FILE,
-                                 STATIC_AGENT_LOG_NAME)
+from constants.constants import STATIC_AGENT_LOG_FILE, STATIC_AGENT_LOG_NAME
 
 
 class StaticAgent(Agent):
@@ -14,31 +14,48 @@ class StaticAgent(Agent):
         An agent that manages players and feedback in a competition, specifically using Large Language Models (LLMs).
     """
 
-    def __init__(self, name: str, queries_df: pd.DataFrame, warm_start: WarmStart):
+    def __init__(self, name: str, queries_df: pd.DataFrame, warm_start: WarmStart, lazy_players: bool = False):
 
-        super().__init__(name=name, character="static", prompt_format="", queries_df=queries_df, warm_start=warm_start)
+        super().__init__(name=name, character="static", prompt_format="", queries_df=queries_df, warm_start=warm_start,
+                         lazy_players=lazy_players)
         self.__logger = setup_logger(STATIC_AGENT_LOG_NAME, STATIC_AGENT_LOG_FILE)
         self.device = torch.device("cpu")
+        self.__players = {}
 
-        self.build_players()
+        if not lazy_players:
+            self.build_players()
 
-    def build_players(self) -> None:
+    def build_players(self, queries=None) -> None:
         """
         Build the players for each query the agent is responsible for.
+
+        :param queries: Rows (query ID, initial document, query) of the queries to build players for, every query of
+                        the agent if not provided.
         """
         try:
-            self.__players = {query_id: StaticPlayer(name=self.name, query=query, query_id=query_id,
-                                                     init_document=init_doc, feedback_func=self.generate_feedback)
-                              for query_id, init_doc, query in self.queries}
+            feedback_func = self.generate_feedback
+            players = {query_id: StaticPlayer(name=self.name, query=query, query_id=query_id,
+                                              init_document=init_doc, feedback_func=feedback_func)
+                       for query_id, init_doc, query in (self.queries if queries is None else queries)}
             if self.warm_start:
-                for player in self.__players.values():
+                for player in players.values():
                     self.set_player(player, player.get_name(), player.get_query_id())
-            self.__logger.info(f"Players built successfully for agent: {self.name}")
+            self.__players.update(players)
+            self.__logger.info(f"{len(players)} players built successfully for agent: {self.name}")
         except Exception as e:
             self.__logger.error(
                 f"Error building players for agent {self.name}: {e}")
             raise
 
+    def retire_players(self, query_ids: list) -> None:
+        """
+        Release the players of finished games.
+
+        :param query_ids: IDs of the queries of the games.
+        """
+        for query_id in query_ids:
+            self.__players.pop(query_id, None)
+
     def get_player(self, query_id: int) -> StaticPlayer:
         """
         Retrieve the player associated with the given query id.
@@ -52,23 +69,20 @@ class StaticAgent(Agent):
             self.__logger.error(f"Player for query '{query_id}' not found.")
             raise
 
-    def generate_feedback(self, feedback: pd.DataFrame, player_name: str, round: int):
+    def generate_feedback(self, feedback: FeedbackIndex, player_name: str, round: int):
         """
         Generate feedback for the next round based on the competition history.
 
-        :param feedback: DataFrame containing the feedback from previous rounds.
+        :param feedback: FeedbackIndex of the game's ranked documents from previous rounds.
         :param player_name: Name of the player requesting feedback.
         :param round: Current round number.
-        :return: Tuple containing pairwise feedback and all feedback.
+        :return: FeedbackRecord of the player's own document in the last round.
         """
 
         try:
 
-            # Filter feedback for relevant rounds
-            last_round_feedback = feedback[feedback[HISTORY_ROUND_COLUMN] == round - 1]
-
-            # Filter feedback for the player in the current round
-            own_feedback = last_round_feedback[last_round_feedback[HISTORY_PLAYER_COLUMN] == player_name]
+            # Look up the player's own document in the last round
+            own_feedback = feedback.get_record(round - 1, player_name)
 
             return own_feedback
 
@@ -0,0 +1,5 @@
+# __init__.py in benchmarks
+
+from .fakes import FakeLLM, FakeRanker
+
+__all__ = ['FakeLLM', 'FakeRanker']
@@ -0,0 +1,63 @@
+import json
+import os
+import platform
+import sys
+
+import numpy as np
+
+
+def peak_rss_bytes() -> int:
+    """
+    Get the peak resident set size of the current process.
+
+    :return: Peak RSS in bytes, or None when the platform does not report it.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def environment_info(benchmark: str) -> dict:
+    """
+    Describe the machine a benchmark runs on, stored with its results so runs can be compared.
+
+    :param benchmark: Name of the benchmark.
+    :return: Dictionary of the benchmark name, Python version, platform and CPU count.
+    """
+    return {"benchmark": benchmark, "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+
+def latency_summary(latencies: list, scale: float = 1000.0) -> dict:
+    """
+    Summarize latencies with their percentiles.
+
+    :param latencies: List of latencies in seconds.
+    :param scale: Factor applied to the summary (milliseconds by default).
+    :return: Dictionary of the mean, p50, p90, p99 and max latencies.
+    """
+    latencies = np.asarray(latencies, dtype=np.float64) * scale
+    if not len(latencies):
+        return {}
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {"mean": float(latencies.mean()), "p50": float(p50), "p90": float(p90), "p99": float(p99),
+            "max": float(latencies.max())}
+
+
+def write_results(results: dict, output: str = None) -> None:
+    """
+    Write benchmark results as JSON to a file, or to the standard output.
+
+    :param results: Dictionary of results.
+    :param output: Path to the output file, or None for the standard output.
+    """
+    text = json.dumps(results, indent=4)
+    if output:
+        with open(output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
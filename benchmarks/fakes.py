@@ -0,0 +1,103 @@
+import hashlib
+import random
+import time
+from typing import List, Tuple
+
+from LLMs.LLM import LLM
+from rankers.ranker import Ranker
+from utils.metrics import get_metrics
+from constants.constants import BENCHMARK_FAKE_LLM_MODEL_NAME, BENCHMARK_FAKE_RANKER_MODEL_NAME, STAGE_GENERATION
+
+
+def stable_seed(*texts: str) -> int:
+    """
+    Derive a seed from texts that is stable across processes (unlike hash()).
+
+    :param texts: Texts to derive the seed from.
+    :return: Integer seed.
+    """
+    digest = hashlib.blake2b("\x1f".join(texts).encode("utf8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class FakeLLM(LLM):
+    """
+        Deterministic stand-in for an LLM, used to measure the orchestration overhead without a model.
+        A generated document is a seeded selection of the words of the prompts, so the same prompts always produce
+        the same document; the cleaning pass returns the document unchanged.
+    """
+
+    def __init__(self, model_name: str = BENCHMARK_FAKE_LLM_MODEL_NAME, temperature: float = 0.0, token: str = None,
+                 seconds_per_token: float = 0.0):
+        """
+        Initialize the FakeLLM.
+
+        :param model_name: Name reported for the model.
+        :param temperature: Unused, kept for interface compatibility.
+        :param token: Unused, kept for interface compatibility.
+        :param seconds_per_token: Simulated decoding time per generated token.
+        """
+        super().__init__(model_name, temperature, token)
+        self.__seconds_per_token = seconds_per_token
+        self.__metrics = get_metrics()
+
+    def generate_prompt(self, user: str, system: str, max_tokens: int, clean: bool = True,
+                        force_max_tokens: bool = False) -> str:
+        """
+        Generate a document based on user and system prompts.
+
+        :param user: The user prompt.
+        :param system: The system prompt.
+        :param max_tokens: Maximum number of words of the generated document.
+        :param clean: Whether to clean the document of extraneous text or not.
+        :param force_max_tokens: Unused, the document never exceeds max_tokens words.
+
+        :return: The generated and non cleaned documents, or the document alone when clean is False.
+        """
+        if not clean:
+            return user
+
+        with self.__metrics.timer(STAGE_GENERATION, model=self.model_name):
+            words = f"{system} {user}".split()
+            rng = random.Random(stable_seed(user, system))
+            positions = sorted(rng.sample(range(len(words)), min(max_tokens, len(words))))
+            result = " ".join(words[position] for position in positions)
+
+            if self.__seconds_per_token:
+                time.sleep(self.__seconds_per_token * len(positions))
+        if self.__metrics.enabled:
+            self.record_tokens(len(words), len(positions))
+
+        return self.clean_document(result, max_tokens, self), result
+
+
+class FakeRanker(Ranker):
+    """
+        Deterministic stand-in for a ranker: a document's score is the share of its words that appear in the query,
+        plus a small seeded jitter, so rankings vary between rounds without any model.
+    """
+
+    def __init__(self, model_name: str = BENCHMARK_FAKE_RANKER_MODEL_NAME):
+        """
+        Initialize the FakeRanker.
+
+        :param model_name: Name reported for the model.
+        """
+        super().__init__(model_name)
+
+    def rank(self, query: str, documents: List[str]) -> Tuple[List[int], List[float]]:
+        """
+        Rank documents based on their word overlap with the query.
+
+        :param query: A single query string.
+        :param documents: List of documents to be ranked.
+        :return: Ranks and scores of the documents.
+        """
+        query_terms = set(query.lower().split())
+        scores = []
+        for document in documents:
+            terms = document.lower().split()
+            overlap = sum(term in query_terms for term in terms) / max(len(terms), 1)
+            scores.append(overlap + random.Random(stable_seed(query, document)).random() * 1e-3)
+
+        return self.tie_breaker(scores)
@@ -0,0 +1,239 @@
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from benchmarks.common import environment_info, peak_rss_bytes, write_results
+from constants.constants import (QUERY_DF_QUERY_COLUMN, QUERY_DF_DOCUMENT_COLUMN, BENCHMARK_CHARACTER,
+                                 BENCHMARK_PROMPT_FORMAT, CLEANING_PROMPT, STAGE_GENERATION, STAGE_CLEANING,
+                                 STAGE_TRIMMING, METRIC_CLEANING_COMPLETION_TOKENS, CONFIG_LOGGING_LEVEL_HEADER,
+                                 CONFIG_LOGGING_CONSOLE_HEADER, MLX_IDENTIFIER)
+
+BACKENDS = ["hugging_face", "mlx", "served"]
+RANDOM_MODEL = "random"
+BUNDLED_QUERIES_FOLDER = "data/web_track"
+BUNDLED_DOCUMENTS_FILE = "data/initial_documents.trectext"
+SPECIAL_TOKENS = ["<unk>", "<pad>", "<s>", "</s>"]
+CHAT_TEMPLATE = ("{% for message in messages %}<s> {{ message['role'] }} {{ message['content'] }} </s> {% endfor %}"
+                 "{% if add_generation_prompt %}<s> assistant {% endif %}")
+
+
+def build_prompts(documents: int, seed: int) -> list:
+    """
+    Build the prompts of a second round with the PromptManager, from the bundled topics and initial documents:
+    each candidate document gets a pairwise feedback made of two other documents of the collection.
+
+    :param documents: Number of prompts.
+    :param seed: Random seed.
+    :return: List of (user prompt, system prompt) tuples.
+    """
+    from competition.feedback_index import FeedbackIndex, FeedbackRecord
+    from competition.prompt_manager import PromptManager
+    from parsers.query_parser import QueryParser
+
+    queries_df = QueryParser(BUNDLED_QUERIES_FOLDER, BUNDLED_DOCUMENTS_FILE).query_loader()
+    queries_df = queries_df[queries_df[QUERY_DF_QUERY_COLUMN] != ""]
+    pairs = list(zip(queries_df[QUERY_DF_QUERY_COLUMN], queries_df[QUERY_DF_DOCUMENT_COLUMN]))
+    prompt_manager = PromptManager(BENCHMARK_PROMPT_FORMAT)
+    rng = random.Random(seed)
+
+    prompts = []
+    for index in range(documents):
+        query, document = pairs[index % len(pairs)]
+        (_, first), (_, second) = rng.sample(pairs, 2)
+        feedback = FeedbackIndex.to_frame([FeedbackRecord(1, "first", first, 1, 1.0),
+                                           FeedbackRecord(1, "second", second, 2, 0.5)])
+        prompts.append((prompt_manager.build_user_prompt(feedback, None, query),
+                        prompt_manager.build_system_prompt(query, document, BENCHMARK_CHARACTER)))
+
+    return prompts
+
+
+def build_random_model(folder: str, prompts: list, layers: int, hidden_size: int, seed: int) -> str:
+    """
+    Build a tiny Llama-style causal language model with random weights, a word-level tokenizer of the prompts and a
+    chat template, saved as a local Hugging Face model, so the generation path can be measured offline on CPU.
+
+    :param folder: Folder to save the model to.
+    :param prompts: Prompts the vocabulary is built from.
+    :param layers: Number of transformer layers.
+    :param hidden_size: Hidden size of the model.
+    :param seed: Random seed of the weights.
+    :return: Path to the model folder.
+    """
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    pre_tokenizer = pre_tokenizers.Whitespace()
+    texts = [text for prompt in prompts for text in prompt] + [CLEANING_PROMPT, CHAT_TEMPLATE]
+    counts = Counter(word for text in texts for word, _ in pre_tokenizer.pre_tokenize_str(text))
+    vocabulary = {token: index for index, token in
+                  enumerate(SPECIAL_TOKENS + [word for word, _ in counts.most_common() if word not in SPECIAL_TOKENS])}
+
+    tokenizer = Tokenizer(models.WordLevel(vocabulary, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizer
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>", pad_token="<pad>",
+                                        bos_token="<s>", eos_token="</s>")
+    tokenizer.chat_template = CHAT_TEMPLATE
+    tokenizer.save_pretrained(folder)
+
+    torch.manual_seed(seed)
+    config = LlamaConfig(vocab_size=len(vocabulary), hidden_size=hidden_size, intermediate_size=2 * hidden_size,
+                         num_hidden_layers=layers, num_attention_heads=max(hidden_size // 32, 1),
+                         max_position_embeddings=8192, pad_token_id=vocabulary["<pad>"],
+                         bos_token_id=vocabulary["<s>"], eos_token_id=vocabulary["</s>"])
+    LlamaForCausalLM(config).save_pretrained(folder)
+    return folder
+
+
+def build_llm(backend: str, model_name: str, temperature: float, max_batch_size: int = None):
+    """
+    Build the LLM backend.
+
+    :param backend: Backend name ("hugging_face", "mlx" or "served").
+    :param model_name: Model name or path.
+    :param temperature: Sampling temperature.
+    :param max_batch_size: Maximum number of sequences decoded together by the generation server ("served").
+    :return: LLM instance.
+    """
+    if backend == "mlx":
+        from LLMs.mlx_llm import MLXLLM
+        return MLXLLM(model_name, temperature, None)
+
+    if backend == "served":
+        # Continuous batching: generate_batch keeps batch_size generations in flight on the in-process server
+        from LLMs.served_llm import ServedLLM
+        return ServedLLM(model_name, temperature, None, server=True, max_batch_size=max_batch_size)
+
+    from LLMs.hugging_face_llm import HuggingFaceLLM
+    return HuggingFaceLLM(model_name, temperature, None)
+
+
+def run_phase(metrics, llm, prompts: list, max_tokens: int, clean: bool, batch_size: int) -> tuple:
+    """
+    Run generate_batch over the prompts and collect the metrics recorded during the call.
+
+    :param metrics: Metrics registry.
+    :param llm: LLM instance.
+    :param prompts: List of (user prompt, system prompt) tuples.
+    :param max_tokens: Maximum number of tokens for the generated documents.
+    :param clean: Whether to run the cleaning pass.
+    :param batch_size: Number of sequences decoded together.
+    :return: Tuple of the elapsed time in seconds and the metrics summary of the call.
+    """
+    metrics.end_round(0)
+    start = time.perf_counter()
+    llm.generate_batch(prompts, max_tokens, clean=clean, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return elapsed, metrics.end_round(0)
+
+
+def measure(metrics, llm, prompts: list, max_tokens: int, batch_size: int) -> dict:
+    """
+    Measure the generation path of a backend for a batch size and a maximum number of tokens.
+    The time to first token is the latency of a single-token generation (prefill and first decoding step);
+    the decoding throughput is derived from the additional time a full-length generation takes.
+
+    :param metrics: Metrics registry.
+    :param llm: LLM instance.
+    :param prompts: List of (user prompt, system prompt) tuples.
+    :param max_tokens: Maximum number of tokens for the generated documents.
+    :param batch_size: Number of sequences decoded together.
+    :return: Dictionary of results.
+    """
+    calls = -(-len(prompts) // batch_size)
+
+    # Time to first token: generate a single token per prompt
+    first_token_time, _ = run_phase(metrics, llm, prompts, 1, False, batch_size)
+
+    # Decoding: generate the full documents without the cleaning pass (the backends account a generation that is not
+    # cleaned as a cleaning pass)
+    generation_time, generation = run_phase(metrics, llm, prompts, max_tokens, False, batch_size)
+    completion_tokens = generation["counters"].get(METRIC_CLEANING_COMPLETION_TOKENS, 0)
+    decode_time = generation_time - first_token_time
+
+    # End to end: generate, clean and trim the documents
+    end_to_end_time, end_to_end = run_phase(metrics, llm, prompts, max_tokens, True, batch_size)
+    stages = {stage: end_to_end["stages"].get(stage, {}).get("sum", 0.0)
+              for stage in (STAGE_GENERATION, STAGE_CLEANING, STAGE_TRIMMING)}
+
+    return {"batch_size": batch_size, "max_tokens": max_tokens, "documents": len(prompts),
+            "time_to_first_token_ms": 1000 * first_token_time / calls,
+            "completion_tokens": completion_tokens,
+            "decode_tokens_per_second": (completion_tokens - len(prompts)) / decode_time if decode_time > 0 else None,
+            "end_to_end_seconds": end_to_end_time,
+            "documents_per_second": len(prompts) / end_to_end_time if end_to_end_time else 0.0,
+            "stage_seconds": stages,
+            "cleaning_overhead": stages[STAGE_CLEANING] / end_to_end_time if end_to_end_time else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM backends' generation path")
+    parser.add_argument("--backend", choices=BACKENDS, default="hugging_face", help="LLM backend")
+    parser.add_argument("--model", type=str, default=RANDOM_MODEL,
+                        help=f"Model name or path, '{RANDOM_MODEL}' for a tiny random-weight model (Hugging Face)")
+    parser.add_argument("--random_layers", type=int, default=2, help="Layers of the random-weight model")
+    parser.add_argument("--random_hidden_size", type=int, default=64, help="Hidden size of the random-weight model")
+    parser.add_argument("--documents", type=int, default=16, help="Number of documents generated per measurement")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 4, 8], help="Sequences decoded together")
+    parser.add_argument("--max_tokens", type=int, nargs="+", default=[64, 200], help="Maximum generated tokens")
+    parser.add_argument("--temperature", type=float, default=0.7, help="Sampling temperature")
+    parser.add_argument("--threads", type=int, default=None, help="Torch thread count")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", type=str, default=None, help="Path to the JSON results (stdout if not set)")
+    args = parser.parse_args()
+
+    if args.backend == "mlx" and (args.model == RANDOM_MODEL or MLX_IDENTIFIER not in args.model):
+        parser.error(f"The mlx backend needs an {MLX_IDENTIFIER} model")
+
+    work_folder = tempfile.mkdtemp(prefix="lemss_llms_benchmark_")
+
+    from utils.logger import set_competition_hash_folder, configure_logging
+    from utils.metrics import get_metrics
+    set_competition_hash_folder(work_folder)
+    configure_logging({CONFIG_LOGGING_LEVEL_HEADER: "WARNING", CONFIG_LOGGING_CONSOLE_HEADER: False})
+
+    # The benchmark measures CPU inference for the Hugging Face backend
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    import torch
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    random.seed(args.seed), np.random.seed(args.seed), torch.manual_seed(args.seed)
+    metrics = get_metrics()
+    metrics.enable()
+
+    results = {**environment_info("llms"), "backend": args.backend, "model": args.model,
+               "threads": torch.get_num_threads(), "results": []}
+    try:
+        prompts = build_prompts(args.documents, args.seed)
+        model_path = args.model
+        if args.model == RANDOM_MODEL:
+            model_path = build_random_model(os.path.join(work_folder, RANDOM_MODEL), prompts, args.random_layers,
+                                            args.random_hidden_size, args.seed)
+        llm = build_llm(args.backend, model_path, args.temperature, max(args.batch_sizes))
+
+        # Warm up (weights paging, allocator, kernels)
+        llm.generate_batch(prompts[:1], 8, clean=False)
+
+        for max_tokens in args.max_tokens:
+            for batch_size in args.batch_sizes:
+                results["results"].append(measure(metrics, llm, prompts, max_tokens, batch_size))
+    finally:
+        if args.backend == "served":
+            from LLMs.generation_server import close_generation_servers
+            close_generation_servers()
+        results["peak_rss_bytes"] = peak_rss_bytes()
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
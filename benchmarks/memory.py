@@ -0,0 +1,94 @@
+import argparse
+import gc
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.common import environment_info, peak_rss_bytes, write_results
+from benchmarks.orchestration import build_queries
+from constants.constants import (BENCHMARK_CHARACTER, BENCHMARK_PROMPT_FORMAT, QUERY_DF_QUERY_ID_COLUMN,
+                                 CONFIG_LOGGING_LEVEL_HEADER, CONFIG_LOGGING_CONSOLE_HEADER)
+
+
+def measure(build: callable) -> tuple:
+    """
+    Measure the memory allocated by a build step and kept alive by its result.
+
+    :param build: Function building the objects to measure.
+    :return: Tuple of the built objects, the allocated bytes and the build time in seconds.
+    """
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    built = build()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    return built, tracemalloc.get_traced_memory()[0] - before, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory of the players and games of a competition")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of queries (games)")
+    parser.add_argument("--agents", type=int, default=20, help="Number of LLM agents")
+    parser.add_argument("--static_agents", type=int, default=1, help="Number of static agents")
+    parser.add_argument("--document_words", type=int, default=150, help="Number of words of the initial documents")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", type=str, default=None, help="Path to the JSON results (stdout if not set)")
+    args = parser.parse_args()
+
+    work_folder = tempfile.mkdtemp(prefix="lemss_memory_benchmark_")
+
+    from utils.logger import set_competition_hash_folder, configure_logging
+    set_competition_hash_folder(work_folder)
+    configure_logging({CONFIG_LOGGING_LEVEL_HEADER: "WARNING", CONFIG_LOGGING_CONSOLE_HEADER: False})
+
+    # The competition package imports the agents, whose players import its feedback index: it is imported first
+    from competition.game import Game
+    from competition.round_store import RoundStore
+    from agents.LLM_agent import LLMAgent
+    from agents.static_agent import StaticAgent
+    from benchmarks.fakes import FakeLLM, FakeRanker
+
+    random.seed(args.seed), np.random.seed(args.seed)
+    # Object columns, as the competition passes the queries to its agents
+    queries_df = build_queries(args.queries, args.document_words, args.seed).astype(object)
+    llm, ranker = FakeLLM(), FakeRanker()
+    players = args.queries * (args.agents + args.static_agents)
+
+    results = {**environment_info("memory"), "queries": args.queries, "agents": args.agents,
+               "static_agents": args.static_agents, "players": players}
+    try:
+        tracemalloc.start()
+        agents, players_bytes, players_seconds = measure(lambda: [
+            LLMAgent(f"agent-{index:02d}", BENCHMARK_CHARACTER, llm, BENCHMARK_PROMPT_FORMAT, queries_df, None,
+                     pairwise=index % 2 == 0) for index in range(args.agents)] + [
+            StaticAgent(f"static-{index:02d}", queries_df, None) for index in range(args.static_agents)])
+
+        # The games share a round store, which holds the initial documents of every player
+        history_store = RoundStore()
+        games, games_bytes, games_seconds = measure(lambda: [
+            Game(query_info, agents, ranker, args.document_words, 1, history_store=history_store)
+            for query_info in queries_df.to_dict("records")])
+        tracemalloc.stop()
+
+        player = agents[0].get_player(queries_df[QUERY_DF_QUERY_ID_COLUMN].iloc[0])
+        results.update({
+            "players_bytes": players_bytes, "bytes_per_player": players_bytes / players if players else 0.0,
+            "player_object_bytes": sys.getsizeof(player), "players_seconds": players_seconds,
+            "games_bytes": games_bytes, "bytes_per_game": games_bytes / len(games) if games else 0.0,
+            "game_object_bytes": sys.getsizeof(games[0]) if games else 0, "games_seconds": games_seconds,
+        })
+    finally:
+        results["peak_rss_bytes"] = peak_rss_bytes()
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
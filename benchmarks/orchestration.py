@@ -0,0 +1,158 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import peak_rss_bytes, environment_info, write_results
+from constants.constants import (QUERY_DF_QUERY_ID_COLUMN, QUERY_DF_DOCUMENT_COLUMN, QUERY_DF_QUERY_COLUMN,
+                                 CONFIG_COMPETITION_HEADER, CONFIG_GAME_HEADER, CONFIG_AGENTS_HEADER,
+                                 CONFIG_RANKERS_HEADER, CONFIG_ROUND_BY_ROUND_HEADER, CONFIG_INIT_DOCS_PATH_HEADER,
+                                 QUERIES_DF_PATH_HEADER, CONFIG_GAME_ROUNDS_HEADER, CONFIG_LLM_HEADER,
+                                 CONFIG_METRICS_HEADER, CONFIG_LOGGING_LEVEL_HEADER, CONFIG_LOGGING_CONSOLE_HEADER,
+                                 METRICS_FILE_NAME, BENCHMARK_CHARACTER, BENCHMARK_PROMPT_FORMAT,
+                                 BENCHMARK_QUERIES_FILE_NAME, CONFIG_GAME_WINDOW_HEADER)
+
+MODES = {"round_by_round": True, "game_by_game": False}
+
+
+def build_queries(queries: int, document_words: int, seed: int) -> pd.DataFrame:
+    """
+    Build a synthetic queries DataFrame, in the layout produced by the QueryParser.
+
+    :param queries: Number of queries.
+    :param document_words: Number of words of the initial documents.
+    :param seed: Random seed.
+    :return: DataFrame with the query ID, initial document and query columns.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"term{index}" for index in range(5000)]
+    rows = []
+    for query_id in range(1, queries + 1):
+        query_terms = rng.sample(vocabulary, 3)
+        document = " ".join(rng.choice(query_terms) if rng.random() < 0.1 else rng.choice(vocabulary)
+                            for _ in range(document_words))
+        rows.append((query_id, document, " ".join(query_terms)))
+
+    return pd.DataFrame(rows, columns=[QUERY_DF_QUERY_ID_COLUMN, QUERY_DF_DOCUMENT_COLUMN, QUERY_DF_QUERY_COLUMN])
+
+
+def build_config(queries_path: str, agents: int, rounds: int, round_by_round: bool, max_tokens: int) -> dict:
+    """
+    Build a competition configuration using the benchmark stand-ins.
+
+    :param queries_path: Path to the queries CSV file.
+    :param agents: Number of agents.
+    :param rounds: Number of rounds.
+    :param round_by_round: Whether to run the competition round by round or game by game.
+    :param max_tokens: Maximum number of tokens of the generated documents.
+    :return: Configuration dictionary.
+    """
+    from benchmarks.fakes import FakeLLM
+
+    return {
+        CONFIG_COMPETITION_HEADER: {"warm_start": False, "warm_start_path": None, QUERIES_DF_PATH_HEADER: queries_path,
+                                    CONFIG_ROUND_BY_ROUND_HEADER: round_by_round, CONFIG_INIT_DOCS_PATH_HEADER: None,
+                                    CONFIG_RANKERS_HEADER: {}, CONFIG_METRICS_HEADER: True},
+        CONFIG_GAME_HEADER: {"max_tokens": max_tokens, CONFIG_GAME_ROUNDS_HEADER: rounds, "force_max_tokens": False},
+        CONFIG_AGENTS_HEADER: {f"agent-{index:02d}": {"agent_type": "llm", CONFIG_LLM_HEADER: FakeLLM(),
+                                                      "character": BENCHMARK_CHARACTER,
+                                                      "prompt_format": BENCHMARK_PROMPT_FORMAT,
+                                                      "pairwise": index % 2 == 0, "depth": 1}
+                               for index in range(agents)},
+    }
+
+
+def run_scenario(mode: str, queries: int, agents: int, rounds: int, document_words: int, seed: int,
+                 output_folder: str, log_level: str, game_window: int = None) -> dict:
+    """
+    Run a full competition with the benchmark stand-ins and measure it. Meant to run in a fresh process,
+    so the peak RSS belongs to the scenario alone.
+
+    :param mode: Competition mode, "round_by_round" or "game_by_game".
+    :param queries: Number of queries (games).
+    :param agents: Number of agents (players per game).
+    :param rounds: Number of rounds.
+    :param document_words: Number of words of the documents.
+    :param seed: Random seed.
+    :param output_folder: Folder for the competition outputs.
+    :param log_level: Logging level of the competition components.
+    :param game_window: Number of games built at once in game-by-game mode, every game if not provided.
+    :return: Dictionary of results.
+    """
+    from utils.logger import set_competition_hash_folder, configure_logging, shutdown_logging
+
+    random.seed(seed), np.random.seed(seed)
+    os.makedirs(output_folder, exist_ok=True)
+    set_competition_hash_folder(output_folder)
+    configure_logging({CONFIG_LOGGING_LEVEL_HEADER: log_level, CONFIG_LOGGING_CONSOLE_HEADER: False})
+
+    from competition.competition import Competition
+    from benchmarks.fakes import FakeRanker
+
+    queries_path = os.path.join(output_folder, BENCHMARK_QUERIES_FILE_NAME)
+    build_queries(queries, document_words, seed).to_csv(queries_path, index=False)
+    config = build_config(queries_path, agents, rounds, MODES[mode], document_words)
+    config[CONFIG_COMPETITION_HEADER][CONFIG_GAME_WINDOW_HEADER] = game_window
+
+    start = time.perf_counter()
+    competition = Competition(config, ranker=FakeRanker())
+    competition.run_competition(output_folder)
+    wall_time = time.perf_counter() - start
+    shutdown_logging()
+
+    with open(os.path.join(output_folder, METRICS_FILE_NAME)) as file:
+        total = json.load(file)["total"]
+
+    return {"mode": mode, "game_window": game_window if not MODES[mode] else None, "queries": queries,
+            "agents": agents, "rounds": rounds, "document_words": document_words,
+            "documents": queries * agents * rounds, "wall_time_seconds": wall_time, "peak_rss_bytes": peak_rss_bytes(),
+            "documents_per_second": queries * agents * rounds / wall_time if wall_time else 0.0,
+            "stages": {stage: {"seconds": summary["sum"], "count": summary["count"], "max": summary["max"]}
+                       for stage, summary in total["stages"].items()},
+            "counters": total["counters"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the competition orchestration with a fake LLM and ranker")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries (games)")
+    parser.add_argument("--agents", type=int, default=5, help="Number of agents")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of rounds")
+    parser.add_argument("--document_words", type=int, default=150, help="Number of words of the documents")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES), help="Competition modes")
+    parser.add_argument("--game_window", type=int, default=None,
+                        help="Number of games built at once in game-by-game mode (every game by default)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--log_level", type=str, default="WARNING", help="Logging level of the components")
+    parser.add_argument("--output", type=str, default=None, help="Path to the JSON results (stdout if not set)")
+    parser.add_argument("--keep_outputs", action="store_true", help="Keep the competition outputs")
+    args = parser.parse_args()
+
+    results = {**environment_info("orchestration"), "scenarios": []}
+    work_folder = tempfile.mkdtemp(prefix="lemss_benchmark_")
+    try:
+        # Every scenario runs in a fresh process, so its peak RSS and global state are its own
+        context = multiprocessing.get_context("spawn")
+        for mode in args.modes:
+            with context.Pool(1) as pool:
+                results["scenarios"].append(pool.apply(run_scenario, (
+                    mode, args.queries, args.agents, args.rounds, args.document_words, args.seed,
+                    os.path.join(work_folder, mode), args.log_level, args.game_window)))
+    finally:
+        if args.keep_outputs:
+            print(f"Competition outputs kept in {work_folder}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
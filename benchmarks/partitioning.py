@@ -0,0 +1,162 @@
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.common import environment_info, peak_rss_bytes, write_results
+from benchmarks.rankers import RANDOM_MODEL, load_corpus, build_workload, build_random_model
+from constants.constants import DEFAULT_RANKER_BATCH_SIZE, CONFIG_LOGGING_LEVEL_HEADER, CONFIG_LOGGING_CONSOLE_HEADER
+
+SCENARIOS = ["sequential", "shared", "partitioned"]
+
+
+def run_workload(ranker, workload: list, batch_size: int, encode_batch_size: int, repeats: int) -> int:
+    """
+    Rank a workload with a ranker.
+
+    :param ranker: Ranker instance.
+    :param workload: List of (query, documents) tuples.
+    :param batch_size: Number of queries ranked per call.
+    :param encode_batch_size: Number of texts encoded together.
+    :param repeats: Number of passes over the workload.
+    :return: Number of ranked documents.
+    """
+    ranked = 0
+    for _ in range(repeats):
+        for start in range(0, len(workload), batch_size):
+            call = workload[start:start + batch_size]
+            ranker.rank_batch(call, batch_size=encode_batch_size)
+            ranked += sum(len(documents) for _, documents in call)
+    return ranked
+
+
+def measure(scenario: str, rankers: list, workloads: list, cores: list, batch_size: int, encode_batch_size: int,
+            repeats: int) -> dict:
+    """
+    Measure the aggregate throughput of several models ranking their workloads.
+
+    :param scenario: "sequential" runs the models one after the other on every core, "shared" runs them
+                     concurrently on every core, "partitioned" runs them concurrently each on a slice of the cores.
+    :param rankers: Ranker instances, one per model.
+    :param workloads: Workloads, one per model.
+    :param cores: Cores of the benchmark.
+    :param batch_size: Number of queries ranked per call.
+    :param encode_batch_size: Number of texts encoded together.
+    :param repeats: Number of passes over each workload.
+    :return: Dictionary of the wall time, the aggregate and per-model throughputs and the cores of the models.
+    """
+    from rankers.partitioned_ranker import PartitionedRanker
+    from utils.resources import CorePartition, pin_current_thread, split_cores
+
+    model_cores = split_cores(len(rankers), cores) if scenario == "partitioned" else [cores] * len(rankers)
+    partitions = []
+    if scenario == "partitioned":
+        partitions = [CorePartition(f"model-{index}", model_cores[index]) for index in range(len(rankers))]
+        rankers = [PartitionedRanker(partition.name, ranker, partition)
+                   for ranker, partition in zip(rankers, partitions)]
+
+    # Warm up (lazy initialization, allocator, caches)
+    for ranker, workload in zip(rankers, workloads):
+        ranker.rank_batch(workload[:batch_size], batch_size=encode_batch_size)
+
+    seconds, documents = [0.0] * len(rankers), [0] * len(rankers)
+
+    def run(index: int) -> None:
+        if scenario != "partitioned":
+            pin_current_thread(cores)
+        start = time.perf_counter()
+        documents[index] = run_workload(rankers[index], workloads[index], batch_size, encode_batch_size, repeats)
+        seconds[index] = time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        if scenario == "sequential":
+            for index in range(len(rankers)):
+                run(index)
+        else:
+            threads = [threading.Thread(target=run, args=(index,)) for index in range(len(rankers))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        wall_seconds = time.perf_counter() - start
+    finally:
+        for partition in partitions:
+            partition.close()
+
+    return {"scenario": scenario, "wall_seconds": wall_seconds,
+            "documents_per_second": sum(documents) / wall_seconds if wall_seconds else 0.0,
+            "models": [{"cores": model_cores[index],
+                        "documents_per_second": documents[index] / seconds[index] if seconds[index] else 0.0}
+                       for index in range(len(rankers))]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent models on shared and partitioned CPU cores")
+    parser.add_argument("--models", type=int, default=2, help="Number of models running concurrently")
+    parser.add_argument("--model", type=str, default=RANDOM_MODEL,
+                        help=f"E5 model name or path, '{RANDOM_MODEL}' for a small random-weight encoder")
+    parser.add_argument("--random_layers", type=int, default=2, help="Layers of the random-weight encoder")
+    parser.add_argument("--random_hidden_size", type=int, default=256, help="Hidden size of the random-weight encoder")
+    parser.add_argument("--corpus", choices=["bundled", "synthetic"], default="bundled", help="Source of the texts")
+    parser.add_argument("--queries", type=int, default=32, help="Number of queries per model")
+    parser.add_argument("--documents", type=int, default=5, help="Documents per query")
+    parser.add_argument("--document_words", type=int, default=150, help="Words per document")
+    parser.add_argument("--batch_size", type=int, default=8, help="Queries per rank_batch() call")
+    parser.add_argument("--encode_batch_size", type=int, default=DEFAULT_RANKER_BATCH_SIZE,
+                        help="Texts encoded together by rank_batch()")
+    parser.add_argument("--cores", type=str, default=None, help="Cores of the benchmark (e.g. 0-7), all by default")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS, help="Scenarios to measure")
+    parser.add_argument("--repeats", type=int, default=2, help="Passes over each workload")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", type=str, default=None, help="Path to the JSON results (stdout if not set)")
+    args = parser.parse_args()
+
+    work_folder = tempfile.mkdtemp(prefix="lemss_partitioning_benchmark_")
+
+    from utils.logger import set_competition_hash_folder, configure_logging
+    set_competition_hash_folder(work_folder)
+    configure_logging({CONFIG_LOGGING_LEVEL_HEADER: "WARNING", CONFIG_LOGGING_CONSOLE_HEADER: False})
+
+    # The benchmark measures CPU inference
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    from rankers.e5 import E5
+    from utils.resources import available_cores, parse_cores
+
+    random.seed(args.seed), np.random.seed(args.seed)
+    cores = parse_cores(args.cores) if args.cores else available_cores()
+    queries, documents = load_corpus(args.corpus, args.seed)
+
+    results = {**environment_info("partitioning"), "cores": cores, "models": args.models, "results": []}
+    try:
+        model_path = args.model
+        if model_path == RANDOM_MODEL:
+            model_path = build_random_model(os.path.join(work_folder, RANDOM_MODEL), documents, args.random_layers,
+                                            args.random_hidden_size, args.seed)
+        rankers = [E5(model_path) for _ in range(args.models)]
+        workloads = [build_workload(queries, documents, args.queries, args.documents, args.document_words,
+                                    args.seed + index) for index in range(args.models)]
+
+        for scenario in args.scenarios:
+            results["results"].append(measure(scenario, rankers, workloads, cores, args.batch_size,
+                                              args.encode_batch_size, args.repeats))
+
+        throughputs = {result["scenario"]: result["documents_per_second"] for result in results["results"]}
+        if throughputs.get("partitioned"):
+            results["partitioned_gain"] = {scenario: throughputs["partitioned"] / throughput
+                                           for scenario, throughput in throughputs.items()
+                                           if scenario != "partitioned" and throughput}
+    finally:
+        results["peak_rss_bytes"] = peak_rss_bytes()
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
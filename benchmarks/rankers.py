@@ -0,0 +1,257 @@
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import environment_info, latency_summary, peak_rss_bytes, write_results
+from constants.constants import (QUERY_DF_QUERY_COLUMN, QUERY_DF_DOCUMENT_COLUMN, HISTORY_DOCNO_COLUMN,
+                                 HISTORY_DOCUMENT_COLUMN, DEFAULT_RANKER_BATCH_SIZE,
+                                 CONFIG_LOGGING_LEVEL_HEADER, CONFIG_LOGGING_CONSOLE_HEADER)
+
+RANKERS = ["e5", "contriever", "okapi"]
+RANDOM_MODEL = "random"
+BUNDLED_QUERIES_FOLDER = "data/web_track"
+BUNDLED_DOCUMENTS_FILE = "data/initial_documents.trectext"
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def load_corpus(corpus: str, seed: int) -> tuple:
+    """
+    Load the queries and documents the workloads are drawn from.
+
+    :param corpus: "bundled" for the bundled topics and initial documents, "synthetic" for random words.
+    :param seed: Random seed.
+    :return: Tuple of the list of queries and the list of documents.
+    """
+    if corpus == "bundled":
+        from parsers.query_parser import QueryParser
+
+        queries_df = QueryParser(BUNDLED_QUERIES_FOLDER, BUNDLED_DOCUMENTS_FILE).query_loader()
+        queries_df = queries_df[queries_df[QUERY_DF_QUERY_COLUMN] != ""]
+        return queries_df[QUERY_DF_QUERY_COLUMN].tolist(), queries_df[QUERY_DF_DOCUMENT_COLUMN].tolist()
+
+    rng = random.Random(seed)
+    vocabulary = [f"term{index}" for index in range(5000)]
+    queries = [" ".join(rng.sample(vocabulary, 3)) for _ in range(200)]
+    documents = [" ".join(rng.choices(vocabulary, k=300)) for _ in range(200)]
+    return queries, documents
+
+
+def build_workload(queries: list, documents: list, workload_queries: int, documents_per_query: int,
+                   document_words: int, seed: int) -> list:
+    """
+    Build a ranking workload: queries, each with documents resized to an exact number of words
+    (longer documents are truncated, shorter ones repeated).
+
+    :param queries: Pool of queries.
+    :param documents: Pool of documents.
+    :param workload_queries: Number of queries in the workload.
+    :param documents_per_query: Number of documents ranked per query.
+    :param document_words: Number of words of each document.
+    :param seed: Random seed.
+    :return: List of (query, documents) tuples.
+    """
+    rng = random.Random(seed)
+    words = [document.split() for document in documents]
+
+    def resize(document_words_list: list) -> str:
+        repeats = -(-document_words // max(len(document_words_list), 1))
+        return " ".join((document_words_list * repeats)[:document_words])
+
+    return [(rng.choice(queries), [resize(rng.choice(words)) for _ in range(documents_per_query)])
+            for _ in range(workload_queries)]
+
+
+def build_random_model(folder: str, documents: list, layers: int, hidden_size: int, seed: int) -> str:
+    """
+    Build a small BERT encoder with random weights and a word-level vocabulary of the corpus, saved as a local
+    Hugging Face model, so the embedding rankers can be measured offline.
+
+    :param folder: Folder to save the model to.
+    :param documents: Documents the vocabulary is built from.
+    :param layers: Number of transformer layers.
+    :param hidden_size: Hidden size of the model.
+    :param seed: Random seed of the weights.
+    :return: Path to the model folder.
+    """
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizer
+
+    counts = Counter(word for document in documents for word in re.findall(r"\w+", document.lower()))
+    vocabulary = SPECIAL_TOKENS + [word for word, _ in counts.most_common(30000)]
+    os.makedirs(folder, exist_ok=True)
+    vocabulary_path = os.path.join(folder, "vocab.txt")
+    with open(vocabulary_path, "w", encoding="utf8") as file:
+        file.write("\n".join(vocabulary))
+
+    torch.manual_seed(seed)
+    BertTokenizer(vocabulary_path).save_pretrained(folder)
+    BertModel(BertConfig(vocab_size=len(vocabulary), hidden_size=hidden_size, num_hidden_layers=layers,
+                         num_attention_heads=max(hidden_size // 64, 1), intermediate_size=4 * hidden_size,
+                         max_position_embeddings=512)).save_pretrained(folder)
+    return folder
+
+
+def build_ranker(name: str, model_name: str, work_folder: str):
+    """
+    Build a ranker.
+
+    :param name: Ranker name ("e5", "contriever" or "okapi").
+    :param model_name: Model of the embedding rankers.
+    :param work_folder: Folder for the Okapi index.
+    :return: Ranker instance.
+    """
+    if name == "e5":
+        from rankers.e5 import E5
+        return E5(model_name)
+    if name == "contriever":
+        from rankers.contriever import Contriever
+        return Contriever(model_name)
+
+    from rankers.okapi import Okapi
+    return Okapi(index_name="benchmark_index", init_index=False, output_hash_folder=work_folder)
+
+
+def index_workload(ranker, workload: list, prefix: str) -> tuple:
+    """
+    Add the documents of a workload to the index of an index-based ranker, which ranks document IDs.
+
+    :param ranker: Index-based ranker.
+    :param workload: List of (query, documents) tuples.
+    :param prefix: Prefix of the document IDs, unique per workload.
+    :return: Tuple of the workload with document IDs instead of documents, and the indexing time in seconds.
+    """
+    docnos = [[f"{prefix}-{query_idx}-{doc_idx}" for doc_idx in range(len(documents))]
+              for query_idx, (_, documents) in enumerate(workload)]
+    documents_df = pd.DataFrame({HISTORY_DOCNO_COLUMN: [docno for ids in docnos for docno in ids],
+                                 HISTORY_DOCUMENT_COLUMN: [doc for _, documents in workload for doc in documents]})
+    start = time.perf_counter()
+    ranker.add_document(documents_df)
+    return [(query, ids) for (query, _), ids in zip(workload, docnos)], time.perf_counter() - start
+
+
+def measure(ranker, workload: list, batch_size: int, encode_batch_size: int, repeats: int) -> dict:
+    """
+    Measure a ranker on a workload, through rank() for a batch size of 1 and through rank_batch() otherwise.
+
+    :param ranker: Ranker instance.
+    :param workload: List of (query, documents) tuples.
+    :param batch_size: Number of queries ranked per call.
+    :param encode_batch_size: Number of texts encoded together by rank_batch().
+    :param repeats: Number of passes over the workload.
+    :return: Dictionary with the per-document latency percentiles (ms) and the throughput.
+    """
+    calls = [workload[start:start + batch_size] for start in range(0, len(workload), batch_size)]
+
+    def run(call: list):
+        if batch_size == 1:
+            query, documents = call[0]
+            ranker.rank(query, documents)
+        else:
+            ranker.rank_batch(call, batch_size=encode_batch_size)
+
+    # Warm up (lazy initialization, allocator, caches)
+    run(calls[0])
+
+    latencies, total_time, total_documents = [], 0.0, 0
+    for _ in range(repeats):
+        for call in calls:
+            documents = sum(len(documents) for _, documents in call)
+            start = time.perf_counter()
+            run(call)
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed / documents)
+            total_time += elapsed
+            total_documents += documents
+
+    return {"path": "rank" if batch_size == 1 else "rank_batch", "calls": len(latencies),
+            "per_document_latency_ms": latency_summary(latencies),
+            "documents_per_second": total_documents / total_time if total_time else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rankers on CPU")
+    parser.add_argument("--rankers", nargs="+", choices=RANKERS, default=RANKERS, help="Rankers to measure")
+    parser.add_argument("--e5_model", type=str, default=RANDOM_MODEL,
+                        help=f"E5 model name or path, '{RANDOM_MODEL}' for a small random-weight encoder")
+    parser.add_argument("--contriever_model", type=str, default=RANDOM_MODEL,
+                        help=f"Contriever model name or path, '{RANDOM_MODEL}' for a small random-weight encoder")
+    parser.add_argument("--random_layers", type=int, default=2, help="Layers of the random-weight encoder")
+    parser.add_argument("--random_hidden_size", type=int, default=128, help="Hidden size of the random-weight encoder")
+    parser.add_argument("--corpus", choices=["bundled", "synthetic"], default="bundled", help="Source of the texts")
+    parser.add_argument("--queries", type=int, default=32, help="Number of queries per workload")
+    parser.add_argument("--documents", type=int, nargs="+", default=[2, 5, 10], help="Documents per query")
+    parser.add_argument("--document_words", type=int, nargs="+", default=[50, 150, 300], help="Words per document")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8],
+                        help="Queries per call (1 uses rank(), larger sizes use rank_batch())")
+    parser.add_argument("--encode_batch_size", type=int, default=DEFAULT_RANKER_BATCH_SIZE,
+                        help="Texts encoded together by rank_batch()")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count()], help="Torch thread counts")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over each workload")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", type=str, default=None, help="Path to the JSON results (stdout if not set)")
+    args = parser.parse_args()
+
+    work_folder = tempfile.mkdtemp(prefix="lemss_rankers_benchmark_")
+
+    from utils.logger import set_competition_hash_folder, configure_logging
+    set_competition_hash_folder(work_folder)
+    configure_logging({CONFIG_LOGGING_LEVEL_HEADER: "WARNING", CONFIG_LOGGING_CONSOLE_HEADER: False})
+
+    # The benchmark measures CPU inference
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    import torch
+
+    random.seed(args.seed), np.random.seed(args.seed)
+    queries, documents = load_corpus(args.corpus, args.seed)
+
+    results = {**environment_info("rankers"), "corpus": args.corpus, "results": []}
+    try:
+        for name in args.rankers:
+            model_name = {"e5": args.e5_model, "contriever": args.contriever_model}.get(name)
+            model_path = model_name
+            if model_name == RANDOM_MODEL:
+                model_path = os.path.join(work_folder, RANDOM_MODEL)
+                if not os.path.exists(model_path):
+                    build_random_model(model_path, documents, args.random_layers, args.random_hidden_size, args.seed)
+            try:
+                ranker = build_ranker(name, model_path, work_folder)
+            except Exception as e:
+                results["results"].append({"ranker": name, "skipped": f"{type(e).__name__}: {e}"})
+                continue
+
+            for documents_per_query in args.documents:
+                for document_words in args.document_words:
+                    workload = build_workload(queries, documents, args.queries, documents_per_query, document_words,
+                                              args.seed)
+                    indexing_time = None
+                    if name == "okapi":
+                        workload, indexing_time = index_workload(ranker, workload,
+                                                                 f"{documents_per_query}-{document_words}")
+
+                    for threads in args.threads:
+                        torch.set_num_threads(threads)
+                        for batch_size in args.batch_sizes:
+                            results["results"].append({
+                                "ranker": name, "model": model_name,
+                                "threads": threads, "documents_per_query": documents_per_query,
+                                "document_words": document_words, "batch_size": batch_size,
+                                "indexing_seconds": indexing_time,
+                                **measure(ranker, workload, batch_size, args.encode_batch_size, args.repeats)})
+            del ranker
+    finally:
+        results["peak_rss_bytes"] = peak_rss_bytes()
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,58 @@
+import copy
+import json
+import multiprocessing
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 
 from agents.LLM_agent import LLMAgent
 from agents.static_agent import StaticAgent
+from LLMs.generation_server import close_generation_servers
+from LLMs.model_manager import get_model_manager
+from competition.distributed import DistributedWorker, run_worker
+from competition.document_registry import RoundDocumentRegistry
 from competition.game import Game
+from competition.journal import Journal
+from competition.round_store import RoundStore
+from competition.sharding import partition_queries, merge_histories, run_shard
+from competition.task_queue import TaskQueue
 from competition.warm_start import WarmStart
 from parsers.query_parser import QueryParser
-from parsers.trec_parser import TrecParser
+from parsers.trec_parser import TrecParser, build_docnos
+from parsers.trectext_writer import TrecTextWriter
+from parsers.history_store import HistoryWriter, HistoryReader
 from rankers.contriever import Contriever
 from rankers.e5 import E5
 from rankers.okapi import Okapi
+from rankers.index_ranker import IndexRanker
+from rankers.ranker import Ranker
+from rankers.remote_ranker import RemoteRanker
+from rankers.partitioned_ranker import PartitionedRanker
 from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from utils.resources import CorePartition, pin_current_thread, split_cores
 from constants.constants import (COMPETITION_HISTORY_FILE_NAME, COMPETITION_LOG_FILE, COMPETITION_LOG_NAME,
     CONFIG_AGENTS_HEADER, CONFIG_COMPETITION_HEADER, CONFIG_GAME_HEADER,CONFIG_GAME_ROUNDS_HEADER,
     CONFIG_INIT_DOCS_PATH_HEADER, QUERIES_DF_PATH_HEADER, CONFIG_RANKERS_HEADER, CONFIG_ROUND_BY_ROUND_HEADER,
-    HISTORY_DOCNO_COLUMN, HISTORY_DOCUMENT_COLUMN, HISTORY_PLAYER_COLUMN, HISTORY_QUERY_ID_COLUMN, HISTORY_ROUND_COLUMN,
-    TRECTEXT_FILE_NAME)
+    HISTORY_DOCNO_COLUMN, HISTORY_DOCUMENT_COLUMN, HISTORY_RANK_COLUMN, CONFIG_STREAM_TRECTEXT_HEADER,
+    TRECTEXT_FILE_NAME, COMPETITION_HISTORY_PARQUET_FILE_NAME, CONFIG_HISTORY_FORMAT_HEADER,
+    CONFIG_HISTORY_CSV_EXPORT_HEADER, CONFIG_HISTORY_DELTA_DOCUMENTS_HEADER, HISTORY_FORMAT_CSV,
+    HISTORY_FORMAT_PARQUET, CONFIG_METRICS_HEADER, STAGE_SETUP, STAGE_ROUND, STAGE_INDEXING, STAGE_HISTORY_IO,
+    CONFIG_JOURNAL_HEADER, CONFIG_JOURNAL_SYNC_RECORDS_HEADER, CONFIG_JOURNAL_RESUME_PATH_HEADER, JOURNAL_FILE_NAME,
+    DEFAULT_JOURNAL_SYNC_RECORDS, HISTORY_ROUND_COLUMN, HISTORY_PLAYER_COLUMN, CONFIG_WORKERS_HEADER,
+    SHARDS_FOLDER, SHARD_FOLDER_FORMAT, SHARD_QUERIES_FILE_NAME, CONFIG_DISTRIBUTED_HEADER,
+    CONFIG_DISTRIBUTED_QUEUE_PATH_HEADER, CONFIG_DISTRIBUTED_LOCAL_WORKERS_HEADER,
+    CONFIG_DISTRIBUTED_LEASE_SECONDS_HEADER, CONFIG_DISTRIBUTED_MAX_ATTEMPTS_HEADER,
+    CONFIG_DISTRIBUTED_POLL_SECONDS_HEADER, CONFIG_GENERATION_CONCURRENCY_HEADER, DEFAULT_GENERATION_CONCURRENCY,
+    CONFIG_RANKER_SERVICE_HEADER, CONFIG_PIPELINE_HEADER, CONFIG_AGENT_MAJOR_HEADER,
+    CONFIG_RESOURCES_HEADER, CONFIG_RESOURCES_CORES_HEADER, CONFIG_RESOURCES_THREADS_HEADER,
+    CONFIG_PARTITION_CORES_HEADER, CONFIG_MODEL_MEMORY_BUDGET_HEADER, CONFIG_CONVERGENCE_HEADER,
+    CONFIG_GAME_WINDOW_HEADER,
+    QUERY_DF_QUERY_ID_COLUMN, DEFAULT_TASK_LEASE_SECONDS, DEFAULT_TASK_MAX_ATTEMPTS,
+    DEFAULT_TASK_POLL_SECONDS, TASK_QUEUE_FILE_NAME, TASK_DONE)
 
 
 class Competition:
@@ -26,12 +61,14 @@ class Competition:
         and generating results in TREC format.
     """
 
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, ranker: Ranker = None):
         """
         Initialize the Competition class with competition configuration and agents configuration.
 
         :param config: Dictionary containing competition and agents configuration.
+        :param ranker: Ranker instance to use instead of the configured rankers (e.g. a stand-in for benchmarks).
         """
+        self.__config = config
         self.__competition_config = config[CONFIG_COMPETITION_HEADER]
         self.__agents_config = config[CONFIG_AGENTS_HEADER]
         self.__game_config = config[CONFIG_GAME_HEADER]
@@ -39,12 +76,32 @@ class Competition:
         if self.__warm_start:
             self.__warm_start = WarmStart(
                 config[CONFIG_COMPETITION_HEADER]['warm_start_path'])
-        self.__games_history = []
+        self.__delta_documents = self.__competition_config.get(CONFIG_HISTORY_DELTA_DOCUMENTS_HEADER, False)
+        self.__history_store = RoundStore(self.__delta_documents)
+        self.ranker = ranker
         self.__agents = []
         self.__index_based_ranker = False
+        self.__trectext_writer = None
+        self.__journal = None
+        self.__executor = None
+        self.__generation_order = None
+        self.__games = {}
+        self.__history_writer = None
+        self.__convergence_summary = {"games": 0, "converged": 0, "generations": 0, "rankings": 0}
+        self.__metrics = get_metrics()
+        self.__metrics.enable(self.__competition_config.get(CONFIG_METRICS_HEADER, False))
         self.__logger = setup_logger(
             COMPETITION_LOG_NAME, COMPETITION_LOG_FILE)
 
+        # Games (and their players) are built window by window in game-by-game mode, every round of a
+        # round-by-round competition needs every game (and distributed workers restore any player)
+        self.__game_window = self.__competition_config.get(CONFIG_GAME_WINDOW_HEADER)
+        if self.__game_window and (self.__competition_config.get(CONFIG_ROUND_BY_ROUND_HEADER) or
+                                   self.__competition_config.get(CONFIG_DISTRIBUTED_HEADER)):
+            self.__logger.warning("Game windows only apply to game-by-game competitions that are not distributed, "
+                                  "every game is built.")
+            self.__game_window = None
+
     def __setup_competition(self):
         """
         Set up the competition by loading queries, initializing rankers, LLMs, agents, and games.
@@ -52,8 +109,11 @@ class Competition:
         try:
             self.__setup_queries()
             self.__setup_ranker()
+            self.__setup_journal()
             self.__setup_agents()
             self.__setup_games()
+            if self.__journal:
+                self.__journal.open(self.__history_store)
         except KeyError as e:
             self.__logger.error(f"Missing competition configuration key: {e}")
             raise
@@ -77,10 +137,12 @@ class Competition:
         Initialize the ranker model if specified in the configuration.
         """
         try:
-            if 'e5' in self.__competition_config[CONFIG_RANKERS_HEADER]:
-                self.ranker = E5(**self.__competition_config[CONFIG_RANKERS_HEADER]['e5'])
+            if self.ranker is not None:
+                self.__index_based_ranker = isinstance(self.ranker, IndexRanker)
+            elif 'e5' in self.__competition_config[CONFIG_RANKERS_HEADER]:
+                self.ranker = self.__build_embedding_ranker('e5', E5)
             elif 'contriever' in self.__competition_config[CONFIG_RANKERS_HEADER]:
-                self.ranker = Contriever(**self.__competition_config[CONFIG_RANKERS_HEADER]['contriever'])
+                self.ranker = self.__build_embedding_ranker('contriever', Contriever)
             elif 'okapi' in self.__competition_config[CONFIG_RANKERS_HEADER]:
                 self.__index_based_ranker = True
                 if self.__competition_config[CONFIG_ROUND_BY_ROUND_HEADER]:
@@ -94,19 +156,60 @@ class Competition:
             self.__logger.error(f"Missing ranker configuration key: {e}")
             raise
 
+    def __build_embedding_ranker(self, ranker_type: str, ranker_class: type) -> Ranker:
+        """
+        Build an embedding ranker, or the client of the ranker service owning its model when the ranker's
+        configuration has a service address. A ranker with resources ranks on a core partition of its own.
+
+        :param ranker_type: Type of the ranker, as in the rankers configuration.
+        :param ranker_class: Class of the ranker.
+        :return: Ranker instance.
+        """
+        ranker_config = dict(self.__competition_config[CONFIG_RANKERS_HEADER][ranker_type])
+        resources = ranker_config.pop(CONFIG_RESOURCES_HEADER, None)
+        if ranker_config.get(CONFIG_RANKER_SERVICE_HEADER):
+            return RemoteRanker(ranker_type, **ranker_config)
+
+        ranker = ranker_class(**ranker_config)
+        if resources:
+            partition = CorePartition(ranker_type, resources.get(CONFIG_RESOURCES_CORES_HEADER),
+                                      resources.get(CONFIG_RESOURCES_THREADS_HEADER))
+            ranker = PartitionedRanker(ranker_config["model_name"], ranker, partition)
+        return ranker
+
+    def __setup_journal(self):
+        """
+        Initialize the write-ahead journal if configured. When a previous journal is found (in the output folder, or
+        at the configured resume path), it is replayed and the competition resumes from its history like a warm start.
+        """
+        if not self.__competition_config.get(CONFIG_JOURNAL_HEADER, False):
+            return
+
+        journal_path = os.path.join(self.output_folder, JOURNAL_FILE_NAME)
+        self.__journal = Journal(journal_path, self.__competition_config.get(CONFIG_JOURNAL_SYNC_RECORDS_HEADER,
+                                                                            DEFAULT_JOURNAL_SYNC_RECORDS))
+        resume_path = self.__competition_config.get(CONFIG_JOURNAL_RESUME_PATH_HEADER) or journal_path
+        if self.__journal.replay(resume_path):
+            self.__warm_start = WarmStart(competition_history_df=self.__journal.get_history())
+            self.__logger.info(f"Resuming competition from the journal: {resume_path}")
+
     def __setup_agents(self):
         """
         Initialize the agents for the competition.
         """
         try:
+            # With object columns, the players of every agent share the same query and document strings (string
+            # columns would build new strings for every agent)
+            queries_df = self.__queries_df.astype(object)
             for agent_name, agent_config in self.__agents_config.items():
                 if agent_config['agent_type'] == 'llm':
                     agent_config.pop('agent_type')
-                    agent = LLMAgent(name=agent_name, **agent_config, queries_df=self.__queries_df,
-                                     warm_start=self.__warm_start)
+                    agent = LLMAgent(name=agent_name, **agent_config, queries_df=queries_df,
+                                     warm_start=self.__warm_start, lazy_players=bool(self.__game_window))
                 elif agent_config['agent_type'] == 'static':
                     agent_config.pop('agent_type')
-                    agent = StaticAgent(name=agent_name, queries_df=self.__queries_df, warm_start=self.__warm_start)
+                    agent = StaticAgent(name=agent_name, queries_df=queries_df, warm_start=self.__warm_start,
+                                        lazy_players=bool(self.__game_window))
 
                 self.__agents.append(agent)
             self.__logger.info(f"{len(self.__agents)} agents initialized successfully.")
@@ -120,14 +223,79 @@ class Competition:
         """
         try:
             self.__rounds = self.__game_config[CONFIG_GAME_ROUNDS_HEADER]
-            self.__games = {query_id: Game(query_info=query_info, agents=self.__agents, ranker=self.ranker,
-                                           **self.__game_config, warm_start=self.__warm_start)
-                            for query_id, query_info in self.__queries_df.iterrows()}
+            if self.__game_window:
+                self.__logger.info(f"Games will be built in windows of {self.__game_window} games.")
+                return
+            self.__games = self.__build_games(self.__queries_df)
             self.__logger.info(f"{len(self.__games)} games initialized successfully.")
         except KeyError as e:
             self.__logger.error(f"Error initializing games: {e}")
             raise
 
+    def __build_games(self, queries_df: pd.DataFrame) -> dict:
+        """
+        Build the games of queries, in the competition's history store.
+
+        :param queries_df: DataFrame containing the queries.
+        :return: Dictionary of the games by row label of the queries.
+        """
+        return {query_id: Game(query_info=query_info, agents=self.__agents, ranker=self.ranker, **self.__game_config,
+                               warm_start=self.__warm_start, history_store=self.__history_store,
+                               journal=self.__journal)
+                for query_id, query_info in queries_df.iterrows()}
+
+    def __game_windows(self):
+        """
+        Iterate over the games of a game-by-game competition: every game at once, or window by window with a game
+        window. A window's players and games are built in a history store of their own when the window starts; once
+        its games are over, the window's history is appended to the output files and the window is released, so the
+        memory of the competition does not grow with the number of queries.
+
+        :return: Generator of dictionaries of games by row label of the queries.
+        """
+        if not self.__game_window:
+            yield self.__games
+            return
+
+        for start in range(0, len(self.__queries_df), self.__game_window):
+            with self.__metrics.timer(STAGE_SETUP):
+                queries_df = self.__queries_df.iloc[start:start + self.__game_window]
+                queries = queries_df.astype(object).values
+                for agent in self.__agents:
+                    agent.build_players(queries)
+                self.__history_store = RoundStore(self.__delta_documents)
+                self.__games = self.__build_games(queries_df)
+                if self.__journal:
+                    self.__journal.record_games(self.__history_store)
+            self.__logger.info(f"Window of {len(self.__games)} games built, from query {start}.")
+
+            yield self.__games
+
+            self.__write_window(self.__history_store.view())
+            for agent in self.__agents:
+                agent.retire_players(queries_df[QUERY_DF_QUERY_ID_COLUMN].tolist())
+            self.__games = {}
+            self.__history_store = RoundStore(self.__delta_documents)
+
+    def __save_history(self, combined_history: pd.DataFrame, output_folder: str):
+        """
+        Save the combined game history in the configured format (CSV, or Parquet with an optional CSV export).
+
+        :param combined_history: DataFrame containing the combined game history.
+        :param output_folder: Path to the output folder.
+        """
+        history_format = self.__competition_config.get(CONFIG_HISTORY_FORMAT_HEADER, HISTORY_FORMAT_CSV)
+        if history_format == HISTORY_FORMAT_PARQUET:
+            with HistoryWriter(os.path.join(output_folder, COMPETITION_HISTORY_PARQUET_FILE_NAME),
+                               delta_documents=self.__delta_documents) as writer:
+                writer.write(combined_history)
+            if not self.__competition_config.get(CONFIG_HISTORY_CSV_EXPORT_HEADER, False):
+                return
+        elif history_format != HISTORY_FORMAT_CSV:
+            raise ValueError(f"Unknown history format: {history_format}")
+
+        combined_history.to_csv(os.path.join(output_folder, COMPETITION_HISTORY_FILE_NAME), index=False)
+
     def __create_trec_text(self, combined_history: pd.DataFrame, output_folder: str):
         """
         Create a TREC text file from the combined game history.
@@ -136,150 +304,565 @@ class Competition:
         :param output_folder: Path to the output folder.
         """
         try:
-            trec_parser = TrecParser([combined_history])
-            agents_mapping = trec_parser.create_agent_mapping()
-
-            combined_history[HISTORY_DOCNO_COLUMN] = combined_history.apply(
-                lambda row: f"ROUND-{row[HISTORY_ROUND_COLUMN]:02d}-{row[HISTORY_QUERY_ID_COLUMN]}"
-                            f"-{agents_mapping[row[HISTORY_PLAYER_COLUMN]]:02d}", axis=1)
-            combined_history.to_csv(os.path.join(output_folder, COMPETITION_HISTORY_FILE_NAME), index=False)
-            self.__logger.info("Competition history saved successfully.")
-
-            trec_parser.create_trectext(os.path.join(output_folder, TRECTEXT_FILE_NAME))
-            self.__logger.info("TREC text file created successfully.")
+            with self.__metrics.timer(STAGE_HISTORY_IO):
+                trec_parser = TrecParser([combined_history])
+                combined_history[HISTORY_DOCNO_COLUMN] = trec_parser.create_docnos().values
+                self.__save_history(combined_history, output_folder)
+                self.__logger.info("Competition history saved successfully.")
+
+                if self.__trectext_writer is not None:
+                    self.__trectext_writer.close()
+                    self.__logger.info("TREC text file was streamed during the competition.")
+                else:
+                    trec_parser.create_trectext(os.path.join(output_folder, TRECTEXT_FILE_NAME))
+                    self.__logger.info("TREC text file created successfully.")
         except Exception as e:
             self.__logger.error(f"Error creating TREC text file: {e}")
             raise
 
-    def round_by_round_competition(self):
+    def __setup_trectext_stream(self, output_folder: str):
         """
-        Run the competition in a round-by-round manner.
+        Open the TREC text file for streaming if configured, and write the documents already in the history
+        (the initial documents, or the warm-start history).
+
+        :param output_folder: Path to the output folder.
         """
-        try:
-            # Iterate through each round
-            if self.__warm_start:
-                last_query_id, last_round = self.__warm_start.get_last_run()
-                first_round = last_round + 1
-                self.__games_history = []
+        if not self.__competition_config.get(CONFIG_STREAM_TRECTEXT_HEADER, False):
+            return
 
-                # Init the game history for the last run
-                for game in self.__games:
-                    self.__games_history.append(self.__games[game].get_game_history())
+        self.__agents_mapping = {agent.name: idx for idx, agent in enumerate(self.__agents)}
+        self.__trectext_writer = TrecTextWriter(os.path.join(output_folder, TRECTEXT_FILE_NAME))
+        history = self.__history_store.view()
+        self.__trectext_writer.write_documents(build_docnos(history, self.__agents_mapping),
+                                               history[HISTORY_DOCUMENT_COLUMN])
+        self.__trectext_writer.flush()
 
-                self.__logger.info(f"Resuming competition from query ID: {last_query_id}, round: {last_round}")
-            else:
-                first_round = 1
+    def __setup_window_outputs(self, output_folder: str):
+        """
+        Open the history and TREC text files the windows of games are appended to.
 
-            for round_number in range(first_round, self.__rounds + 1):
-                # Initialize storage for the documents and round data
-                round_dfs = []
-                documents_prompts = []
+        :param output_folder: Path to the output folder.
+        """
+        self.__agents_mapping = {agent.name: idx for idx, agent in enumerate(self.__agents)}
+        self.__trectext_writer = TrecTextWriter(os.path.join(output_folder, TRECTEXT_FILE_NAME))
+        history_format = self.__competition_config.get(CONFIG_HISTORY_FORMAT_HEADER, HISTORY_FORMAT_CSV)
+        if history_format == HISTORY_FORMAT_PARQUET:
+            self.__history_writer = HistoryWriter(
+                os.path.join(output_folder, COMPETITION_HISTORY_PARQUET_FILE_NAME),
+                delta_documents=self.__delta_documents)
+        elif history_format != HISTORY_FORMAT_CSV:
+            raise ValueError(f"Unknown history format: {history_format}")
+
+        # The CSV history is written from scratch, a window at a time
+        csv_path = os.path.join(output_folder, COMPETITION_HISTORY_FILE_NAME)
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+
+    def __write_window(self, history: pd.DataFrame):
+        """
+        Append the history of a finished window of games to the history and TREC text files.
 
-                # Generate documents for each game and store them in documents_prompts
-                for game in self.__games:
-                    documents_prompts.append(self.__games[game].generate_documents())
+        :param history: DataFrame containing the history of the window.
+        """
+        with self.__metrics.timer(STAGE_HISTORY_IO):
+            history[HISTORY_DOCNO_COLUMN] = build_docnos(history, self.__agents_mapping).values
+            if self.__history_writer is not None:
+                self.__history_writer.write(history)
+            if self.__history_writer is None or self.__competition_config.get(CONFIG_HISTORY_CSV_EXPORT_HEADER, False):
+                csv_path = os.path.join(self.output_folder, COMPETITION_HISTORY_FILE_NAME)
+                history.to_csv(csv_path, mode="a", header=not os.path.exists(csv_path), index=False)
+            self.__trectext_writer.write_documents(history[HISTORY_DOCNO_COLUMN], history[HISTORY_DOCUMENT_COLUMN])
+            self.__trectext_writer.flush()
+
+    def __close_window_outputs(self):
+        """
+        Close the history and TREC text files of the windows of games.
+        """
+        if self.__history_writer is not None:
+            self.__history_writer.close()
+            self.__history_writer = None
+        self.__trectext_writer.close()
+        self.__logger.info("Competition history and TREC text file were written window by window.")
 
-                # If index-based ranker is used, add new documents to the index
-                if self.__index_based_ranker:
-                    documents_df = pd.DataFrame(columns=[HISTORY_DOCNO_COLUMN, HISTORY_DOCUMENT_COLUMN])
-                    for game in self.__games:
-                        for player_id, player in enumerate(self.__agents):
-                            docno = f"{game}-{round_number}-{player_id}"
-                            document = documents_prompts[game][player_id][0]
-                            documents_df = pd.concat([documents_df, pd.DataFrame(
-                                    {HISTORY_DOCNO_COLUMN: docno, HISTORY_DOCUMENT_COLUMN: document}, index=[0])],
-                                ignore_index=True)
-
-                    # Add the documents to the index
-                    self.ranker.add_document(documents_df)
-
-                # Process each game's documents, rank players, and update histories
-                for idx, game in enumerate(self.__games):
-                    # Rank players based on the documents generated
-                    if self.__index_based_ranker:
-                        # Find the document IDs for the current game
-                        docnos = documents_df[documents_df[HISTORY_DOCNO_COLUMN].apply(
-                            lambda x: x.split("-")[0]) == str(game)].docno.tolist()
-                        ranked_players = self.__games[game].rank_documents(documents_prompts[idx], docnos)
-                    else:
-                        ranked_players = self.__games[game].rank_documents(documents_prompts[idx])
+    def __stream_round(self, games_round_rows: list):
+        """
+        Append the documents of a ranked round to the streamed TREC text file.
+
+        :param games_round_rows: List of (game, round rows) tuples.
+        """
+        # With game windows, the TREC text file is written a window at a time
+        if self.__trectext_writer is None or self.__game_window:
+            return
+
+        with self.__metrics.timer(STAGE_HISTORY_IO):
+            docnos, documents = [], []
+            for game, round_rows in games_round_rows:
+                query_id = game.get_query_id()
+                for round_number, player_name, document, *_ in round_rows:
+                    docnos.append(f"ROUND-{round_number:02d}-{query_id}-{self.__agents_mapping[player_name]:02d}")
+                    documents.append(document)
+
+            self.__trectext_writer.write_documents(docnos, documents)
+            self.__trectext_writer.flush()
+
+    def __write_metrics(self, round_number: int, **info):
+        """
+        Close the round in the competition metrics and write them to the output folder, if metrics are enabled.
+
+        :param round_number: Number of the round.
+        :param info: Additional information to store with the round.
+        """
+        if not self.__metrics.enabled:
+            return
 
-                    # Store round history and update game histories
-                    round_dfs.append(self.__games[game].create_round_history(ranked_players))
-                    self.__games[game].increase_round()
+        self.__metrics.end_round(round_number, **info)
+        self.__metrics.write(self.output_folder)
 
-                    # Update the game's history for subsequent rounds
-                    if round_number > 1:
-                        self.__games_history[idx] = self.__games[game].get_game_history()
-                    else:
-                        self.__games_history.append(self.__games[game].get_game_history())
+    def __reindex_game(self, game: Game):
+        """
+        Add the documents of the rounds a game played before a resume to the index, with the document IDs they
+        were ranked under in game-by-game mode.
+
+        :param game: Game to reindex.
+        """
+        history = self.__history_store.view(game.get_query_id())
+        history = history[history[HISTORY_ROUND_COLUMN] > 0]
+        agents_mapping = {agent.name: idx for idx, agent in enumerate(self.__agents)}
+        docnos = [f"{round_number}-{agents_mapping[player_name]}" for round_number, player_name in
+                  zip(history[HISTORY_ROUND_COLUMN].tolist(), history[HISTORY_PLAYER_COLUMN].tolist())]
+        with self.__metrics.timer(STAGE_INDEXING):
+            self.ranker.add_document(pd.DataFrame({HISTORY_DOCNO_COLUMN: docnos,
+                                                   HISTORY_DOCUMENT_COLUMN: history[HISTORY_DOCUMENT_COLUMN].values}))
+
+    def __agent_major_order(self) -> list:
+        """
+        Order the agents so that the agents of the same model generate one after the other, the models in the order
+        of their first agent.
+
+        :return: List of the agents' indexes, grouped by model.
+        """
+        models = {}
+        for index, agent in enumerate(self.__agents):
+            models.setdefault(self.__model_name(index), []).append(index)
+        return [index for indexes in models.values() for index in indexes]
+
+    def __model_name(self, index: int) -> str:
+        """
+        Get the name of the model an agent generates with.
+
+        :param index: Index of the agent.
+        :return: Name of the model, None for agents without an LLM.
+        """
+        return getattr(getattr(self.__agents[index], 'llm', None), 'model_name', None)
+
+    def __next_generation_order(self) -> list:
+        """
+        Get the order of the agents for the next generation step (a round, or a round of a game). With the model
+        manager, the order is reversed at every step, so a step starts with the model the previous step ended with,
+        which is still resident.
+
+        :return: List of the agents' indexes, None for the agents' order.
+        """
+        order = self.__generation_order
+        if order and get_model_manager().enabled:
+            self.__generation_order = order[::-1]
+        return order
+
+    def __submit_agent_major(self, games: list, order: list) -> dict:
+        """
+        Start the generations of a round agent by agent rather than game by game: each agent generates the documents
+        of all its games, and the agents of the same model follow each other, so a model runs all its prompts
+        consecutively (and together through a generation server, with a generation concurrency).
 
-                # Set updated history for each agent and update game histories with round data
-                for idx, game in enumerate(self.__games):
+        :param games: IDs of the games playing the round.
+        :param order: Order of the agents, grouped by model.
+        :return: Dictionary of the futures of the generated documents and prompts by game, in the players' order.
+        """
+        self.__logger.info(f"Generating documents agent by agent for {len(games)} games")
+        manager = get_model_manager()
+        models = [self.__model_name(index) for index in order]
+        futures = {game: [None] * len(self.__agents) for game in games}
+        for position, index in enumerate(order):
+            # While a model generates, the weights of the next one are read ahead for its load
+            if manager.enabled and not self.__executor and (position == 0 or models[position] != models[position - 1]):
+                next_model = next((model for model in models[position:] if model != models[position]), None)
+                if next_model:
+                    manager.prefetch(next_model)
+            for game in games:
+                futures[game][index] = self.__games[game].submit_document(index, self.__executor)
+        return futures
+
+    def round_by_round_competition(self):
+        """
+        Run the competition in a round-by-round manner.
+        """
+        # Rank each game on a ranking thread as soon as its documents are generated, while the next games generate.
+        # Index-based rankers need the documents of every game of the round in the index first, so they rank after
+        # the generation as usual.
+        pipeline = self.__competition_config.get(CONFIG_PIPELINE_HEADER, False) and not self.__index_based_ranker
+        ranking_executor = ThreadPoolExecutor(max_workers=1) if pipeline else None
+        try:
+            # Iterate through each round, from the earliest round a game has not played yet
+            first_round = min((game.get_round() for game in self.__games.values()), default=1)
+            if self.__warm_start:
+                self.__logger.info(f"Resuming competition from round: {first_round}")
+
+            for round_number in range(first_round, self.__rounds + 1):
+                with self.__metrics.timer(STAGE_ROUND):
+                    # Initialize storage for the documents and round data, for the games playing this round
+                    # (after a resume, games that already committed the round wait for the others). Converged games
+                    # carry their final round forward without generating or ranking.
+                    games = [game for game in self.__games if self.__games[game].get_round() == round_number]
+                    converged = [game for game in games if self.__games[game].is_converged()]
+                    games = [game for game in games if game not in converged]
+                    converged_rows = [(self.__games[game], self.__games[game].carry_forward()) for game in converged]
+                    round_rows = []
+                    registry = RoundDocumentRegistry(round_number)
+
+                    # Generate documents for each game and register them for ranking (with a generation
+                    # concurrency, the generations of every game of the round are in flight together)
+                    order = self.__next_generation_order()
+                    if order:
+                        futures = self.__submit_agent_major(games, order)
+                    elif self.__executor:
+                        futures = {game: self.__games[game].submit_documents(self.__executor) for game in games}
+                    else:
+                        futures = {}
+                    rankings = {}
+                    for game in games:
+                        documents_futures = futures[game] if game in futures else \
+                            self.__games[game].submit_documents()
+                        registry.register(game, self.__games[game].collect_documents(documents_futures))
+                        if ranking_executor:
+                            # Games are ranked in order on a single thread, so the ranker's tie-breaking draws stay
+                            # the same as without pipelining
+                            rankings[game] = ranking_executor.submit(self.__games[game].rank_documents,
+                                                                     registry.get_documents_prompts(game))
+
+                    # If index-based ranker is used, add new documents to the index
+                    if self.__index_based_ranker and games:
+                        with self.__metrics.timer(STAGE_INDEXING):
+                            self.ranker.add_document(registry.to_frame())
+
+                    # Process each game's documents, rank players, and create the round histories
+                    for game in games:
+                        if ranking_executor:
+                            ranked_players = rankings[game].result()
+                        else:
+                            # Rank players based on the documents generated, by document ID for index-based rankers
+                            docnos = registry.get_docnos(game) if self.__index_based_ranker else None
+                            ranked_players = self.__games[game].rank_documents(
+                                registry.get_documents_prompts(game), docnos)
+
+                        # Store round history
+                        round_rows.append(self.__games[game].create_round_history(ranked_players))
+                        self.__games[game].increase_round()
+
+                    self.__stream_round([(self.__games[game], round_rows[idx]) for idx, game in enumerate(games)] +
+                                        converged_rows)
+
+                    # Set updated history for each agent and update game histories with round data
                     for agent in self.__agents:
-                        agent.set_history(self.__games_history)
+                        agent.set_history(self.__history_store)
 
-                    self.__games[game].update_game_history(round_dfs[idx])
-                    if round_number == self.__rounds:
-                        self.__games_history[idx] = self.__games[game].get_game_history()
+                    for idx, game in enumerate(games):
+                        self.__games[game].update_game_history(round_rows[idx])
+
+                if self.__journal:
+                    self.__journal.sync()
+                self.__write_metrics(round_number, converged_games=len(converged))
+            self.__summarize_convergence(self.__games.values())
 
         except Exception as e:
             self.__logger.error(
                 f"Error running round-by-round competition: {e}")
             raise
+        finally:
+            if ranking_executor:
+                ranking_executor.shutdown()
 
     def game_by_game_competition(self):
         """
         Run the competition game by game.
         """
-        # Iterate through each game
-        for game in self.__games:
-            if self.__index_based_ranker:
-                # Reset the index for each game
-                index_path = self.ranker.get_index_path()
-                if os.path.exists(index_path):
-                    shutil.rmtree(index_path)
-                    self.ranker.initialize_index()
-
-            # Iterate through each round
-            for round_number in range(1, self.__rounds + 1):
+        # Iterate through each game, window by window with a game window
+        for games in self.__game_windows():
+            for game in games:
+                self.__play_game(game)
+            self.__summarize_convergence(games.values())
+
+    def __play_game(self, game):
+        """
+        Play the rounds of a game left to play, in game-by-game mode.
+
+        :param game: Row label of the game's query.
+        """
+        # Skip the rounds the game already played before a resume
+        first_round = self.__games[game].get_round()
+        if first_round > self.__rounds:
+            return
+
+        if self.__index_based_ranker:
+            # Reset the index for each game
+            index_path = self.ranker.get_index_path()
+            if os.path.exists(index_path):
+                shutil.rmtree(index_path)
+                self.ranker.initialize_index()
+            if first_round > 1:
+                self.__reindex_game(self.__games[game])
+
+        # Iterate through each round
+        for round_number in range(first_round, self.__rounds + 1):
+            # A converged game carries its final round forward through the remaining rounds
+            if self.__games[game].is_converged():
+                self.__carry_game_forward(self.__games[game], round_number)
+                break
+
+            with self.__metrics.timer(STAGE_ROUND):
                 # Generate documents for the current round
-                documents_prompts = self.__games[game].generate_documents()
+                registry = RoundDocumentRegistry(round_number, prefix_game=False)
+                registry.register(game, self.__games[game].generate_documents(self.__executor,
+                                                                              self.__next_generation_order()))
 
                 # If index-based ranker is used, add new documents to the index
                 if self.__index_based_ranker:
-                    documents_df = pd.DataFrame(columns=[HISTORY_DOCNO_COLUMN, HISTORY_DOCUMENT_COLUMN])
-                    for player_id, player in enumerate(self.__agents):
-                        docno = f"{round_number}-{player_id}"
-                        document = documents_prompts[player_id][0]
-                        documents_df = pd.concat([documents_df, pd.DataFrame(
-                                {HISTORY_DOCNO_COLUMN: docno, HISTORY_DOCUMENT_COLUMN: document}, index=[0])],
-                            ignore_index=True)
-
-                    # Add the documents to the index
-                    self.ranker.add_document(documents_df)
-
-                # Rank players based on the documents generated
-                if self.__index_based_ranker:
-                    # Extract the document IDs
-                    docnos = documents_df.docno.tolist()
-                    ranked_players = self.__games[game].rank_documents(documents_prompts, docnos)
-                else:
-                    ranked_players = self.__games[game].rank_documents(documents_prompts)
+                    with self.__metrics.timer(STAGE_INDEXING):
+                        self.ranker.add_document(registry.to_frame())
+
+                # Rank players based on the documents generated, by document ID for index-based rankers
+                docnos = registry.get_docnos(game) if self.__index_based_ranker else None
+                ranked_players = self.__games[game].rank_documents(registry.get_documents_prompts(game), docnos)
 
                 # Create and store round history
-                rounds_df = self.__games[game].create_round_history(ranked_players)
+                round_rows = self.__games[game].create_round_history(ranked_players)
                 self.__games[game].increase_round()
+                self.__stream_round([(self.__games[game], round_rows)])
 
                 # Update the game's history with the new round data
-                self.__games[game].update_game_history(rounds_df)
+                self.__games[game].update_game_history(round_rows)
 
-            # Update the game's history for subsequent rounds
-            self.__games_history.append(self.__games[game].get_game_history())
+            if self.__journal:
+                self.__journal.sync()
+            self.__write_metrics(round_number, query_id=str(self.__games[game].get_query_id()))
 
-            # Set updated history to each agent
-            for agent in self.__agents:
-                agent.set_history(self.__games_history)
+        # Set updated history to each agent
+        for agent in self.__agents:
+            agent.set_history(self.__history_store)
+
+    def __carry_game_forward(self, game: Game, first_round: int):
+        """
+        Carry the final round of a converged game forward through its remaining rounds, in game-by-game mode.
+
+        :param game: Converged game.
+        :param first_round: First round the game does not play.
+        """
+        for round_number in range(first_round, self.__rounds + 1):
+            with self.__metrics.timer(STAGE_ROUND):
+                self.__stream_round([(game, game.carry_forward())])
+            if self.__journal:
+                self.__journal.sync()
+            self.__write_metrics(round_number, query_id=str(game.get_query_id()), converged_games=1)
+
+    def __summarize_convergence(self, games):
+        """
+        Add the games that converged and the generations and rankings they saved to the convergence summary.
+
+        :param games: Games that finished.
+        """
+        for game in games:
+            self.__convergence_summary["games"] += 1
+            if game.get_converged_round() is not None:
+                self.__convergence_summary["converged"] += 1
+                self.__convergence_summary["generations"] += game.get_skipped_rounds() * game.get_players_count()
+                self.__convergence_summary["rankings"] += game.get_skipped_rounds()
+
+    def __log_convergence(self):
+        """
+        Log the games that converged and the generations and rankings they saved.
+        """
+        summary = self.__convergence_summary
+        if not summary["converged"]:
+            return
+        self.__logger.info(f"{summary['converged']} of {summary['games']} games converged, saving "
+                           f"{summary['generations']} generations and {summary['rankings']} rankings")
+
+    def __shard_config(self, queries_path: str, shard_folder: str, shards: int, cores: list = None) -> dict:
+        """
+        Build the configuration of a shard: the competition configuration restricted to the shard's queries,
+        run in a single process, with a journal of a previous run resumed from the matching shard.
+
+        :param queries_path: Path to the shard's queries CSV file.
+        :param shard_folder: Name of the shard's folder.
+        :param shards: Number of shards.
+        :param cores: Cores of the shard's process, if the cores are partitioned between the shards.
+        :return: Configuration dictionary of the shard.
+        """
+        config = copy.deepcopy(self.__config)
+        competition_config = config[CONFIG_COMPETITION_HEADER]
+        competition_config[QUERIES_DF_PATH_HEADER] = queries_path
+        competition_config[CONFIG_WORKERS_HEADER] = 1
+        if cores:
+            competition_config[CONFIG_RESOURCES_HEADER] = {CONFIG_RESOURCES_CORES_HEADER: cores,
+                                                           CONFIG_RESOURCES_THREADS_HEADER: len(cores)}
+        # The shards' processes share the memory budget of the models
+        if competition_config.get(CONFIG_MODEL_MEMORY_BUDGET_HEADER):
+            competition_config[CONFIG_MODEL_MEMORY_BUDGET_HEADER] /= shards
+        resume_path = competition_config.get(CONFIG_JOURNAL_RESUME_PATH_HEADER)
+        if resume_path:
+            competition_config[CONFIG_JOURNAL_RESUME_PATH_HEADER] = os.path.join(
+                os.path.dirname(resume_path), SHARDS_FOLDER, shard_folder, os.path.basename(resume_path))
+        return config
+
+    def sharded_competition(self, output_folder: str, workers: int) -> pd.DataFrame:
+        """
+        Run the competition in worker processes, each running the games of a shard of the queries with its own
+        models, and merge the shards' histories in query order.
+
+        :param output_folder: Path to the output folder.
+        :param workers: Number of worker processes.
+        :return: DataFrame containing the merged competition history.
+        """
+        try:
+            shards = partition_queries(self.__queries_df, workers, self.__game_config["max_tokens"])
+
+            # Each shard's process runs on a slice of the cores, so the shards' models do not oversubscribe them
+            shard_cores = [None] * len(shards)
+            if self.__competition_config.get(CONFIG_PARTITION_CORES_HEADER, False):
+                resources = self.__competition_config.get(CONFIG_RESOURCES_HEADER) or {}
+                shard_cores = split_cores(len(shards), resources.get(CONFIG_RESOURCES_CORES_HEADER))
+                self.__logger.info(f"Cores of the shards: {shard_cores}")
+
+            shard_args = []
+            for shard, shard_queries_df in enumerate(shards):
+                shard_folder = SHARD_FOLDER_FORMAT.format(shard)
+                shard_output_folder = os.path.join(output_folder, SHARDS_FOLDER, shard_folder)
+                os.makedirs(shard_output_folder, exist_ok=True)
+                queries_path = os.path.join(shard_output_folder, SHARD_QUERIES_FILE_NAME)
+                shard_queries_df.to_csv(queries_path, index=False)
+                shard_args.append((self.__shard_config(queries_path, shard_folder, len(shards), shard_cores[shard]),
+                                   shard_output_folder, self.ranker))
+            self.__logger.info(f"Running {len(self.__queries_df)} games in {len(shards)} shards of "
+                               f"{[len(shard_queries_df) for shard_queries_df in shards]} games.")
+
+            # Every shard runs in a fresh process, so its models, logs and metrics are its own
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(len(shards), maxtasksperchild=1) as pool:
+                histories = pool.starmap(run_shard, shard_args, chunksize=1)
+
+            return merge_histories(histories, self.__queries_df)
+        except Exception as e:
+            self.__logger.error(f"Error running sharded competition: {e}")
+            raise
+
+    def __check_distributed(self):
+        """
+        Check that the configuration can run as a distributed competition.
+        """
+        if self.__warm_start:
+            raise ValueError("Warm start is not supported in distributed mode.")
+        if isinstance(self.ranker, IndexRanker) or 'okapi' in self.__competition_config[CONFIG_RANKERS_HEADER]:
+            raise ValueError("Index-based rankers are not supported in distributed mode.")
+        if self.__game_config.get(CONFIG_CONVERGENCE_HEADER):
+            raise ValueError("Convergence policies are not supported in distributed mode.")
+
+    def build_worker(self, queue: TaskQueue, output_folder: str, **worker_args) -> DistributedWorker:
+        """
+        Set up the ranker and agents of the competition submitted to a queue, to process its tasks.
+
+        :param queue: TaskQueue of the competition.
+        :param output_folder: Output folder of the worker.
+        :param worker_args: Additional arguments of the DistributedWorker.
+        :return: DistributedWorker instance.
+        """
+        try:
+            self.output_folder = output_folder
+            self.__check_distributed()
+            self.__queries_df = queue.get_queries()
+            get_model_manager().configure(self.__competition_config.get(CONFIG_MODEL_MEMORY_BUDGET_HEADER))
+            self.__setup_ranker()
+            self.__setup_agents()
+            return DistributedWorker(queue, self.__agents, self.ranker, self.__game_config["max_tokens"],
+                                     self.__game_config.get("force_max_tokens", False), **worker_args)
+        except Exception as e:
+            self.__logger.error(f"Error building the distributed worker: {e}")
+            raise
+
+    def distributed_competition(self, output_folder: str) -> pd.DataFrame:
+        """
+        Coordinate a distributed competition: submit its tasks to the queue, start the local workers if any, and wait
+        for the workers (local, or started on other nodes with the queue path) to complete every task.
+
+        :param output_folder: Path to the output folder.
+        :return: DataFrame containing the competition history.
+        """
+        distributed_config = self.__competition_config[CONFIG_DISTRIBUTED_HEADER]
+        queue_path = (distributed_config.get(CONFIG_DISTRIBUTED_QUEUE_PATH_HEADER) or
+                      os.path.join(output_folder, TASK_QUEUE_FILE_NAME))
+        poll_seconds = distributed_config.get(CONFIG_DISTRIBUTED_POLL_SECONDS_HEADER, DEFAULT_TASK_POLL_SECONDS)
+        self.__check_distributed()
+
+        queue = TaskQueue(queue_path, distributed_config.get(CONFIG_DISTRIBUTED_LEASE_SECONDS_HEADER,
+                                                             DEFAULT_TASK_LEASE_SECONDS),
+                          distributed_config.get(CONFIG_DISTRIBUTED_MAX_ATTEMPTS_HEADER, DEFAULT_TASK_MAX_ATTEMPTS))
+        workers = []
+        try:
+            try:
+                config = json.dumps(self.__config)
+            except TypeError:
+                config = None
+                self.__logger.warning("The configuration is not JSON serializable, only local workers can run.")
+            queue.submit(self.__queries_df, list(self.__agents_config), self.__game_config[CONFIG_GAME_ROUNDS_HEADER],
+                         config)
+
+            context = multiprocessing.get_context("spawn")
+            for worker in range(distributed_config.get(CONFIG_DISTRIBUTED_LOCAL_WORKERS_HEADER, 0)):
+                process = context.Process(target=run_worker, args=(queue_path, f"local-{worker:02d}",
+                                                                   self.__config, self.ranker))
+                process.start()
+                workers.append(process)
+            self.__logger.info(f"Competition submitted to {queue_path}, {len(workers)} local workers started.")
+
+            # Wait for the workers to complete every task
+            progress = None
+            while not queue.is_finished():
+                if workers and not any(process.is_alive() for process in workers):
+                    raise RuntimeError("Every local worker exited before the competition was over.")
+                if queue.get_progress() != progress:
+                    progress = queue.get_progress()
+                    self.__logger.info(f"Task progress: {progress}")
+                time.sleep(poll_seconds)
+
+            for process in workers:
+                process.join()
+            errors = queue.get_errors()
+            if errors:
+                raise RuntimeError(f"{len(errors)} tasks failed, first failure: {errors[0]}")
+            self.__logger.info(f"Distributed competition over: {queue.get_progress().get(TASK_DONE, 0)} tasks done.")
+            return queue.get_history()
+        except Exception as e:
+            self.__logger.error(f"Error running distributed competition: {e}")
+            for process in workers:
+                process.terminate()
+            raise
+        finally:
+            queue.close()
+
+    def get_history(self) -> pd.DataFrame:
+        """
+        Get the competition history.
+
+        :return: DataFrame copy of the competition history (with game windows, the history read back from the output
+                 folder).
+        """
+        if self.__game_window:
+            history_format = self.__competition_config.get(CONFIG_HISTORY_FORMAT_HEADER, HISTORY_FORMAT_CSV)
+            if history_format == HISTORY_FORMAT_PARQUET:
+                return HistoryReader(os.path.join(self.output_folder, COMPETITION_HISTORY_PARQUET_FILE_NAME)).read()
+            history = pd.read_csv(os.path.join(self.output_folder, COMPETITION_HISTORY_FILE_NAME),
+                                  float_precision="round_trip")
+            history[HISTORY_RANK_COLUMN] = history[HISTORY_RANK_COLUMN].astype("Int64")
+            return history
+        return self.__history_store.view()
 
     def run_competition(self, output_folder: str):
         """
@@ -290,16 +873,69 @@ class Competition:
         """
         try:
             self.output_folder = output_folder
-            self.__setup_competition()
+            if self.__competition_config.get(CONFIG_DISTRIBUTED_HEADER):
+                self.__setup_queries()
+                self.__logger.info("Starting distributed competition...")
+                self.__create_trec_text(self.distributed_competition(output_folder), output_folder)
+                return
+
+            workers = self.__competition_config.get(CONFIG_WORKERS_HEADER, 1)
+            if workers > 1:
+                self.__setup_queries()
+                self.__logger.info("Starting sharded competition...")
+                self.__create_trec_text(self.sharded_competition(output_folder, workers), output_folder)
+                return
+
+            # The models of the process (and the threads they start) run on the competition's cores
+            resources = self.__competition_config.get(CONFIG_RESOURCES_HEADER)
+            if resources:
+                pin_current_thread(resources.get(CONFIG_RESOURCES_CORES_HEADER),
+                                   resources.get(CONFIG_RESOURCES_THREADS_HEADER))
+
+            # Load the LLMs on demand within the memory budget, if any
+            get_model_manager().configure(self.__competition_config.get(CONFIG_MODEL_MEMORY_BUDGET_HEADER))
+
+            with self.__metrics.timer(STAGE_SETUP):
+                self.__setup_competition()
+                if self.__game_window:
+                    self.__setup_window_outputs(output_folder)
+                else:
+                    self.__setup_trectext_stream(output_folder)
+
+            # Players generate concurrently, so a generation server can batch their requests
+            concurrency = self.__competition_config.get(CONFIG_GENERATION_CONCURRENCY_HEADER,
+                                                        DEFAULT_GENERATION_CONCURRENCY)
+            if concurrency > 1:
+                self.__executor = ThreadPoolExecutor(max_workers=concurrency)
+
+            # The model manager loads a model once per round when its agents generate one after the other
+            if self.__competition_config.get(CONFIG_AGENT_MAJOR_HEADER, False) or get_model_manager().enabled:
+                self.__generation_order = self.__agent_major_order()
+                self.__logger.info(f"Agent-major generation order: "
+                                   f"{[self.__agents[index].name for index in self.__generation_order]}")
             self.__logger.info("Starting competition...")
 
             if self.__competition_config[CONFIG_ROUND_BY_ROUND_HEADER]:
                 self.round_by_round_competition()
             else:
                 self.game_by_game_competition()
+            self.__log_convergence()
 
-            competition_history = pd.concat(self.__games_history, ignore_index=True)
-            self.__create_trec_text(competition_history, output_folder)
+            if self.__game_window:
+                self.__close_window_outputs()
+            else:
+                self.__create_trec_text(self.__history_store.view(), output_folder)
+            if self.__metrics.enabled:
+                self.__metrics.write(output_folder)
         except Exception as e:
             self.__logger.error(f"Error running competition: {e}")
             raise
+        finally:
+            if self.__executor:
+                self.__executor.shutdown()
+                self.__executor = None
+            close_generation_servers()
+            if get_model_manager().enabled:
+                get_model_manager().unload_all()
+            if self.__journal:
+                self.__journal.close()
@@ -0,0 +1,103 @@
+from constants.constants import (GAME_HISTORY_COLUMNS, HISTORY_ROUND_COLUMN, HISTORY_PLAYER_COLUMN,
+                                 HISTORY_DOCUMENT_COLUMN, HISTORY_RANK_COLUMN, HISTORY_SCORE_COLUMN,
+                                 DEFAULT_CONVERGENCE_PATIENCE)
+
+ROUND_POSITION = GAME_HISTORY_COLUMNS.index(HISTORY_ROUND_COLUMN)
+PLAYER_POSITION = GAME_HISTORY_COLUMNS.index(HISTORY_PLAYER_COLUMN)
+DOCUMENT_POSITION = GAME_HISTORY_COLUMNS.index(HISTORY_DOCUMENT_COLUMN)
+RANK_POSITION = GAME_HISTORY_COLUMNS.index(HISTORY_RANK_COLUMN)
+SCORE_POSITION = GAME_HISTORY_COLUMNS.index(HISTORY_SCORE_COLUMN)
+
+
+def edit_distance(document: str, other: str) -> float:
+    """
+    Compute the word-level edit distance between two documents, normalized by the length of the longer one.
+
+    :param document: First document.
+    :param other: Second document.
+    :return: Normalized edit distance, between 0 (same words) and 1.
+    """
+    words, other_words = str(document or "").split(), str(other or "").split()
+    if not words or not other_words:
+        return float(words != other_words)
+
+    previous = list(range(len(other_words) + 1))
+    for i, word in enumerate(words, 1):
+        current = [i]
+        for j, other_word in enumerate(other_words, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other_word)))
+        previous = current
+    return previous[-1] / max(len(words), len(other_words))
+
+
+class ConvergencePolicy:
+    """
+        Class responsible for deciding when a game has converged, from the rounds it played: the rankings stayed the
+        same for rank_stable_rounds rounds, or, for patience rounds, every document changed by at most
+        max_edit_distance or every score by at most max_score_delta. Any of the configured triggers ends the game.
+    """
+
+    def __init__(self, rank_stable_rounds: int = None, max_edit_distance: float = None,
+                 max_score_delta: float = None, patience: int = DEFAULT_CONVERGENCE_PATIENCE, min_rounds: int = 1):
+        """
+        Initialize the ConvergencePolicy.
+
+        :param rank_stable_rounds: Number of rounds with unchanged rankings after which the game converges.
+        :param max_edit_distance: Normalized word-level edit distance under which a document is considered unchanged.
+        :param max_score_delta: Score change under which a score is considered unchanged.
+        :param patience: Number of rounds the documents or scores must stay unchanged for the game to converge.
+        :param min_rounds: Minimum number of rounds played before the game may converge.
+        """
+        if rank_stable_rounds is None and max_edit_distance is None and max_score_delta is None:
+            raise ValueError("A convergence policy needs rank_stable_rounds, max_edit_distance or max_score_delta")
+        self.__rank_stable_rounds = rank_stable_rounds
+        self.__max_edit_distance = max_edit_distance
+        self.__max_score_delta = max_score_delta
+        self.__patience = patience
+        self.__min_rounds = min_rounds
+        self.__previous = None
+        self.__stable = {"rank": 0, "edit_distance": 0, "score_delta": 0}
+        self.reason = None
+
+    def update(self, round_rows: list) -> bool:
+        """
+        Observe the rows of a round played by the game (the rows of the initial documents are ignored).
+
+        :param round_rows: List of history rows of the round, ordered like GAME_HISTORY_COLUMNS.
+        :return: Whether the game has converged.
+        """
+        if not round_rows or round_rows[0][ROUND_POSITION] == 0:
+            return self.reason is not None
+
+        rows = {row[PLAYER_POSITION]: row for row in round_rows}
+        if self.__previous is not None and rows.keys() == self.__previous.keys():
+            pairs = [(row, self.__previous[player]) for player, row in rows.items()]
+            self.__count("rank", all(row[RANK_POSITION] == previous[RANK_POSITION] for row, previous in pairs))
+            if self.__max_edit_distance is not None:
+                self.__count("edit_distance", all(
+                    edit_distance(row[DOCUMENT_POSITION], previous[DOCUMENT_POSITION]) <= self.__max_edit_distance
+                    for row, previous in pairs))
+            if self.__max_score_delta is not None:
+                self.__count("score_delta", all(
+                    row[SCORE_POSITION] is not None and previous[SCORE_POSITION] is not None
+                    and abs(row[SCORE_POSITION] - previous[SCORE_POSITION]) <= self.__max_score_delta
+                    for row, previous in pairs))
+        self.__previous = rows
+
+        if self.reason is None and round_rows[0][ROUND_POSITION] >= self.__min_rounds:
+            if self.__rank_stable_rounds is not None and self.__stable["rank"] >= self.__rank_stable_rounds:
+                self.reason = "rank"
+            elif self.__max_edit_distance is not None and self.__stable["edit_distance"] >= self.__patience:
+                self.reason = "edit_distance"
+            elif self.__max_score_delta is not None and self.__stable["score_delta"] >= self.__patience:
+                self.reason = "score_delta"
+        return self.reason is not None
+
+    def __count(self, trigger: str, stable: bool) -> None:
+        """
+        Count the consecutive rounds a trigger's condition held.
+
+        :param trigger: Name of the trigger.
+        :param stable: Whether the condition held in the round.
+        """
+        self.__stable[trigger] = self.__stable[trigger] + 1 if stable else 0
@@ -0,0 +1,202 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from competition.task_queue import TaskQueue
+from competition.warm_start import WarmStart
+from rankers.ranker import Ranker
+from utils.logger import setup_logger, set_competition_hash_folder, configure_logging, shutdown_logging
+from utils.metrics import get_metrics
+from constants.constants import (DISTRIBUTED_WORKER_LOG_FILE, DISTRIBUTED_WORKER_LOG_NAME, TASK_GENERATION,
+                                 METRIC_DOCUMENTS, DEFAULT_TASK_LEASE_SECONDS, DEFAULT_TASK_MAX_ATTEMPTS,
+                                 DEFAULT_TASK_POLL_SECONDS, CONFIG_COMPETITION_HEADER, CONFIG_DISTRIBUTED_HEADER,
+                                 CONFIG_DISTRIBUTED_LEASE_SECONDS_HEADER, CONFIG_DISTRIBUTED_MAX_ATTEMPTS_HEADER,
+                                 CONFIG_DISTRIBUTED_POLL_SECONDS_HEADER, CONFIG_LOGGING_HEADER,
+                                 QUERY_DF_QUERY_ID_COLUMN, QUERY_DF_QUERY_COLUMN, WORKERS_FOLDER)
+
+
+class DistributedWorker:
+    """
+        Class responsible for processing the tasks of a distributed competition. The worker claims ready tasks from
+        the queue, restores a player's state from the game's ranked rounds (like a warm start) to generate its
+        document, or ranks the documents of a round, and keeps the lease of the task alive while it is processed.
+    """
+
+    def __init__(self, queue: TaskQueue, agents: list, ranker: Ranker, max_tokens: int, force_max_tokens: bool = False,
+                 worker_id: str = None, lease_seconds: float = DEFAULT_TASK_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_TASK_MAX_ATTEMPTS, poll_seconds: float = DEFAULT_TASK_POLL_SECONDS):
+        """
+        Initialize the DistributedWorker.
+
+        :param queue: TaskQueue of the competition.
+        :param agents: List of agent instances, in competition order.
+        :param ranker: Ranker instance used for ranking documents.
+        :param max_tokens: Maximum number of tokens for the generated documents.
+        :param force_max_tokens: Whether to manually restrict the number of tokens in the generated documents.
+        :param worker_id: ID of the worker, the host name and process ID if not provided.
+        :param lease_seconds: Duration of a lease, renewed every third of it while a task is processed.
+        :param max_attempts: Maximum number of attempts of a task.
+        :param poll_seconds: Time to wait before polling again when no task is ready.
+        """
+        self.__queue = queue
+        self.__agents = {agent.name: agent for agent in agents}
+        self.__ranker = ranker
+        self.__max_tokens = max_tokens
+        self.__force_max_tokens = force_max_tokens
+        self.__worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.__lease_seconds = lease_seconds
+        self.__max_attempts = max_attempts
+        self.__poll_seconds = poll_seconds
+        queries_df = queue.get_queries()
+        self.__queries = dict(zip(queries_df[QUERY_DF_QUERY_ID_COLUMN].tolist(),
+                                  queries_df[QUERY_DF_QUERY_COLUMN].tolist()))
+        self.__metrics = get_metrics()
+        self.__logger = setup_logger(DISTRIBUTED_WORKER_LOG_NAME, DISTRIBUTED_WORKER_LOG_FILE)
+
+    def run(self) -> int:
+        """
+        Process tasks until the competition is over.
+
+        :return: Number of tasks processed by the worker.
+        """
+        self.__logger.info(f"Worker {self.__worker_id} started on {self.__queue.path}")
+        processed = 0
+        while True:
+            task = self.__queue.claim(self.__worker_id)
+            if task is None:
+                if self.__queue.is_finished():
+                    break
+                time.sleep(self.__poll_seconds)
+                continue
+
+            task_id, kind, query_id, round_number, agent_name = task
+            stop_heartbeat = threading.Event()
+            heartbeat = threading.Thread(target=self.__heartbeat, args=(task_id, stop_heartbeat), daemon=True)
+            heartbeat.start()
+            try:
+                if kind == TASK_GENERATION:
+                    result = self.__generate(query_id, round_number, agent_name)
+                else:
+                    result = self.__rank(query_id, round_number)
+                if self.__queue.complete(task_id, self.__worker_id, result):
+                    processed += 1
+                else:
+                    self.__logger.warning(f"Lease of task {task_id} was lost, its result was discarded.")
+            except Exception as e:
+                self.__logger.error(f"Error processing {kind} task for query {query_id}, round {round_number}: {e}")
+                self.__queue.fail(task_id, self.__worker_id, f"{type(e).__name__}: {e}")
+            finally:
+                stop_heartbeat.set()
+                heartbeat.join()
+
+        self.__logger.info(f"Worker {self.__worker_id} processed {processed} tasks.")
+        return processed
+
+    def __heartbeat(self, task_id: int, stop: threading.Event) -> None:
+        """
+        Renew the lease of a task until it is processed, through a connection of its own.
+
+        :param task_id: ID of the task.
+        :param stop: Event set once the task is processed.
+        """
+        queue = TaskQueue(self.__queue.path, self.__lease_seconds, self.__max_attempts)
+        try:
+            while not stop.wait(self.__lease_seconds / 3):
+                queue.extend_lease(task_id, self.__worker_id)
+        finally:
+            queue.close()
+
+    def __generate(self, query_id: int, round_number: int, agent_name: str) -> list:
+        """
+        Generate a player's document for a round, after restoring the player's state from the ranked rounds.
+
+        :param query_id: ID of the query.
+        :param round_number: Number of the round.
+        :param agent_name: Name of the player's agent.
+        :return: List of the document, non cleaned document, user prompt and system prompt.
+        """
+        agent = self.__agents[agent_name]
+        agent.warm_start = WarmStart(competition_history_df=self.__queue.get_history(query_id, round_number - 1))
+        player = agent.get_player(query_id)
+        agent.set_player(player, agent_name, query_id)
+
+        with self.__metrics.labels(agent=agent_name):
+            documents_prompt = player.generate_document(self.__max_tokens, force_max_tokens=self.__force_max_tokens)
+            self.__metrics.increment(METRIC_DOCUMENTS)
+        return list(documents_prompt)
+
+    def __rank(self, query_id: int, round_number: int) -> list:
+        """
+        Rank the documents of a round and build its history rows, like a game does.
+
+        :param query_id: ID of the query.
+        :param round_number: Number of the round.
+        :return: List of history rows, ordered like GAME_HISTORY_COLUMNS.
+        """
+        generations = self.__queue.get_generations(query_id, round_number)
+        documents_prompts = [generations[agent_name] for agent_name in self.__agents]
+        ranks, scores = self.__ranker.timed_rank(self.__queries[query_id],
+                                                 [documents_prompt[0] for documents_prompt in documents_prompts])
+
+        round_rows = [[round_number, agent_name, document, non_cleaned_document, rank, score, user_prompt,
+                       system_prompt]
+                      for agent_name, (document, non_cleaned_document, user_prompt, system_prompt), rank, score
+                      in zip(self.__agents, documents_prompts, ranks, scores)]
+        return sorted(round_rows, key=lambda row: row[4], reverse=True)
+
+
+def load_config(queue_path: str) -> dict:
+    """
+    Load the configuration of the competition submitted to a queue.
+
+    :param queue_path: Path to the task queue.
+    :return: Configuration dictionary.
+    """
+    with sqlite3.connect(queue_path) as connection:
+        row = connection.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+    if not row or row[0] is None:
+        raise ValueError(f"The task queue {queue_path} has no JSON configuration, only local workers can serve it.")
+    return json.loads(row[0])
+
+
+def run_worker(queue_path: str, worker_id: str = None, config: dict = None, ranker: Ranker = None) -> int:
+    """
+    Run a worker of a distributed competition, on any node that can reach the queue. The worker loads the models of
+    the configuration submitted to the queue and writes its logs next to the queue.
+
+    :param queue_path: Path to the task queue.
+    :param worker_id: ID of the worker, the host name and process ID if not provided.
+    :param config: Configuration of the competition, loaded from the queue if not provided.
+    :param ranker: Ranker instance to use instead of the configured rankers, if any.
+    :return: Number of tasks processed by the worker.
+    """
+    from competition.competition import Competition
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    config = config if config is not None else load_config(queue_path)
+    distributed_config = config[CONFIG_COMPETITION_HEADER].get(CONFIG_DISTRIBUTED_HEADER) or {}
+
+    worker_folder = os.path.join(os.path.dirname(os.path.abspath(queue_path)), WORKERS_FOLDER, worker_id)
+    os.makedirs(worker_folder, exist_ok=True)
+    set_competition_hash_folder(worker_folder)
+    configure_logging(config.get(CONFIG_LOGGING_HEADER))
+    try:
+        lease_seconds = distributed_config.get(CONFIG_DISTRIBUTED_LEASE_SECONDS_HEADER, DEFAULT_TASK_LEASE_SECONDS)
+        max_attempts = distributed_config.get(CONFIG_DISTRIBUTED_MAX_ATTEMPTS_HEADER, DEFAULT_TASK_MAX_ATTEMPTS)
+        queue = TaskQueue(queue_path, lease_seconds, max_attempts)
+        try:
+            worker = Competition(config, ranker=ranker).build_worker(
+                queue, worker_folder, worker_id=worker_id, lease_seconds=lease_seconds, max_attempts=max_attempts,
+                poll_seconds=distributed_config.get(CONFIG_DISTRIBUTED_POLL_SECONDS_HEADER, DEFAULT_TASK_POLL_SECONDS))
+            processed = worker.run()
+            if get_metrics().enabled:
+                get_metrics().end_round(0, worker=worker_id)
+                get_metrics().write(worker_folder)
+            return processed
+        finally:
+            queue.close()
+    finally:
+        shutdown_logging()
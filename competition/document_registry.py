@@ -0,0 +1,75 @@
+import pandas as pd
+
+from constants.constants import HISTORY_DOCNO_COLUMN, HISTORY_DOCUMENT_COLUMN
+
+
+class RoundDocumentRegistry:
+    """
+        Class responsible for collecting the documents generated in a round and handing them over to the ranker.
+        Every game's documents get their document IDs once, the index batch is built in a single allocation,
+        and the document IDs of a game are looked up in O(1).
+    """
+
+    def __init__(self, round_number: int, prefix_game: bool = True):
+        """
+        Initialize the registry for a round.
+
+        :param round_number: Number of the round the documents were generated in.
+        :param prefix_game: Whether to prefix the document IDs with the game key, needed when the documents of
+                            several games share an index.
+        """
+        self.__round_number = round_number
+        self.__prefix_game = prefix_game
+        self.__documents_prompts = {}
+        self.__docnos = {}
+
+    def __len__(self) -> int:
+        return len(self.__documents_prompts)
+
+    def __iter__(self):
+        return iter(self.__documents_prompts)
+
+    def register(self, game_key, documents_prompts: list) -> list:
+        """
+        Register the generated documents of a game.
+
+        :param game_key: Key of the game in the competition.
+        :param documents_prompts: List of (document, non cleaned document, user prompt, system prompt) tuples,
+                                  one per player, in player order.
+        :return: List of the document IDs assigned to the game's documents.
+        """
+        prefix = f"{game_key}-{self.__round_number}" if self.__prefix_game else f"{self.__round_number}"
+        self.__documents_prompts[game_key] = documents_prompts
+        self.__docnos[game_key] = [f"{prefix}-{player_id}" for player_id in range(len(documents_prompts))]
+        return self.__docnos[game_key]
+
+    def get_documents_prompts(self, game_key) -> list:
+        """
+        Get the generated documents and prompts of a game.
+
+        :param game_key: Key of the game in the competition.
+        :return: List of (document, non cleaned document, user prompt, system prompt) tuples.
+        """
+        return self.__documents_prompts[game_key]
+
+    def get_docnos(self, game_key) -> list:
+        """
+        Get the document IDs of a game.
+
+        :param game_key: Key of the game in the competition.
+        :return: List of document IDs, in player order.
+        """
+        return self.__docnos[game_key]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Build the batch of documents to add to an index.
+
+        :return: DataFrame with the document ID and document columns.
+        """
+        docnos, documents = [], []
+        for game_key, documents_prompts in self.__documents_prompts.items():
+            docnos.extend(self.__docnos[game_key])
+            documents.extend(document_prompt[0] for document_prompt in documents_prompts)
+
+        return pd.DataFrame({HISTORY_DOCNO_COLUMN: docnos, HISTORY_DOCUMENT_COLUMN: documents})
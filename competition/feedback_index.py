@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+import pandas as pd
+
+from constants.constants import (GAME_HISTORY_COLUMNS, HISTORY_ROUND_COLUMN, HISTORY_PLAYER_COLUMN,
+                                 HISTORY_DOCUMENT_COLUMN, HISTORY_RANK_COLUMN, HISTORY_SCORE_COLUMN)
+
+FEEDBACK_COLUMNS = [HISTORY_ROUND_COLUMN, HISTORY_PLAYER_COLUMN, HISTORY_DOCUMENT_COLUMN, HISTORY_RANK_COLUMN,
+                    HISTORY_SCORE_COLUMN]
+FeedbackRecord = namedtuple("FeedbackRecord", FEEDBACK_COLUMNS)
+
+ROW_POSITIONS = [GAME_HISTORY_COLUMNS.index(column) for column in FEEDBACK_COLUMNS]
+
+
+class FeedbackIndex:
+    """
+        Class responsible for indexing a game's ranked documents by round, rank and player.
+        The index is updated incrementally as each round lands, so agents can slice the feedback they need
+        without scanning or copying the game history. An index can keep only the rounds the agents read, so the
+        documents of older rounds are released.
+    """
+
+    def __init__(self, max_rounds: int = None):
+        """
+        Initialize an empty FeedbackIndex.
+
+        :param max_rounds: Number of latest rounds kept in the index, every round if None.
+        """
+        self.__rounds = {}
+        self.__players = {}
+        self.__max_rounds = max_rounds
+
+    @classmethod
+    def from_history(cls, history_df: pd.DataFrame, max_rounds: int = None) -> "FeedbackIndex":
+        """
+        Build an index from a game history DataFrame (for example a warm-start history).
+
+        :param history_df: DataFrame containing at least the GAME_HISTORY_COLUMNS of a single game.
+        :param max_rounds: Number of latest rounds kept in the index, every round if None.
+        :return: FeedbackIndex of the history.
+        """
+        index = cls(max_rounds)
+        rows = history_df[GAME_HISTORY_COLUMNS].astype(object).where(history_df[GAME_HISTORY_COLUMNS].notna(), None)
+        rounds = {}
+        for row in rows.itertuples(index=False, name=None):
+            rounds.setdefault(int(row[0]), []).append(row)
+        for round in sorted(rounds):
+            index.add_round(rounds[round])
+        return index
+
+    def add_round(self, round_rows: list) -> None:
+        """
+        Add the rows of a round to the index.
+
+        :param round_rows: List of history rows of a single round, ordered like GAME_HISTORY_COLUMNS.
+        """
+        records = []
+        for row in round_rows:
+            round, player, document, rank, score = (row[position] for position in ROW_POSITIONS)
+            record = FeedbackRecord(int(round), player, document, None if rank is None else int(rank), score)
+            records.append(record)
+            self.__players[(record.round, player)] = record
+
+        records.sort(key=lambda record: (record.rank is None, record.rank))
+        self.__rounds[records[0].round] = records
+
+        if self.__max_rounds is not None:
+            for round in [round for round in self.__rounds if round <= records[0].round - self.__max_rounds]:
+                for record in self.__rounds.pop(round):
+                    self.__players.pop((record.round, record.player), None)
+
+    def get_last_round(self) -> int:
+        """
+        Get the last round in the index.
+
+        :return: Last round number, or -1 if the index is empty.
+        """
+        return max(self.__rounds, default=-1)
+
+    def get_round(self, round: int) -> list:
+        """
+        Get the records of a round, ordered by rank.
+
+        :param round: Round number.
+        :return: List of FeedbackRecord, empty if the round is not in the index.
+        """
+        return self.__rounds.get(round, [])
+
+    def get_record(self, round: int, player_name: str) -> FeedbackRecord:
+        """
+        Get the record of a player in a round.
+
+        :param round: Round number.
+        :param player_name: Name of the player.
+        :return: FeedbackRecord, or None if the player has no record in the round.
+        """
+        return self.__players.get((round, player_name))
+
+    @staticmethod
+    def to_frame(records: list) -> pd.DataFrame:
+        """
+        Build a small DataFrame from a slice of records, in the layout expected by the PromptManager.
+
+        :param records: List of FeedbackRecord.
+        :return: DataFrame with the FEEDBACK_COLUMNS.
+        """
+        return pd.DataFrame.from_records(records, columns=FEEDBACK_COLUMNS)
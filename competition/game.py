@@ -1,21 +1,37 @@
+import contextvars
+from concurrent.futures import Executor, Future
+
 import pandas as pd
 
 from rankers import ranker
 from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from competition.convergence import ConvergencePolicy
+from competition.feedback_index import FeedbackIndex
+from competition.journal import Journal
+from competition.round_store import RoundStore
 from competition.warm_start import WarmStart
-from constants.constants import (GAME_LOG_FILE, GAME_LOG_NAME,
-                                 QUERY_DF_DOCUMENT_COLUMN, QUERY_DF_QUERY_COLUMN, QUERY_DF_QUERY_ID_COLUMN,
-                                 GAME_HISTORY_COLUMNS, HISTORY_QUERY_ID_COLUMN, HISTORY_GAME_ID_COLUMN)
+from constants.constants import (GAME_LOG_FILE, GAME_LOG_NAME, STAGE_FEEDBACK, METRIC_DOCUMENTS,
+                                 METRIC_SKIPPED_GENERATIONS, METRIC_SKIPPED_RANKINGS, GAME_HISTORY_COLUMNS,
+                                 HISTORY_ROUND_COLUMN, QUERY_DF_DOCUMENT_COLUMN, QUERY_DF_QUERY_COLUMN,
+                                 QUERY_DF_QUERY_ID_COLUMN)
 
 
 class Game:
     """
         Class responsible for managing the entire game process, including generating documents, ranking them,
         providing feedback to players, and tracking the game history.
+        The history rows of a game are kept in the RoundStore shared by every game, so its own state is slotted.
     """
 
+    __slots__ = ("__query", "__query_id", "__init_doc", "__players", "__ranker", "__rounds", "__round",
+                 "__max_tokens", "__force_max_tokens", "__history_store", "__warm_start", "__journal", "__convergence",
+                 "__converged_round", "__skipped_rounds", "__last_round_rows", "__logger", "__metrics",
+                 "__feedback_index")
+
     def __init__(self, query_info: dict, agents: list, ranker: ranker, max_tokens: int, rounds: int,
-                 force_max_tokens: bool = False, warm_start: WarmStart = None):
+                 force_max_tokens: bool = False, warm_start: WarmStart = None, history_store: RoundStore = None,
+                 journal: Journal = None, convergence: dict = None):
         """
         Initialize the Game instance.
 
@@ -27,6 +43,9 @@ class Game:
         :param rounds: Number of rounds in the game.
         :param force_max_tokens: Whether to manually restrict the number of tokens in the generated documents.
         :param warm_start: WarmStart instance used for initializing player history.
+        :param history_store: RoundStore shared between games, a private store is created if not provided.
+        :param journal: Journal recording the generations and rounds of the game, if any.
+        :param convergence: Arguments of the ConvergencePolicy ending the game early, if any.
         """
         self.__query = query_info[QUERY_DF_QUERY_COLUMN]
         self.__query_id = query_info[QUERY_DF_QUERY_ID_COLUMN]
@@ -37,19 +56,39 @@ class Game:
         self.__round = 1
         self.__max_tokens = max_tokens
         self.__force_max_tokens = force_max_tokens
-        self.__game_history = pd.DataFrame(columns=GAME_HISTORY_COLUMNS)
+        self.__history_store = history_store if history_store is not None else RoundStore()
         self.__warm_start = warm_start
+        self.__journal = journal
+        self.__convergence = ConvergencePolicy(**convergence) if convergence else None
+        self.__converged_round = None
+        self.__skipped_rounds = 0
+        self.__last_round_rows = None
         self.__logger = setup_logger(GAME_LOG_NAME, GAME_LOG_FILE)
+        self.__metrics = get_metrics()
 
-        if self.__warm_start:
-            game_history, round = self.__warm_start.set_game(int(self.__query_id))
-            self.__game_history = game_history
+        # The feedback index only keeps the rounds the agents read, so older documents are released
+        feedback_rounds = max((agent.get_feedback_depth() for agent in agents), default=1)
+
+        # A game missing from the warm start (e.g. not reached before a crash) starts from its initial documents
+        game_history, round = self.__warm_start.set_game(int(self.__query_id)) if self.__warm_start else (None, 0)
+        if game_history is not None and not game_history.empty:
+            self.__history_store.append_frame(self.__query_id, game_history)
+            self.__feedback_index = FeedbackIndex.from_history(game_history, feedback_rounds)
             self.__round = round + 1
+
+            # Replay the rounds already played, so a converged game stays converged after a resume
+            if self.__convergence:
+                rows = game_history[GAME_HISTORY_COLUMNS].astype(object)
+                rows = rows.where(rows.notna(), None)
+                for _, round_rows in rows.groupby(HISTORY_ROUND_COLUMN, sort=True):
+                    self.__observe_round(round_rows.values.tolist())
         else:
             # Initialize game history with the initial document for each player
-            for player in self.__players:
-                self.__game_history.loc[len(self.__game_history)] = [0, player.get_name(), self.__init_doc, None, None,
-                                                                     None, None, None]
+            init_rows = [[0, player.get_name(), self.__init_doc, None, None, None, None, None]
+                         for player in self.__players]
+            self.__history_store.append(self.__query_id, init_rows)
+            self.__feedback_index = FeedbackIndex(feedback_rounds)
+            self.__feedback_index.add_round(init_rows)
 
     def get_query_id(self):
         """
@@ -59,27 +98,171 @@ class Game:
         """
         return self.__query_id
 
+    def get_round(self) -> int:
+        """
+        Get the number of the round the game is playing next.
+
+        :return: Round number.
+        """
+        return self.__round
+
     def increase_round(self):
         """
         Increase the round number.
         """
         self.__round += 1
 
-    def generate_documents(self) -> list:
+    def is_converged(self) -> bool:
+        """
+        Check whether the game has converged, in which case its remaining rounds carry its final round forward.
+
+        :return: Whether the game has converged.
+        """
+        return self.__converged_round is not None
+
+    def get_converged_round(self) -> int:
+        """
+        Get the round in which the game converged.
+
+        :return: Round number, None if the game has not converged.
+        """
+        return self.__converged_round
+
+    def get_skipped_rounds(self) -> int:
+        """
+        Get the number of rounds the game carried forward instead of playing them.
+
+        :return: Number of rounds.
+        """
+        return self.__skipped_rounds
+
+    def get_players_count(self) -> int:
+        """
+        Get the number of players of the game.
+
+        :return: Number of players.
+        """
+        return len(self.__players)
+
+    def carry_forward(self) -> list:
+        """
+        Play the current round of a converged game without generating or ranking: the documents, ranks and scores of
+        the last round played are recorded again for the current round, without prompts.
+
+        :return: List of history rows for the round, ordered like GAME_HISTORY_COLUMNS.
+        """
+        try:
+            round_rows = [[self.__round, player, document, not_clean_document, rank, score, None, None]
+                          for _, player, document, not_clean_document, rank, score, _, _ in self.__last_round_rows]
+            self.__logger.info(f"Carrying round {self.__converged_round} forward to round {self.__round} for "
+                               f"converged query: {self.__query}")
+            self.__round += 1
+            self.__skipped_rounds += 1
+            self.__history_store.append(self.__query_id, round_rows)
+            if self.__journal:
+                self.__journal.record_round(self.__query_id, round_rows)
+
+            for player in self.__players:
+                with self.__metrics.labels(agent=player.get_name()):
+                    self.__metrics.increment(METRIC_SKIPPED_GENERATIONS)
+            self.__metrics.increment(METRIC_SKIPPED_RANKINGS)
+            return round_rows
+        except Exception as e:
+            self.__logger.error(f"Error carrying the round forward: {e}")
+            raise
+
+    def generate_documents(self, executor: Executor = None, order: list = None) -> list:
         """
         Generate documents for the current round.
 
+        :param executor: Executor running the players' generations concurrently, if any.
+        :param order: Order in which the players generate, by player index (the players' order if not provided).
         :return: List of generated documents and prompts.
         """
+        return self.collect_documents(self.submit_documents(executor, order))
+
+    def submit_documents(self, executor: Executor = None, order: list = None) -> list:
+        """
+        Start the generation of the documents of the current round. With an executor, the players generate their
+        documents concurrently (e.g. to fill the batch of a generation server); otherwise they generate them in turn.
+
+        :param executor: Executor running the players' generations concurrently, if any.
+        :param order: Order in which the players generate, by player index (the players' order if not provided).
+        :return: List of futures of the generated documents and prompts, one per player in the players' order.
+        """
+        self.__logger.info(f"Generating documents for round {self.__round} for query: {self.__query}")
+        futures = [None] * len(self.__players)
+        for index in (order if order is not None else range(len(self.__players))):
+            futures[index] = self.submit_document(index, executor)
+        return futures
+
+    def submit_document(self, index: int, executor: Executor = None) -> Future:
+        """
+        Start the generation of a player's document for the current round.
+
+        :param index: Index of the player, in the order of the agents.
+        :param executor: Executor running the generation, if any; otherwise the document is generated right away.
+        :return: Future of the generated documents and prompts, and whether they are already journaled.
+        """
         try:
-            self.__logger.info(f"Generating documents for round {self.__round} for query: {self.__query}")
-            documents_prompts = [player.generate_document(self.__max_tokens, force_max_tokens=self.__force_max_tokens)
-                                 for player in self.__players]
+            player = self.__players[index]
+
+            # Reuse the generation of an interrupted run when the journal has it
+            documents_prompt = self.__journal.get_generation(self.__query_id, self.__round, player.get_name()) \
+                if self.__journal else None
+            if documents_prompt is not None:
+                player.set_document(documents_prompt[0])
+                future = Future()
+                future.set_result((documents_prompt, True))
+            elif executor is not None:
+                # Every generation runs in a copy of the current context, to keep its metrics labels
+                future = executor.submit(contextvars.copy_context().run, self.__generate_document, player)
+            else:
+                # Journal the generation right away, so a crash in the round only loses the generation under way
+                documents_prompt, _ = self.__generate_document(player)
+                if self.__journal:
+                    self.__journal.record_generation(self.__query_id, self.__round, player.get_name(),
+                                                     documents_prompt)
+                future = Future()
+                future.set_result((documents_prompt, True))
+            return future
+        except Exception as e:
+            self.__logger.error(f"Error generating documents: {e}")
+            raise
+
+    def collect_documents(self, futures: list) -> list:
+        """
+        Wait for the documents of the current round and journal the new generations.
+
+        :param futures: List of futures returned by submit_documents.
+        :return: List of generated documents and prompts.
+        """
+        try:
+            documents_prompts = []
+            for player, future in zip(self.__players, futures):
+                documents_prompt, journaled = future.result()
+                if self.__journal and not journaled:
+                    self.__journal.record_generation(self.__query_id, self.__round, player.get_name(),
+                                                     documents_prompt)
+                documents_prompts.append(documents_prompt)
             return documents_prompts
         except Exception as e:
             self.__logger.error(f"Error generating documents: {e}")
             raise
 
+    def __generate_document(self, player) -> tuple:
+        """
+        Generate the document of a player for the current round.
+
+        :param player: Player generating the document.
+        :return: Tuple of the generated documents and prompts, and whether they are already journaled.
+        """
+        # Account the generation metrics (time, tokens) to the player's agent
+        with self.__metrics.labels(agent=player.get_name()):
+            documents_prompt = player.generate_document(self.__max_tokens, force_max_tokens=self.__force_max_tokens)
+            self.__metrics.increment(METRIC_DOCUMENTS)
+        return documents_prompt, False
+
     def rank_documents(self, documents_prompts: list, docnos: list = None) -> list:
         """
         Rank the provided documents.
@@ -92,9 +275,9 @@ class Game:
             self.__logger.info(f"Ranking documents for round {self.__round} for query: {self.__query}")
             documents, non_cleaned_documents, user_prompts, system_prompts = zip(*documents_prompts)
             if docnos:
-                ranks, scores = self.__ranker.rank(self.__query, docnos)
+                ranks, scores = self.__ranker.timed_rank(self.__query, docnos)
             else:
-                ranks, scores = self.__ranker.rank(self.__query, documents)
+                ranks, scores = self.__ranker.timed_rank(self.__query, documents)
 
             return sorted(zip(self.__players, documents, ranks, scores, non_cleaned_documents, user_prompts,
                               system_prompts), key=lambda x: x[2], reverse=True)
@@ -102,49 +285,71 @@ class Game:
             self.__logger.error(f"Error ranking documents: {e}")
             raise
 
-    def create_round_history(self, ranked_players: list) -> pd.DataFrame:
+    def create_round_history(self, ranked_players: list) -> list:
         """
         Create history for the current round and update the rank of each player.
 
         :param ranked_players: List of ranked players along with their documents and prompts.
-        :return: DataFrame containing the feedback for the round.
+        :return: List of history rows for the round, ordered like GAME_HISTORY_COLUMNS.
         """
         try:
             self.__logger.info(f"Creating feedback for round {self.__round} for query: {self.__query}")
-            round_df = pd.DataFrame(columns=GAME_HISTORY_COLUMNS)
+            round_rows = []
             for player, doc, rank, score, not_clean_doc, user_prompt, system_prompt in ranked_players:
-                round_df.loc[len(round_df)] = [self.__round, player.get_name(), doc, not_clean_doc, rank, score,
-                                               user_prompt, system_prompt]
+                round_rows.append([self.__round, player.get_name(), doc, not_clean_doc, rank, score, user_prompt,
+                                   system_prompt])
                 player.set_rank(rank)
 
-            return round_df
+            return round_rows
         except Exception as e:
             self.__logger.error(f"Error creating feedback: {e}")
             raise
 
-    def update_game_history(self, round_df: pd.DataFrame) -> None:
+    def update_game_history(self, round_rows: list) -> None:
         """
         Update the game history with the results of the current round.
 
-        :param round_df: DataFrame containing the results of the current round.
+        :param round_rows: List of history rows of the current round.
         """
         try:
             self.__logger.info(f"Updating game history for round {self.__round - 1} for query: {self.__query}")
-            self.__game_history = pd.concat([self.__game_history, round_df])
-            [player.generate_feedback(self.__game_history) for player in self.__players]
+            self.__history_store.append(self.__query_id, round_rows)
+            if self.__journal:
+                self.__journal.record_round(self.__query_id, round_rows)
+
+            # A converged game plays no more rounds, so its players need no feedback
+            if self.__observe_round(round_rows):
+                return
+            with self.__metrics.timer(STAGE_FEEDBACK):
+                self.__feedback_index.add_round(round_rows)
+                [player.generate_feedback(self.__feedback_index) for player in self.__players]
 
         except Exception as e:
             self.__logger.error(f"Error updating history: {e}")
             raise
 
+    def __observe_round(self, round_rows: list) -> bool:
+        """
+        Record the rows of a round played by the game and check the convergence policy.
+
+        :param round_rows: List of history rows of the round.
+        :return: Whether the game has converged.
+        """
+        if not self.__convergence or not round_rows or round_rows[0][0] == 0:
+            return False
+        if self.__converged_round is None:
+            self.__last_round_rows = round_rows
+        if self.__converged_round is None and self.__convergence.update(round_rows):
+            self.__converged_round = round_rows[0][0]
+            self.__logger.info(f"Game of query {self.__query} converged in round {self.__converged_round} "
+                               f"({self.__convergence.reason})")
+        return self.__converged_round is not None
+
     def get_game_history(self) -> pd.DataFrame:
         """
         Get the complete game history.
 
-        :return: DataFrame containing the game history.
+        :return: DataFrame copy of the game history.
         """
-        self.__game_history.loc[:, HISTORY_QUERY_ID_COLUMN] = self.__query_id
-        self.__game_history.loc[:, HISTORY_GAME_ID_COLUMN] = self.__query_id
-
         self.__logger.info("Game history retrieved.")
-        return self.__game_history
+        return self.__history_store.view(self.__query_id)
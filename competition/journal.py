@@ -0,0 +1,225 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from competition.round_store import RoundStore
+from utils.logger import setup_logger
+from constants.constants import (JOURNAL_LOG_FILE, JOURNAL_LOG_NAME, GAME_HISTORY_COLUMNS, HISTORY_QUERY_ID_COLUMN,
+                                 HISTORY_GAME_ID_COLUMN, HISTORY_DOCUMENT_COLUMN, HISTORY_NOT_CLEAN_DOCUMENT_COLUMN,
+                                 HISTORY_USER_PROMPT_COLUMN, HISTORY_SYSTEM_PROMPT_COLUMN,
+                                 JOURNAL_GENERATION_RECORD, JOURNAL_HISTORY_RECORD, DEFAULT_JOURNAL_SYNC_RECORDS)
+
+GENERATION_FIELDS = [HISTORY_DOCUMENT_COLUMN, HISTORY_NOT_CLEAN_DOCUMENT_COLUMN, HISTORY_USER_PROMPT_COLUMN,
+                     HISTORY_SYSTEM_PROMPT_COLUMN]
+
+
+class Journal:
+    """
+        Class responsible for the competition's write-ahead journal: an append-only JSON lines file recording every
+        completed generation (one record per query, round and player) and every round committed to a game's history.
+        Records are flushed as they are written and fsynced in batches, and the competition syncs the journal at the
+        end of every round. After a crash the journal is replayed to rebuild the history, so only the generations
+        missing from it are redone.
+    """
+
+    def __init__(self, path: str, sync_records: int = DEFAULT_JOURNAL_SYNC_RECORDS):
+        """
+        Initialize the Journal.
+
+        :param path: Path to the journal file.
+        :param sync_records: Number of records written between two fsyncs.
+        """
+        self.__path = path
+        self.__sync_records = max(sync_records, 1)
+        self.__file = None
+        self.__unsynced = 0
+        self.__history = {}
+        self.__generations = {}
+        self.__logger = setup_logger(JOURNAL_LOG_NAME, JOURNAL_LOG_FILE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def __key(query_id) -> int:
+        return int(query_id)
+
+    @staticmethod
+    def __encode(value):
+        """
+        Convert the numpy scalars found in history rows to JSON values.
+        """
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    def replay(self, path: str = None) -> bool:
+        """
+        Replay a journal: collect the history rows of every game and the generations of rounds that were not
+        committed yet. A torn record at the end of the file (an interrupted write) and everything after it is ignored.
+
+        :param path: Path to the journal to replay, the journal's own path if not provided.
+        :return: Whether the journal contained any history.
+        """
+        path = path or self.__path
+        if not os.path.exists(path):
+            return False
+
+        try:
+            with open(path, encoding="utf8") as file:
+                for line_number, line in enumerate(file, start=1):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        self.__logger.warning(f"Ignoring the journal from line {line_number} on (torn record).")
+                        break
+
+                    query_id = self.__key(record[HISTORY_QUERY_ID_COLUMN])
+                    if record["type"] == JOURNAL_HISTORY_RECORD:
+                        self.__history.setdefault(query_id, []).extend(record["rows"])
+                    elif record["type"] == JOURNAL_GENERATION_RECORD:
+                        self.__generations[(query_id, record["round"], record["player"])] = \
+                            tuple(record[field] for field in GENERATION_FIELDS)
+        except Exception as e:
+            self.__logger.error(f"Error replaying the journal {path}: {e}")
+            raise
+
+        # Generations of committed rounds are already part of the history
+        last_rounds = {query_id: max((row[0] for row in rows), default=0) for query_id, rows in self.__history.items()}
+        self.__generations = {key: generation for key, generation in self.__generations.items()
+                              if key[1] > last_rounds.get(key[0], 0)}
+        self.__logger.info(f"Replayed the journal {path}: {sum(map(len, self.__history.values()))} history rows, "
+                           f"{len(self.__generations)} pending generations.")
+        return bool(self.__history)
+
+    def get_history(self) -> pd.DataFrame:
+        """
+        Get the replayed history, in the layout of the competition history.
+
+        :return: DataFrame with the GAME_HISTORY_COLUMNS followed by the query ID and game ID columns.
+        """
+        rows = [row for rows in self.__history.values() for row in rows]
+        query_ids = [query_id for query_id, rows in self.__history.items() for _ in rows]
+        history = pd.DataFrame(rows, columns=GAME_HISTORY_COLUMNS)
+        history[HISTORY_QUERY_ID_COLUMN] = query_ids
+        history[HISTORY_GAME_ID_COLUMN] = query_ids
+        return history
+
+    def get_generation(self, query_id, round_number: int, player_name: str):
+        """
+        Get a replayed generation of a round that was not committed.
+
+        :param query_id: ID of the query.
+        :param round_number: Number of the round.
+        :param player_name: Name of the player.
+        :return: Tuple of the document, non cleaned document, user prompt and system prompt, or None.
+        """
+        return self.__generations.get((self.__key(query_id), round_number, player_name))
+
+    def open(self, history_store: RoundStore) -> None:
+        """
+        Start the journal from a compacted snapshot of the current history and of the pending generations,
+        atomically replacing any previous journal, and open it for appending. Replayed games missing from the
+        history (games built window by window later on) keep their replayed history.
+
+        :param history_store: RoundStore holding the history the competition starts from.
+        """
+        try:
+            temporary_path = f"{self.__path}.tmp"
+            with open(temporary_path, "w", encoding="utf8") as file:
+                game_ids = history_store.get_game_ids()
+                for game_id in game_ids:
+                    file.write(self.__dumps_history(history_store, game_id))
+                built = {self.__key(game_id) for game_id in game_ids}
+                for query_id, rows in self.__history.items():
+                    if query_id not in built:
+                        file.write(self.__dumps(JOURNAL_HISTORY_RECORD, query_id, rows=rows))
+                for (query_id, round_number, player_name), generation in self.__generations.items():
+                    file.write(self.__dumps(JOURNAL_GENERATION_RECORD, query_id, round=round_number,
+                                            player=player_name, **dict(zip(GENERATION_FIELDS, generation))))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, self.__path)
+
+            self.__file = open(self.__path, "a", encoding="utf8")
+            self.__logger.info(f"Journal opened at {self.__path}")
+        except Exception as e:
+            self.__logger.error(f"Error opening the journal {self.__path}: {e}")
+            raise
+
+    def __dumps(self, record_type: str, query_id, **fields) -> str:
+        return json.dumps({"type": record_type, HISTORY_QUERY_ID_COLUMN: query_id, **fields},
+                          default=self.__encode) + "\n"
+
+    def __dumps_history(self, history_store: RoundStore, game_id) -> str:
+        history = history_store.view(game_id)[GAME_HISTORY_COLUMNS]
+        rows = history.astype(object).where(history.notna(), None)
+        return self.__dumps(JOURNAL_HISTORY_RECORD, game_id,
+                            rows=list(map(list, rows.itertuples(index=False, name=None))))
+
+    def __write(self, record: str) -> None:
+        """
+        Write a record and hand it to the operating system, syncing it to disk once enough records are pending.
+
+        :param record: Serialized record.
+        """
+        self.__file.write(record)
+        self.__file.flush()
+        self.__unsynced += 1
+        if self.__unsynced >= self.__sync_records:
+            self.sync()
+
+    def record_generation(self, query_id, round_number: int, player_name: str, documents_prompt: tuple) -> None:
+        """
+        Record a completed generation.
+
+        :param query_id: ID of the query.
+        :param round_number: Number of the round.
+        :param player_name: Name of the player.
+        :param documents_prompt: Tuple of the document, non cleaned document, user prompt and system prompt.
+        """
+        self.__write(self.__dumps(JOURNAL_GENERATION_RECORD, query_id, round=round_number, player=player_name,
+                                  **dict(zip(GENERATION_FIELDS, documents_prompt))))
+
+    def record_round(self, query_id, round_rows: list) -> None:
+        """
+        Record the history rows of a round committed to a game's history.
+
+        :param query_id: ID of the query.
+        :param round_rows: List of history rows, ordered like GAME_HISTORY_COLUMNS.
+        """
+        self.__write(self.__dumps(JOURNAL_HISTORY_RECORD, query_id, rows=round_rows))
+
+    def record_games(self, history_store: RoundStore) -> None:
+        """
+        Record the history of the games of a store built after the journal was opened, unless the journal was
+        replayed with their history.
+
+        :param history_store: RoundStore holding the games' history.
+        """
+        for game_id in history_store.get_game_ids():
+            if self.__key(game_id) not in self.__history:
+                self.__write(self.__dumps_history(history_store, game_id))
+
+    def sync(self) -> None:
+        """
+        Force the written records to disk.
+        """
+        if self.__file is None or not self.__unsynced:
+            return
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__unsynced = 0
+
+    def close(self) -> None:
+        """
+        Sync and close the journal.
+        """
+        if self.__file is not None and not self.__file.closed:
+            self.sync()
+            self.__file.close()
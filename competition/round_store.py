@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+
+from utils.document_store import encode_delta, decode_delta
+from constants.constants import (GAME_HISTORY_COLUMNS, HISTORY_ROUND_COLUMN, HISTORY_RANK_COLUMN, HISTORY_SCORE_COLUMN,
+                                 HISTORY_QUERY_ID_COLUMN, HISTORY_GAME_ID_COLUMN, HISTORY_PLAYER_COLUMN,
+                                 HISTORY_DOCUMENT_COLUMN, HISTORY_NOT_CLEAN_DOCUMENT_COLUMN, DELTA_FULL_MARKER,
+                                 DEFAULT_ROUND_STORE_CAPACITY)
+
+COLUMN_DTYPES = {HISTORY_ROUND_COLUMN: np.int64, HISTORY_RANK_COLUMN: np.float64, HISTORY_SCORE_COLUMN: np.float64}
+DELTA_COLUMNS = [HISTORY_DOCUMENT_COLUMN, HISTORY_NOT_CLEAN_DOCUMENT_COLUMN]
+PLAYER_POSITION = GAME_HISTORY_COLUMNS.index(HISTORY_PLAYER_COLUMN)
+
+
+class AppendOnlyColumn:
+    """
+        A typed, numpy-backed column that grows by doubling its capacity, so appends are amortized O(1).
+    """
+
+    def __init__(self, dtype, capacity: int = DEFAULT_ROUND_STORE_CAPACITY):
+        """
+        Initialize the column.
+
+        :param dtype: Numpy dtype of the column.
+        :param capacity: Initial capacity.
+        """
+        self.__values = np.empty(capacity, dtype=dtype)
+        self.__size = 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def append(self, value) -> None:
+        """
+        Append a value to the column.
+
+        :param value: Value to append (None is stored as NaN in numeric columns).
+        """
+        if self.__size == len(self.__values):
+            values = np.empty(max(2 * len(self.__values), 1), dtype=self.__values.dtype)
+            values[:self.__size] = self.__values[:self.__size]
+            self.__values = values
+        if value is None and self.__values.dtype.kind == "f":
+            value = np.nan
+        self.__values[self.__size] = value
+        self.__size += 1
+
+    def take(self, positions: np.ndarray = None) -> np.ndarray:
+        """
+        Get the values at the given positions.
+
+        :param positions: Row positions, or None for every row.
+        :return: Read-only array of values.
+        """
+        values = self.__values[:self.__size] if positions is None else self.__values[positions]
+        values.flags.writeable = False
+        return values
+
+
+class RoundStore:
+    """
+        Class responsible for storing game history rows in typed, append-only columns.
+        A store can hold a single game or be shared by all the games of a competition; rows are appended once per
+        round and read back as DataFrame copies, so bookkeeping cost does not grow with the length of the history.
+        With delta documents, a player's documents are kept as a diff against the player's document in the previous
+        row of the game (or a reference when unchanged), and materialized when the history is viewed.
+    """
+
+    def __init__(self, delta_documents: bool = False):
+        """
+        Initialize an empty RoundStore.
+
+        :param delta_documents: Whether to keep the document columns as deltas across rounds.
+        """
+        self.__columns = {column: AppendOnlyColumn(COLUMN_DTYPES.get(column, object))
+                          for column in GAME_HISTORY_COLUMNS}
+        self.__game_ids = AppendOnlyColumn(object)
+        self.__game_rows = {}
+        self.__game_rounds = {}
+        self.__delta_documents = delta_documents
+        # Whether each stored document is a delta, and the latest document of each (game, player, column)
+        self.__is_delta = {column: AppendOnlyColumn(np.bool_) for column in DELTA_COLUMNS} if delta_documents else {}
+        self.__tips = {}
+
+    def __len__(self) -> int:
+        return len(self.__game_ids)
+
+    def append(self, game_id, rows: list) -> None:
+        """
+        Append history rows of a game.
+
+        :param game_id: ID of the game the rows belong to.
+        :param rows: List of rows, each ordered like GAME_HISTORY_COLUMNS.
+        """
+        positions = self.__game_rows.setdefault(game_id, AppendOnlyColumn(np.int64))
+        columns = [self.__columns[column] for column in GAME_HISTORY_COLUMNS]
+        for row in rows:
+            if self.__delta_documents:
+                row = self.__encode_row(game_id, row)
+            positions.append(len(self.__game_ids))
+            self.__game_ids.append(game_id)
+            for column, value in zip(columns, row):
+                column.append(value)
+            self.__game_rounds[game_id] = max(self.__game_rounds.get(game_id, 0), int(row[0]))
+
+    def __encode_row(self, game_id, row) -> list:
+        """
+        Replace the documents of a row with their deltas against the player's previous documents. A document without
+        a smaller delta (such as the player's first document) is kept as is, shared with the caller's row.
+
+        :param game_id: ID of the game the row belongs to.
+        :param row: Row ordered like GAME_HISTORY_COLUMNS.
+        :return: Row with the encoded documents.
+        """
+        row = list(row)
+        for column in DELTA_COLUMNS:
+            position = GAME_HISTORY_COLUMNS.index(column)
+            key = (game_id, row[PLAYER_POSITION], column)
+            document = row[position]
+            encoded = encode_delta(self.__tips.get(key), document)
+            is_delta = encoded is not None and encoded[:1] != DELTA_FULL_MARKER
+            if is_delta:
+                row[position] = encoded
+            if document is not None:
+                self.__tips[key] = document
+            self.__is_delta[column].append(is_delta)
+        return row
+
+    def __decode_column(self, column: str, positions: np.ndarray, game_ids: np.ndarray,
+                        players: np.ndarray) -> list:
+        """
+        Materialize the documents of a delta-encoded column. Every game is viewed from its first row, so each delta's
+        base is the last document of the same game and player decoded before it.
+
+        :param column: Name of the document column.
+        :param positions: Row positions of the view.
+        :param game_ids: Game IDs of the rows.
+        :param players: Players of the rows.
+        :return: List of documents.
+        """
+        values = self.__columns[column].take(positions)
+        is_delta = self.__is_delta[column].take(positions)
+        bases, documents = {}, []
+        for game_id, player, value, delta in zip(game_ids, players, values, is_delta):
+            document = decode_delta(bases.get((game_id, player)), value) if delta else value
+            if document is not None:
+                bases[(game_id, player)] = document
+            documents.append(document)
+        return documents
+
+    def append_frame(self, game_id, history_df: pd.DataFrame) -> None:
+        """
+        Append the rows of a history DataFrame (for example a warm-start history) to a game.
+
+        :param game_id: ID of the game the rows belong to.
+        :param history_df: DataFrame containing at least the GAME_HISTORY_COLUMNS.
+        """
+        rows = history_df[GAME_HISTORY_COLUMNS].astype(object).where(history_df[GAME_HISTORY_COLUMNS].notna(), None)
+        self.append(game_id, list(rows.itertuples(index=False, name=None)))
+
+    def get_game_ids(self) -> list:
+        """
+        Get the IDs of the games in the store, in order of their first row.
+
+        :return: List of game IDs.
+        """
+        return list(self.__game_rows)
+
+    def get_last_round(self, game_id) -> int:
+        """
+        Get the last round stored for a game.
+
+        :param game_id: ID of the game.
+        :return: Last round number, or 0 if the game has no rows.
+        """
+        return self.__game_rounds.get(game_id, 0)
+
+    def view(self, game_id=None) -> pd.DataFrame:
+        """
+        Build a DataFrame of the history of one game, or of every game (grouped by game, in the order the games were
+        first added). The rows are gathered from the columns into a new frame, so it is a copy: changing it does not
+        change the store.
+
+        :param game_id: ID of the game, or None for the whole store.
+        :return: DataFrame with the GAME_HISTORY_COLUMNS followed by the query ID and game ID columns.
+        """
+        if game_id is None:
+            positions = np.concatenate([rows.take() for rows in self.__game_rows.values()]) \
+                if self.__game_rows else np.empty(0, dtype=np.int64)
+        elif game_id in self.__game_rows:
+            positions = self.__game_rows[game_id].take()
+        else:
+            positions = np.empty(0, dtype=np.int64)
+
+        data = {column: self.__columns[column].take(positions) for column in GAME_HISTORY_COLUMNS}
+        data[HISTORY_RANK_COLUMN] = pd.array(data[HISTORY_RANK_COLUMN], dtype="Int64")
+        game_ids = self.__game_ids.take(positions)
+        for column in self.__is_delta:
+            data[column] = np.array(self.__decode_column(column, positions, game_ids, data[HISTORY_PLAYER_COLUMN]),
+                                    dtype=object)
+        data[HISTORY_QUERY_ID_COLUMN] = game_ids
+        data[HISTORY_GAME_ID_COLUMN] = game_ids
+
+        return pd.DataFrame(data, index=pd.RangeIndex(len(positions)), copy=False)
@@ -0,0 +1,83 @@
+import heapq
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.logger import set_competition_hash_folder, configure_logging, shutdown_logging
+from constants.constants import (QUERY_DF_QUERY_COLUMN, QUERY_DF_DOCUMENT_COLUMN, QUERY_DF_QUERY_ID_COLUMN,
+                                 HISTORY_QUERY_ID_COLUMN, CONFIG_LOGGING_HEADER)
+
+
+def estimate_costs(queries_df: pd.DataFrame, max_tokens: int) -> np.ndarray:
+    """
+    Estimate the relative cost of each game: the tokens processed by a generation, i.e. the prompt (query and
+    document words) and the completion (max_tokens). Rounds and agents are the same for every game, so they do not
+    change the partition.
+
+    :param queries_df: DataFrame containing the queries.
+    :param max_tokens: Maximum number of tokens for the generated documents.
+    :return: Array of costs, aligned with the queries.
+    """
+    words = (queries_df[QUERY_DF_QUERY_COLUMN].fillna("").astype(str).str.split().str.len() +
+             queries_df[QUERY_DF_DOCUMENT_COLUMN].fillna("").astype(str).str.split().str.len())
+    return words.to_numpy(dtype=np.float64) + max_tokens
+
+
+def partition_queries(queries_df: pd.DataFrame, shards: int, max_tokens: int) -> list:
+    """
+    Partition the queries into shards of balanced estimated cost, assigning the most expensive games first to the
+    least loaded shard (longest processing time first). The partition only depends on the queries, so a rerun of the
+    same competition gets the same shards; queries keep their original order within a shard.
+
+    :param queries_df: DataFrame containing the queries.
+    :param shards: Number of shards.
+    :param max_tokens: Maximum number of tokens for the generated documents.
+    :return: List of non-empty query DataFrames, one per shard.
+    """
+    costs = estimate_costs(queries_df, max_tokens)
+    loads = [(0.0, shard) for shard in range(shards)]
+    positions = [[] for _ in range(shards)]
+    for position in np.argsort(-costs, kind="stable"):
+        load, shard = heapq.heappop(loads)
+        positions[shard].append(position)
+        heapq.heappush(loads, (load + costs[position], shard))
+
+    return [queries_df.iloc[sorted(shard_positions)] for shard_positions in positions if shard_positions]
+
+
+def merge_histories(histories: list, queries_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge the histories of the shards into a single history, with the games in the order of the queries, as a
+    single-process competition would have them.
+
+    :param histories: List of shard history DataFrames.
+    :param queries_df: DataFrame containing the queries, in competition order.
+    :return: Merged history DataFrame.
+    """
+    history = pd.concat(histories, ignore_index=True)
+    order = {query_id: position for position, query_id in enumerate(queries_df[QUERY_DF_QUERY_ID_COLUMN].tolist())}
+    positions = history[HISTORY_QUERY_ID_COLUMN].map(order).to_numpy()
+    return history.iloc[np.argsort(positions, kind="stable")].reset_index(drop=True)
+
+
+def run_shard(config: dict, output_folder: str, ranker=None) -> pd.DataFrame:
+    """
+    Run the competition of a shard in a worker process, with its own logs, models and outputs.
+
+    :param config: Competition configuration of the shard.
+    :param output_folder: Output folder of the shard.
+    :param ranker: Ranker instance to use instead of the configured rankers, if any.
+    :return: History DataFrame of the shard.
+    """
+    from competition.competition import Competition
+
+    os.makedirs(output_folder, exist_ok=True)
+    set_competition_hash_folder(output_folder)
+    configure_logging(config.get(CONFIG_LOGGING_HEADER))
+    try:
+        competition = Competition(config, ranker=ranker)
+        competition.run_competition(output_folder)
+        return competition.get_history()
+    finally:
+        shutdown_logging()
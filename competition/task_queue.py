@@ -0,0 +1,308 @@
+import json
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.logger import setup_logger
+from constants.constants import (TASK_QUEUE_LOG_FILE, TASK_QUEUE_LOG_NAME, TASK_GENERATION, TASK_RANKING,
+                                 TASK_PENDING, TASK_LEASED, TASK_DONE, TASK_FAILED, DEFAULT_TASK_LEASE_SECONDS,
+                                 DEFAULT_TASK_MAX_ATTEMPTS, GAME_HISTORY_COLUMNS, HISTORY_QUERY_ID_COLUMN,
+                                 HISTORY_RANK_COLUMN, HISTORY_GAME_ID_COLUMN, QUERY_DF_QUERY_ID_COLUMN, QUERY_DF_DOCUMENT_COLUMN,
+                                 QUERY_DF_QUERY_COLUMN)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS queries (position INTEGER PRIMARY KEY, query_id INTEGER UNIQUE, document TEXT, query TEXT);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    query_id INTEGER NOT NULL,
+    round INTEGER NOT NULL,
+    agent TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '{TASK_PENDING}',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    UNIQUE (kind, query_id, round, agent)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, round);
+"""
+
+# A generation task is ready once the previous round of its game is ranked,
+# a ranking task once every generation of its round is done
+CLAIM_QUERY = f"""
+SELECT id, kind, query_id, round, agent FROM tasks AS task
+WHERE (status = '{TASK_PENDING}' OR (status = '{TASK_LEASED}' AND lease_expires < :now))
+  AND attempts < :max_attempts
+  AND CASE kind
+      WHEN '{TASK_GENERATION}' THEN EXISTS (
+          SELECT 1 FROM tasks AS dependency
+          WHERE dependency.kind = '{TASK_RANKING}' AND dependency.query_id = task.query_id
+            AND dependency.round = task.round - 1 AND dependency.status = '{TASK_DONE}')
+      ELSE NOT EXISTS (
+          SELECT 1 FROM tasks AS dependency
+          WHERE dependency.kind = '{TASK_GENERATION}' AND dependency.query_id = task.query_id
+            AND dependency.round = task.round AND dependency.status != '{TASK_DONE}')
+      END
+ORDER BY round, kind = '{TASK_GENERATION}', id
+LIMIT 1
+"""
+
+
+class TaskQueue:
+    """
+        Class responsible for the durable task queue of a distributed competition, stored in a SQLite database
+        that can live on a shared filesystem. A competition is expressed as (query, round, agent) generation tasks
+        and (query, round) ranking tasks; workers on any node claim ready tasks under a lease, and a task whose lease
+        expires (e.g. its worker died) or that failed is retried by another worker, up to a maximum number of attempts.
+        Round dependencies are enforced when claiming, so a task is only handed out once its inputs are done.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_TASK_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_TASK_MAX_ATTEMPTS):
+        """
+        Open (and create if needed) the task queue.
+
+        :param path: Path to the SQLite database.
+        :param lease_seconds: Duration of a lease, after which a claimed task can be claimed again.
+        :param max_attempts: Maximum number of attempts of a task before it is marked as failed.
+        """
+        self.path = path
+        self.__lease_seconds = lease_seconds
+        self.__max_attempts = max_attempts
+        self.__logger = setup_logger(TASK_QUEUE_LOG_NAME, TASK_QUEUE_LOG_FILE)
+        # Autocommit mode: every write runs in an explicit transaction
+        self.__connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.__connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """
+        Close the connection to the queue.
+        """
+        self.__connection.close()
+
+    def __transaction(self):
+        """
+        Start a write transaction, taking the database write lock up front so concurrent claims never interleave.
+        """
+        self.__connection.execute("BEGIN IMMEDIATE")
+
+    def __rollback(self):
+        """
+        Roll back the current transaction, if one was started.
+        """
+        if self.__connection.in_transaction:
+            self.__connection.execute("ROLLBACK")
+
+    @staticmethod
+    def __encode(value):
+        """
+        Convert the numpy scalars found in history rows to JSON values.
+        """
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    def submit(self, queries_df: pd.DataFrame, agent_names: list, rounds: int, config: str = None) -> None:
+        """
+        Submit a competition: its queries, the initial documents as the ranked round 0 of every game, and the
+        generation and ranking tasks of every round. Tasks already in the queue are kept, so submitting the same
+        competition again resumes it.
+
+        :param queries_df: DataFrame containing the queries.
+        :param agent_names: Names of the agents, in competition order.
+        :param rounds: Number of rounds.
+        :param config: JSON configuration of the competition, used by workers started on other nodes.
+        """
+        try:
+            self.__transaction()
+            cursor = self.__connection.cursor()
+            cursor.execute("INSERT OR REPLACE INTO meta VALUES ('config', ?), ('agents', ?)",
+                           (config, json.dumps(agent_names)))
+            for position, (query_id, document, query) in enumerate(queries_df[[
+                    QUERY_DF_QUERY_ID_COLUMN, QUERY_DF_DOCUMENT_COLUMN, QUERY_DF_QUERY_COLUMN]].itertuples(
+                    index=False, name=None)):
+                query_id = int(query_id)
+                cursor.execute("INSERT OR IGNORE INTO queries VALUES (?, ?, ?, ?)",
+                               (position, query_id, document, query))
+                init_rows = [[0, agent_name, document, None, None, None, None, None] for agent_name in agent_names]
+                cursor.execute("INSERT OR IGNORE INTO tasks (kind, query_id, round, status, result) "
+                               "VALUES (?, ?, 0, ?, ?)", (TASK_RANKING, query_id, TASK_DONE, json.dumps(init_rows)))
+                for round_number in range(1, rounds + 1):
+                    cursor.executemany("INSERT OR IGNORE INTO tasks (kind, query_id, round, agent) VALUES (?, ?, ?, ?)",
+                                       [(TASK_GENERATION, query_id, round_number, agent_name)
+                                        for agent_name in agent_names])
+                    cursor.execute("INSERT OR IGNORE INTO tasks (kind, query_id, round) VALUES (?, ?, ?)",
+                                   (TASK_RANKING, query_id, round_number))
+            self.__connection.execute("COMMIT")
+            self.__logger.info(f"Submitted {len(queries_df)} games of {rounds} rounds to {self.path}")
+        except Exception as e:
+            self.__rollback()
+            self.__logger.error(f"Error submitting the competition to {self.path}: {e}")
+            raise
+
+    def get_config(self) -> str:
+        """
+        Get the JSON configuration of the submitted competition.
+
+        :return: JSON configuration, or None if it could not be stored.
+        """
+        row = self.__connection.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        return row[0] if row else None
+
+    def get_queries(self) -> pd.DataFrame:
+        """
+        Get the queries of the submitted competition, in competition order.
+
+        :return: DataFrame with the query ID, initial document and query columns.
+        """
+        rows = self.__connection.execute("SELECT query_id, document, query FROM queries ORDER BY position").fetchall()
+        return pd.DataFrame(rows, columns=[QUERY_DF_QUERY_ID_COLUMN, QUERY_DF_DOCUMENT_COLUMN, QUERY_DF_QUERY_COLUMN])
+
+    def claim(self, owner: str):
+        """
+        Claim the next ready task, lowest round first.
+
+        :param owner: ID of the claiming worker.
+        :return: Tuple of the task ID, kind, query ID, round and agent name, or None if no task is ready.
+        """
+        try:
+            self.__transaction()
+            # Tasks whose worker died on their last attempt will never be completed
+            self.__connection.execute(
+                f"UPDATE tasks SET status = '{TASK_FAILED}', error = 'Lease expired' WHERE status = '{TASK_LEASED}' "
+                f"AND lease_expires < ? AND attempts >= ?", (time.time(), self.__max_attempts))
+            task = self.__connection.execute(CLAIM_QUERY, {"now": time.time(),
+                                                           "max_attempts": self.__max_attempts}).fetchone()
+            if task is not None:
+                self.__connection.execute(
+                    f"UPDATE tasks SET status = '{TASK_LEASED}', attempts = attempts + 1, lease_owner = ?, "
+                    f"lease_expires = ? WHERE id = ?", (owner, time.time() + self.__lease_seconds, task[0]))
+            self.__connection.execute("COMMIT")
+            return task
+        except Exception as e:
+            self.__rollback()
+            self.__logger.error(f"Error claiming a task from {self.path}: {e}")
+            raise
+
+    def __update_leased(self, task_id: int, owner: str, assignments: str, parameters: tuple) -> bool:
+        """
+        Update a task only while the given worker still holds its lease.
+
+        :return: Whether the task was updated.
+        """
+        try:
+            self.__transaction()
+            cursor = self.__connection.execute(
+                f"UPDATE tasks SET {assignments} WHERE id = ? AND lease_owner = ? AND status = '{TASK_LEASED}'",
+                parameters + (task_id, owner))
+            self.__connection.execute("COMMIT")
+            return cursor.rowcount == 1
+        except Exception as e:
+            self.__rollback()
+            self.__logger.error(f"Error updating task {task_id} in {self.path}: {e}")
+            raise
+
+    def extend_lease(self, task_id: int, owner: str) -> bool:
+        """
+        Extend the lease of a task being processed.
+
+        :param task_id: ID of the task.
+        :param owner: ID of the worker holding the lease.
+        :return: Whether the worker still holds the lease.
+        """
+        return self.__update_leased(task_id, owner, "lease_expires = ?", (time.time() + self.__lease_seconds,))
+
+    def complete(self, task_id: int, owner: str, result) -> bool:
+        """
+        Complete a task with its result. The result of a worker that lost its lease is discarded.
+
+        :param task_id: ID of the task.
+        :param owner: ID of the worker holding the lease.
+        :param result: JSON-serializable result of the task.
+        :return: Whether the result was stored.
+        """
+        return self.__update_leased(task_id, owner, f"status = '{TASK_DONE}', result = ?, error = NULL",
+                                    (json.dumps(result, default=self.__encode),))
+
+    def fail(self, task_id: int, owner: str, error: str) -> bool:
+        """
+        Release a task after an error, to be retried unless it ran out of attempts.
+
+        :param task_id: ID of the task.
+        :param owner: ID of the worker holding the lease.
+        :param error: Description of the error.
+        :return: Whether the task was released.
+        """
+        return self.__update_leased(
+            task_id, owner, f"status = CASE WHEN attempts < ? THEN '{TASK_PENDING}' ELSE '{TASK_FAILED}' END, "
+                            f"lease_owner = NULL, error = ?", (self.__max_attempts, error))
+
+    def get_generations(self, query_id: int, round_number: int) -> dict:
+        """
+        Get the results of the generation tasks of a round.
+
+        :param query_id: ID of the query.
+        :param round_number: Number of the round.
+        :return: Dictionary of (document, non cleaned document, user prompt, system prompt) tuples by agent name.
+        """
+        rows = self.__connection.execute(
+            f"SELECT agent, result FROM tasks WHERE kind = '{TASK_GENERATION}' AND query_id = ? AND round = ? "
+            f"AND status = '{TASK_DONE}'", (query_id, round_number)).fetchall()
+        return {agent: tuple(json.loads(result)) for agent, result in rows}
+
+    def get_history(self, query_id: int = None, last_round: int = None) -> pd.DataFrame:
+        """
+        Get the history of the ranked rounds, with the games in competition order.
+
+        :param query_id: ID of the query, or None for every game.
+        :param last_round: Last round to include, or None for every round.
+        :return: DataFrame with the GAME_HISTORY_COLUMNS followed by the query ID and game ID columns.
+        """
+        rows = self.__connection.execute(
+            f"SELECT task.query_id, task.result FROM tasks AS task JOIN queries USING (query_id) "
+            f"WHERE task.kind = '{TASK_RANKING}' AND task.status = '{TASK_DONE}' "
+            f"AND (:query_id IS NULL OR task.query_id = :query_id) "
+            f"AND (:last_round IS NULL OR task.round <= :last_round) "
+            f"ORDER BY queries.position, task.round", {"query_id": query_id, "last_round": last_round}).fetchall()
+
+        history_rows, query_ids = [], []
+        for row_query_id, result in rows:
+            round_rows = json.loads(result)
+            history_rows.extend(round_rows)
+            query_ids.extend([row_query_id] * len(round_rows))
+        history = pd.DataFrame(history_rows, columns=GAME_HISTORY_COLUMNS)
+        history[HISTORY_RANK_COLUMN] = pd.array(history[HISTORY_RANK_COLUMN], dtype="Int64")
+        history[HISTORY_QUERY_ID_COLUMN] = query_ids
+        history[HISTORY_GAME_ID_COLUMN] = query_ids
+        return history
+
+    def get_progress(self) -> dict:
+        """
+        Count the tasks by status.
+
+        :return: Dictionary of task counts by status.
+        """
+        return dict(self.__connection.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def get_errors(self) -> list:
+        """
+        Get the errors of the failed tasks.
+
+        :return: List of (kind, query ID, round, agent, error) tuples.
+        """
+        return self.__connection.execute(f"SELECT kind, query_id, round, agent, error FROM tasks "
+                                         f"WHERE status = '{TASK_FAILED}'").fetchall()
+
+    def is_finished(self) -> bool:
+        """
+        Check whether the competition is over: every task is done, or a task failed for good.
+
+        :return: Whether workers can stop.
+        """
+        progress = self.get_progress()
+        return progress.get(TASK_FAILED, 0) > 0 or not (progress.get(TASK_PENDING, 0) or progress.get(TASK_LEASED, 0))
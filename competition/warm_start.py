@@ -1,16 +1,89 @@
+import os
+
 import pandas as pd
 
+from competition.feedback_index import FeedbackIndex
+from parsers.history_store import HistoryReader
+from utils.logger import setup_logger
+from constants.constants import (HISTORY_QUERY_ID_COLUMN, HISTORY_GAME_ID_COLUMN, HISTORY_PLAYER_COLUMN,
+                                 HISTORY_ROUND_COLUMN, HISTORY_DOCUMENT_COLUMN, HISTORY_RANK_COLUMN,
+                                 PARQUET_FILE_EXTENSION, WARM_START_LOG_FILE, WARM_START_LOG_NAME)
+
 
 class WarmStart:
-    def __init__(self, competition_history_path: str):
+    def __init__(self, competition_history_path: str = None, competition_history_df: pd.DataFrame = None):
         """
-        Initialize the WarmStart class with the competition history.
+        Initialize the WarmStart class with the competition history and index it by query, player and round.
 
         :param competition_history_path: Path to the competition history.
+        :param competition_history_df: DataFrame containing the competition history, used instead of loading it
+                                       from a path (e.g. the history replayed from a journal).
+        """
+        self.__logger = setup_logger(WARM_START_LOG_NAME, WARM_START_LOG_FILE)
+        if competition_history_df is not None:
+            self.competition_history_df = competition_history_df
+        else:
+            self.competition_history_df = self.__load_history(competition_history_path)
+        self.competition_history_df[HISTORY_QUERY_ID_COLUMN] = (
+            self.competition_history_df[HISTORY_QUERY_ID_COLUMN].astype(int))
+        self.competition_history_df[HISTORY_GAME_ID_COLUMN] = (
+            self.competition_history_df[HISTORY_GAME_ID_COLUMN].astype(int))
+        self.__build_index()
+
+    def __load_history(self, competition_history_path: str) -> pd.DataFrame:
+        """
+        Load the competition history. A Parquet copy next to a configured CSV history is loaded instead only when it is
+        at least as recent as the CSV (or the CSV is missing), so a stale copy never overrides the configured history.
+
+        :param competition_history_path: Path to the competition history (CSV or Parquet).
+        :return: DataFrame containing the competition history.
         """
-        self.competition_history_df = pd.read_csv(competition_history_path)
-        self.competition_history_df['query_id'] = self.competition_history_df['query_id'].astype(int)
-        self.competition_history_df['game_id'] = self.competition_history_df['game_id'].astype(int)
+        path = competition_history_path
+        if not path.endswith(PARQUET_FILE_EXTENSION):
+            parquet_path = os.path.splitext(path)[0] + PARQUET_FILE_EXTENSION
+            if os.path.exists(parquet_path) and (not os.path.exists(path) or
+                                                 os.path.getmtime(parquet_path) >= os.path.getmtime(path)):
+                path = parquet_path
+
+        self.__logger.info(f"Loading the warm start history from {path}")
+        if path.endswith(PARQUET_FILE_EXTENSION):
+            return HistoryReader(path).read()
+        return pd.read_csv(path)
+
+    def __build_index(self):
+        """
+        Partition the history once into per-game frames and a (query_id, player, round) row index,
+        so that every later lookup is a dictionary access instead of a scan over the whole history.
+        """
+        history = self.competition_history_df
+        self.__games = {int(query_id): game_history
+                        for query_id, game_history in history.groupby(HISTORY_QUERY_ID_COLUMN, sort=False)}
+        self.__game_rounds = {query_id: game_history[HISTORY_ROUND_COLUMN].max()
+                              for query_id, game_history in self.__games.items()}
+
+        self.__rows = {}
+        self.__player_rounds = {}
+        for position, (query_id, player, round) in enumerate(zip(history[HISTORY_QUERY_ID_COLUMN].tolist(),
+                                                                 history[HISTORY_PLAYER_COLUMN].tolist(),
+                                                                 history[HISTORY_ROUND_COLUMN].tolist())):
+            self.__rows[(query_id, player, round)] = position
+            if round > self.__player_rounds.get((query_id, player), -1):
+                self.__player_rounds[(query_id, player)] = round
+
+        self.__documents = history[HISTORY_DOCUMENT_COLUMN].values
+        self.__ranks = history[HISTORY_RANK_COLUMN].values
+        self.__feedback_indexes = {}
+
+    def get_feedback_index(self, query_id: int) -> FeedbackIndex:
+        """
+        Get the feedback index of a game, built on first use and shared by all the game's players.
+
+        :param query_id: ID of the query.
+        :return: FeedbackIndex of the game's history.
+        """
+        if query_id not in self.__feedback_indexes:
+            self.__feedback_indexes[query_id] = FeedbackIndex.from_history(self.__games[query_id])
+        return self.__feedback_indexes[query_id]
 
     def set_player(self, player_name: str, query_id: int):
         """
@@ -18,23 +91,24 @@ class WarmStart:
 
         :param player_name: Name of the player.
         :param query_id: ID of the query.
+        :return: Tuple of the player's last round, document, initial document (None when the history has no round 0
+                 for the player), rank and the game's FeedbackIndex.
         """
-        player_history = self.competition_history_df[
-            (self.competition_history_df['player'] == player_name)
-            & (self.competition_history_df['query_id'] == query_id)
-        ]
+        round = self.__player_rounds.get((query_id, player_name))
 
-        if player_history.empty:
+        if round is None:
             return 1, None, None, None, None
 
-        round = player_history['round'].max()
-        document = player_history[player_history['round'] == round]['document'].values[0]
-        init_document = player_history[player_history['round'] == 0]['document'].values[0]
-        rank = player_history[player_history['round'] == round]['rank'].values[0]
-
-        game_history = self.competition_history_df[self.competition_history_df["query_id"] == query_id]
+        position = self.__rows[(query_id, player_name, round)]
+        document = self.__documents[position]
+        init_position = self.__rows.get((query_id, player_name, 0))
+        if init_position is None:
+            self.__logger.warning(f"No initial document for player {player_name} in game {query_id} of the warm start "
+                                  f"history, keeping the player's initial document")
+        init_document = None if init_position is None else self.__documents[init_position]
+        rank = self.__ranks[position]
 
-        return round, document, init_document, rank, game_history
+        return round, document, init_document, rank, self.get_feedback_index(query_id)
 
     def set_game(self, query_id: int):
         """
@@ -42,13 +116,10 @@ class WarmStart:
 
         :param query_id: ID of the query.
         """
-        game_history = self.competition_history_df[self.competition_history_df["query_id"] == query_id]
-        round = game_history['round'].max()
+        if query_id not in self.__games:
+            return self.competition_history_df.iloc[0:0].copy(), 0
 
-        return game_history, round
+        game_history = self.__games[query_id].copy()
+        round = self.__game_rounds[query_id]
 
-    def get_last_run(self):
-        last_query_id = self.competition_history_df.iloc[-1]['query_id']
-        last_round = self.competition_history_df.iloc[-1]['round']
-
-        return last_query_id, last_round
+        return game_history, round
@@ -10,10 +10,13 @@ HISTORY_DOCNO_COLUMN = "docno"
 HISTORY_QUERY_ID_COLUMN = "query_id"
 HISTORY_DOCUMENT_COLUMN = "document"
 HISTORY_GAME_ID_COLUMN = "game_id"
+HISTORY_NOT_CLEAN_DOCUMENT_COLUMN = "not_clean_document"
+HISTORY_SCORE_COLUMN = "score"
+HISTORY_USER_PROMPT_COLUMN = "user_prompt"
+HISTORY_SYSTEM_PROMPT_COLUMN = "system_prompt"
 
 GAME_HISTORY_COLUMNS = ["round", "player", "document",
                         "not_clean_document", "rank", "score", "user_prompt", "system_prompt"]
-PLAYER_HISTORY_COLUMNS = ["round", "document", "feedback"]
 
 QUERY_DF_QUERY_COLUMN = "query"
 QUERY_DF_QUERY_ID_COLUMN = "query_id"
@@ -32,23 +35,148 @@ CONFIG_RANKERS_HEADER = "rankers"
 CONFIG_ROUND_BY_ROUND_HEADER = "round_by_round"
 CONFIG_LLM_HEADER = "llm"
 CONFIG_LLM_MODEL_NAME_HEADER = "model_name"
+CONFIG_LLM_SERVER_HEADER = "server"
+CONFIG_RANKER_SERVICE_HEADER = "service"
 CONFIG_GAME_ROUNDS_HEADER = "rounds"
 QUERIES_DF_PATH_HEADER = "queries_df_path"
+CONFIG_HISTORY_FORMAT_HEADER = "history_format"
+CONFIG_HISTORY_CSV_EXPORT_HEADER = "history_csv_export"
+
+HISTORY_FORMAT_CSV = "csv"
+HISTORY_FORMAT_PARQUET = "parquet"
+PROMPT_HASH_SUFFIX = "_hash"
+PROMPT_HASH_COLUMN = "hash"
+PROMPT_TEXT_COLUMN = "prompt"
+CONFIG_HISTORY_DELTA_DOCUMENTS_HEADER = "history_delta_documents"
+CONFIG_STREAM_TRECTEXT_HEADER = "stream_trectext"
+CONFIG_METRICS_HEADER = "metrics"
+CONFIG_JOURNAL_HEADER = "journal"
+CONFIG_JOURNAL_SYNC_RECORDS_HEADER = "journal_sync_records"
+CONFIG_JOURNAL_RESUME_PATH_HEADER = "journal_resume_path"
+CONFIG_WORKERS_HEADER = "workers"
+CONFIG_GENERATION_CONCURRENCY_HEADER = "generation_concurrency"
+CONFIG_PIPELINE_HEADER = "pipeline"
+CONFIG_AGENT_MAJOR_HEADER = "agent_major"
+CONFIG_RESOURCES_HEADER = "resources"
+CONFIG_RESOURCES_CORES_HEADER = "cores"
+CONFIG_RESOURCES_THREADS_HEADER = "threads"
+CONFIG_PARTITION_CORES_HEADER = "partition_cores"
+CONFIG_MODEL_MEMORY_BUDGET_HEADER = "model_memory_budget_gb"
+CONFIG_LLM_MEMORY_HEADER = "memory_gb"
+CONFIG_CONVERGENCE_HEADER = "convergence"
+CONFIG_GAME_WINDOW_HEADER = "game_window"
+CONFIG_DISTRIBUTED_HEADER = "distributed"
+CONFIG_DISTRIBUTED_QUEUE_PATH_HEADER = "queue_path"
+CONFIG_DISTRIBUTED_LOCAL_WORKERS_HEADER = "local_workers"
+CONFIG_DISTRIBUTED_LEASE_SECONDS_HEADER = "lease_seconds"
+CONFIG_DISTRIBUTED_MAX_ATTEMPTS_HEADER = "max_attempts"
+CONFIG_DISTRIBUTED_POLL_SECONDS_HEADER = "poll_seconds"
+CONFIG_LOGGING_HEADER = "logging"
+CONFIG_LOGGING_ASYNC_HEADER = "async"
+CONFIG_LOGGING_LEVEL_HEADER = "level"
+CONFIG_LOGGING_LEVELS_HEADER = "levels"
+CONFIG_LOGGING_SAMPLING_HEADER = "sampling"
+CONFIG_LOGGING_JSON_HEADER = "json"
+CONFIG_LOGGING_CONSOLE_HEADER = "console"
+
+DELTA_FULL_MARKER = "+"
+DELTA_SAME_MARKER = "="
+DELTA_DIFF_MARKER = "~"
+DEFAULT_DELTA_KEYFRAME_INTERVAL = 8
+DOCUMENT_ENCODING_METADATA_KEY = b"document_encoding"
+DOCUMENT_ENCODING_DELTA = b"delta"
 
 DEFAULT_LLM_AGENT_DEPTH = 1
+DEFAULT_ROUND_STORE_CAPACITY = 64
+DEFAULT_TRECTEXT_BUFFER_SIZE = 1 << 20
+DEFAULT_RANKER_BATCH_SIZE = 32
+DEFAULT_LLM_BATCH_SIZE = 8
+DEFAULT_GENERATION_SERVER_MAX_BATCH_SIZE = 16
+DEFAULT_GENERATION_SERVER_PORT = 6000
+DEFAULT_GENERATION_CONCURRENCY = 1
+DEFAULT_CONVERGENCE_PATIENCE = 2
+DEFAULT_RANKER_SERVICE_PORT = 6100
+DEFAULT_RANKER_SERVICE_BATCH_WINDOW = 0.005
+DEFAULT_RANKER_SERVICE_MAX_BATCH_QUERIES = 64
+DEFAULT_JOURNAL_SYNC_RECORDS = 64
+JOURNAL_GENERATION_RECORD = "generation"
+JOURNAL_HISTORY_RECORD = "history"
+DEFAULT_TASK_LEASE_SECONDS = 600
+DEFAULT_TASK_MAX_ATTEMPTS = 3
+DEFAULT_TASK_POLL_SECONDS = 1.0
+TASK_GENERATION = "generation"
+TASK_RANKING = "ranking"
+TASK_PENDING = "pending"
+TASK_LEASED = "leased"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+LOCAL_HOST = "127.0.0.1"
+SERVICE_BACKLOG = 128
+SERVICE_MIN_REMOTE_AUTHKEY_LENGTH = 16
+GENERATION_SERVER_AUTHKEY_ENV = "LEMSS_GENERATION_SERVER_AUTHKEY"
+RANKER_SERVICE_AUTHKEY_ENV = "LEMSS_RANKER_SERVICE_AUTHKEY"
+SERVICE_OK = "ok"
+SERVICE_ERROR = "error"
+RANKER_SERVICE_RANK = "rank"
+RANKER_SERVICE_STATS = "stats"
+
+STAGE_SETUP = "setup"
+STAGE_ROUND = "round"
+STAGE_GENERATION = "generation"
+STAGE_CLEANING = "cleaning"
+STAGE_TRIMMING = "trimming"
+STAGE_INDEXING = "indexing"
+STAGE_RANKING = "ranking"
+STAGE_FEEDBACK = "feedback"
+STAGE_HISTORY_IO = "history_io"
+STAGE_MODEL_LOAD = "model_load"
+METRIC_PROMPT_TOKENS = "prompt_tokens"
+METRIC_COMPLETION_TOKENS = "completion_tokens"
+METRIC_CLEANING_PROMPT_TOKENS = "cleaning_prompt_tokens"
+METRIC_CLEANING_COMPLETION_TOKENS = "cleaning_completion_tokens"
+METRIC_DOCUMENTS = "documents"
+METRIC_RANKED_DOCUMENTS = "ranked_documents"
+METRIC_MODEL_LOADS = "model_loads"
+METRIC_MODEL_EVICTIONS = "model_evictions"
+METRIC_SKIPPED_GENERATIONS = "skipped_generations"
+METRIC_SKIPPED_RANKINGS = "skipped_rankings"
+MODEL_WEIGHTS_PATTERNS = ("*.safetensors", "*.bin")
+BYTES_PER_GB = 1024 ** 3
+METRICS_PROMETHEUS_PREFIX = "lemss"
+BENCHMARK_FAKE_LLM_MODEL_NAME = "benchmarks/fake-llm"
+BENCHMARK_FAKE_RANKER_MODEL_NAME = "benchmarks/fake-ranker"
+BENCHMARK_CHARACTER = "behave like a BSc student"
+BENCHMARK_PROMPT_FORMAT = "Edit the candidate document to improve its search engine ranking for the candidate query, aiming for the highest rank (1 being the highest). Generate only the edited document, without additional comments or titles.\n"
+BENCHMARK_QUERIES_FILE_NAME = "benchmark_queries.csv"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
 
 MLX_IDENTIFIER = "mlx-community/"
 CLEANING_PROMPT = "Your task is to clean up the document generated by an LLM. Remove any headers, prefixes, or metadata such as \"This is the modified document\" or similar phrases that are not part of the actual content. Exclude statements that describe how the document was modified or its characteristics, such as its length or ranking. Specifically, omit sentences like the following:\n\n- [The text above is the extracted document part.]\n- The extracted document part:\n- [The document text remains unchanged.]\n- (The extracted document part ends here)\n- [Document text only, no modifications or additions made.]\n- [End of Document]\n- [The rest of the text is not the document part and will be ignored.]\n- [Document Text Only]\n- *Here is the document text you requested, unaltered:*\n- To improve the ranking\n- the document length is 147 words\n\nImportant: Do not change or modify the actual content of the document. Only remove unnecessary prefixes, headers, or metadata, leaving the original text of the document untouched and unaltered. The output should read naturally, without unnecessary formatting or markers."
 
 CONFIG_FILE_NAME = "config.json"
 COMPETITION_HISTORY_FILE_NAME = "competition_history.csv"
+PARQUET_FILE_EXTENSION = ".parquet"
+COMPETITION_HISTORY_PARQUET_FILE_NAME = "competition_history.parquet"
+PROMPTS_FILE_NAME = "prompts.parquet"
 TRECTEXT_FILE_NAME = "output.trectext"
+METRICS_FILE_NAME = "metrics.json"
+METRICS_ROUNDS_FILE_NAME = "metrics_rounds.jsonl"
+METRICS_PROMETHEUS_FILE_NAME = "metrics.prom"
+JOURNAL_FILE_NAME = "journal.jsonl"
+SHARDS_FOLDER = "shards"
+SHARD_FOLDER_FORMAT = "shard-{:02d}"
+SHARD_QUERIES_FILE_NAME = "queries.csv"
+TASK_QUEUE_FILE_NAME = "task_queue.sqlite"
+WORKERS_FOLDER = "workers"
+TRECTEXT_INDEX_SUFFIX = ".idx"
+CACHE_FOLDER = "cache"
 
 PROJECT_DIR = os.path.abspath(os.path.join(
     os.path.dirname(__file__), os.pardir))
 OUTPUTS_DIR = os.path.join(PROJECT_DIR, "outputs")
 
 LOGS_FOLDER = "logs"
+LOG_FORMAT = '%(asctime)s - %(pathname)s - %(filename)s - %(lineno)d - %(levelname)s - %(message)s'
 
 AGENT_LOG_FILE = "agent.log"
 LLM_AGENT_LOG_FILE = "llm_agent.log"
@@ -58,8 +186,16 @@ GAME_LOG_FILE = "game.log"
 HUGGING_FACE_LLM_LOG_FILE = "hugging_face_llm.log"
 LLM_LOG_FILE = "llm.log"
 MLX_LLM_LOG_FILE = "mlx_llm.log"
+SERVED_LLM_LOG_FILE = "served_llm.log"
+GENERATION_SERVER_LOG_FILE = "generation_server.log"
 QUERY_PARSER_LOG_FILE = "query_parser.log"
 TREC_PARSER_LOG_FILE = "trec_parser.log"
+TRECTEXT_READER_LOG_FILE = "trectext_reader.log"
+HISTORY_STORE_LOG_FILE = "history_store.log"
+TRECTEXT_WRITER_LOG_FILE = "trectext_writer.log"
+JOURNAL_LOG_FILE = "journal.log"
+TASK_QUEUE_LOG_FILE = "task_queue.log"
+DISTRIBUTED_WORKER_LOG_FILE = "distributed_worker.log"
 STATIC_PLAYER_LOG_FILE = "static_player.log"
 LLM_PLAYER_LOG_FILE = "llm_player.log"
 PLAYER_LOG_FILE = "player.log"
@@ -69,6 +205,12 @@ EMBEDDING_RANKER_LOG_FILE = "embedding_ranker.log"
 INDEX_RANKER_LOG_FILE = "index_ranker.log"
 OKAPI_RANKER_LOG_FILE = "okapi_ranker.log"
 RANKER_LOG_FILE = "ranker.log"
+RANKER_SERVICE_LOG_FILE = "ranker_service.log"
+REMOTE_RANKER_LOG_FILE = "remote_ranker.log"
+RESOURCES_LOG_FILE = "resources.log"
+MODEL_MANAGER_LOG_FILE = "model_manager.log"
+MANAGED_LLM_LOG_FILE = "managed_llm.log"
+WARM_START_LOG_FILE = "warm_start.log"
 
 AGENT_LOG_NAME = "Agent"
 LLM_AGENT_LOG_NAME = "LLM Agent"
@@ -78,8 +220,16 @@ GAME_LOG_NAME = "Game"
 HUGGING_FACE_LLM_LOG_NAME = "Hugging Face LLM"
 LLM_LOG_NAME = "LLM"
 MLX_LLM_LOG_NAME = "MLX LLM"
+SERVED_LLM_LOG_NAME = "Served LLM"
+GENERATION_SERVER_LOG_NAME = "Generation Server"
 QUERY_PARSER_LOG_NAME = "Query Parser"
 TREC_PARSER_LOG_NAME = "Trec Parser"
+TRECTEXT_READER_LOG_NAME = "Trectext Reader"
+HISTORY_STORE_LOG_NAME = "History Store"
+TRECTEXT_WRITER_LOG_NAME = "Trectext Writer"
+JOURNAL_LOG_NAME = "Journal"
+TASK_QUEUE_LOG_NAME = "Task Queue"
+DISTRIBUTED_WORKER_LOG_NAME = "Distributed Worker"
 LLM_PLAYER_LOG_NAME = "LLM Player"
 STATIC_PLAYER_LOG_NAME = "Static Player"
 PLAYER_LOG_NAME = "Player"
@@ -89,3 +239,9 @@ EMBEDDING_RANKER_LOG_NAME = "Embedding Ranker"
 INDEX_RANKER_LOG_NAME = "Index Ranker"
 OKAPI_RANKER_LOG_NAME = "Okapi Ranker"
 RANKER_LOG_NAME = "Ranker"
+RANKER_SERVICE_LOG_NAME = "Ranker Service"
+REMOTE_RANKER_LOG_NAME = "Remote Ranker"
+RESOURCES_LOG_NAME = "Resources"
+MODEL_MANAGER_LOG_NAME = "Model Manager"
+MANAGED_LLM_LOG_NAME = "Managed LLM"
+WARM_START_LOG_NAME = "Warm Start"
@@ -2,8 +2,10 @@ import json
 import argparse
 
 from competition import Competition
+from competition.distributed import run_worker
 from utils import create_competition_folder
-from utils.logger import set_competition_hash_folder
+from utils.logger import set_competition_hash_folder, configure_logging, shutdown_logging
+from constants.constants import CONFIG_LOGGING_HEADER
 
 
 def main(config_file):
@@ -12,14 +14,27 @@ def main(config_file):
 
     output_folder = create_competition_folder(config)
     set_competition_hash_folder(output_folder)
+    configure_logging(config.get(CONFIG_LOGGING_HEADER))
 
     competition = Competition(config)
     competition.run_competition(output_folder)
+    shutdown_logging()
+
+def worker(queue_path):
+    """Worker function to process the tasks of a distributed competition"""
+    run_worker(queue_path)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the competition")
-    parser.add_argument("--config_file", type=str, required=True, help="Path to the configuration json")
+    parser.add_argument("--config_file", type=str, help="Path to the configuration json")
+    parser.add_argument("--worker", type=str, metavar="QUEUE_PATH",
+                        help="Run a worker of the distributed competition submitted to this task queue")
 
     args = parser.parse_args()
 
-    main(args.config_file)
+    if args.worker:
+        worker(args.worker)
+    elif args.config_file:
+        main(args.config_file)
+    else:
+        parser.error("one of --config_file or --worker is required")
@@ -2,5 +2,7 @@
 
 from .query_parser import QueryParser
 from .trec_parser import TrecParser
+from .trectext_reader import TrecTextReader
+from .history_store import HistoryReader, HistoryWriter
 
-__all__ = ['QueryParser', 'TrecParser']
+__all__ = ['QueryParser', 'TrecParser', 'TrecTextReader', 'HistoryReader', 'HistoryWriter']
@@ -0,0 +1,295 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from utils.logger import setup_logger
+from utils.document_store import DocumentStore, encode_delta, decode_delta
+from constants.constants import (HISTORY_STORE_LOG_FILE, HISTORY_STORE_LOG_NAME, PROMPTS_FILE_NAME,
+                                 HISTORY_ROUND_COLUMN, HISTORY_PLAYER_COLUMN, HISTORY_DOCUMENT_COLUMN,
+                                 HISTORY_NOT_CLEAN_DOCUMENT_COLUMN, HISTORY_RANK_COLUMN, HISTORY_SCORE_COLUMN,
+                                 HISTORY_USER_PROMPT_COLUMN, HISTORY_SYSTEM_PROMPT_COLUMN, HISTORY_QUERY_ID_COLUMN,
+                                 HISTORY_GAME_ID_COLUMN, HISTORY_DOCNO_COLUMN, PROMPT_HASH_SUFFIX, PROMPT_HASH_COLUMN,
+                                 PROMPT_TEXT_COLUMN, DELTA_FULL_MARKER, DEFAULT_DELTA_KEYFRAME_INTERVAL,
+                                 DOCUMENT_ENCODING_METADATA_KEY, DOCUMENT_ENCODING_DELTA)
+
+PROMPT_COLUMNS = [HISTORY_USER_PROMPT_COLUMN, HISTORY_SYSTEM_PROMPT_COLUMN]
+DOCUMENT_COLUMNS = [HISTORY_DOCUMENT_COLUMN, HISTORY_NOT_CLEAN_DOCUMENT_COLUMN]
+
+
+def hash_prompt(prompt) -> str:
+    """
+    Compute the content address of a prompt.
+
+    :param prompt: Prompt text (None and NaN are not hashed).
+    :return: Hex digest of the prompt, or None for a missing prompt.
+    """
+    if prompt is None or (isinstance(prompt, float) and pd.isna(prompt)):
+        return None
+    return hashlib.blake2b(str(prompt).encode("utf8"), digest_size=16).hexdigest()
+
+
+def text_values(values: pd.Series) -> list:
+    """
+    Convert a column to a list of strings, with None for missing values.
+
+    :param values: Column values.
+    :return: List of strings or None.
+    """
+    return [None if value is None or (isinstance(value, float) and pd.isna(value)) else str(value)
+            for value in values]
+
+
+class HistoryWriter:
+    """
+        Class responsible for writing the competition history as a compressed Parquet file with typed columns,
+        dictionary-encoded players and queries, and prompts moved to a content-addressed side table.
+        Documents can optionally be stored as deltas against the same player's document in the previous round.
+    """
+
+    def __init__(self, history_path: str, prompts_path: str = None, compression: str = "zstd",
+                 delta_documents: bool = False, keyframe_interval: int = DEFAULT_DELTA_KEYFRAME_INTERVAL):
+        """
+        Initialize the HistoryWriter. Files are created on the first write and appended to on every later write.
+
+        :param history_path: Path to the history Parquet file.
+        :param prompts_path: Path to the prompts side table, defaults to a file next to the history.
+        :param compression: Parquet compression codec.
+        :param delta_documents: Whether to delta-encode the document columns across rounds.
+        :param keyframe_interval: Maximum number of deltas between two fully stored documents of a player.
+        """
+        import pyarrow as pa
+
+        self.__logger = setup_logger(HISTORY_STORE_LOG_NAME, HISTORY_STORE_LOG_FILE)
+        self.__history_path = history_path
+        self.__prompts_path = prompts_path or os.path.join(os.path.dirname(history_path), PROMPTS_FILE_NAME)
+        self.__compression = compression
+        self.__history_writer = None
+        self.__prompts_writer = None
+        self.__seen_prompts = set()
+        self.__delta_documents = delta_documents
+        self.__keyframe_interval = keyframe_interval
+        self.__tips = {}
+
+        dictionary = pa.dictionary(pa.int32(), pa.string())
+        self.__schema = pa.schema([
+            (HISTORY_ROUND_COLUMN, pa.int16()),
+            (HISTORY_PLAYER_COLUMN, dictionary),
+            (HISTORY_DOCUMENT_COLUMN, pa.string()),
+            (HISTORY_NOT_CLEAN_DOCUMENT_COLUMN, pa.string()),
+            (HISTORY_RANK_COLUMN, pa.int16()),
+            (HISTORY_SCORE_COLUMN, pa.float64()),
+            (HISTORY_USER_PROMPT_COLUMN + PROMPT_HASH_SUFFIX, pa.string()),
+            (HISTORY_SYSTEM_PROMPT_COLUMN + PROMPT_HASH_SUFFIX, pa.string()),
+            (HISTORY_QUERY_ID_COLUMN, dictionary),
+            (HISTORY_GAME_ID_COLUMN, dictionary),
+            (HISTORY_DOCNO_COLUMN, pa.string()),
+        ])
+        if delta_documents:
+            self.__schema = self.__schema.with_metadata({DOCUMENT_ENCODING_METADATA_KEY: DOCUMENT_ENCODING_DELTA})
+        self.__prompts_schema = pa.schema([(PROMPT_HASH_COLUMN, pa.string()), (PROMPT_TEXT_COLUMN, pa.string())])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __encode_documents(self, columns: dict) -> None:
+        """
+        Replace the document columns with their delta encodings. Rows of the same game and player are encoded
+        against each other in the order they are written, which is round order.
+
+        :param columns: Dictionary of already converted columns, updated in place.
+        """
+        for column in DOCUMENT_COLUMNS:
+            encoded_column = []
+            for game_id, player, document in zip(columns[HISTORY_GAME_ID_COLUMN], columns[HISTORY_PLAYER_COLUMN],
+                                                  columns[column]):
+                key = (game_id, player, column)
+                base, chain = self.__tips.get(key, (None, 0))
+                encoded = encode_delta(base if chain < self.__keyframe_interval else None, document)
+                if encoded is not None:
+                    chain = 0 if encoded[:1] == DELTA_FULL_MARKER else chain + 1
+                    self.__tips[key] = (document, chain)
+                encoded_column.append(encoded)
+            columns[column] = encoded_column
+
+    def write(self, history_df: pd.DataFrame) -> None:
+        """
+        Append a batch of history rows to the Parquet file, storing each distinct prompt only once.
+
+        :param history_df: DataFrame containing history rows in the competition history layout.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        try:
+            columns = {}
+            new_prompts = {}
+            for column in PROMPT_COLUMNS:
+                hashes = []
+                for prompt in history_df[column]:
+                    digest = hash_prompt(prompt)
+                    if digest is not None and digest not in self.__seen_prompts:
+                        self.__seen_prompts.add(digest)
+                        new_prompts[digest] = str(prompt)
+                    hashes.append(digest)
+                columns[column + PROMPT_HASH_SUFFIX] = hashes
+
+            columns[HISTORY_ROUND_COLUMN] = pd.to_numeric(history_df[HISTORY_ROUND_COLUMN]).astype("Int16")
+            columns[HISTORY_RANK_COLUMN] = pd.to_numeric(history_df[HISTORY_RANK_COLUMN]).astype("Int16")
+            columns[HISTORY_SCORE_COLUMN] = pd.to_numeric(history_df[HISTORY_SCORE_COLUMN]).astype("Float64")
+            for column in [HISTORY_PLAYER_COLUMN, HISTORY_DOCUMENT_COLUMN, HISTORY_NOT_CLEAN_DOCUMENT_COLUMN,
+                           HISTORY_QUERY_ID_COLUMN, HISTORY_GAME_ID_COLUMN, HISTORY_DOCNO_COLUMN]:
+                columns[column] = text_values(history_df[column]) if column in history_df \
+                    else [None] * len(history_df)
+            if self.__delta_documents:
+                self.__encode_documents(columns)
+
+            table = pa.Table.from_pydict(
+                {field.name: pa.array(columns[field.name], type=field.type, from_pandas=True)
+                 for field in self.__schema}, schema=self.__schema)
+
+            if self.__history_writer is None:
+                self.__history_writer = pq.ParquetWriter(self.__history_path, self.__schema,
+                                                         compression=self.__compression)
+            self.__history_writer.write_table(table)
+
+            if new_prompts:
+                if self.__prompts_writer is None:
+                    self.__prompts_writer = pq.ParquetWriter(self.__prompts_path, self.__prompts_schema,
+                                                             compression=self.__compression)
+                self.__prompts_writer.write_table(pa.Table.from_pydict(
+                    {PROMPT_HASH_COLUMN: list(new_prompts.keys()), PROMPT_TEXT_COLUMN: list(new_prompts.values())},
+                    schema=self.__prompts_schema))
+
+            self.__logger.info(f"Wrote {len(history_df)} history rows and {len(new_prompts)} new prompts.")
+        except Exception as e:
+            self.__logger.error(f"Error writing history to {self.__history_path}: {e}")
+            raise
+
+    def close(self) -> None:
+        """
+        Close the Parquet writers and finalize the files.
+        """
+        if self.__history_writer is not None:
+            self.__history_writer.close()
+            self.__history_writer = None
+        if self.__prompts_writer is not None:
+            self.__prompts_writer.close()
+            self.__prompts_writer = None
+
+
+class HistoryReader:
+    """
+        Class responsible for reading a columnar competition history back into the CSV-compatible layout.
+    """
+
+    def __init__(self, history_path: str, prompts_path: str = None):
+        """
+        Initialize the HistoryReader.
+
+        :param history_path: Path to the history Parquet file.
+        :param prompts_path: Path to the prompts side table, defaults to a file next to the history.
+        """
+        self.__logger = setup_logger(HISTORY_STORE_LOG_NAME, HISTORY_STORE_LOG_FILE)
+        self.__history_path = history_path
+        self.__prompts_path = prompts_path or os.path.join(os.path.dirname(history_path), PROMPTS_FILE_NAME)
+
+    def read_prompts(self) -> dict:
+        """
+        Read the prompts side table.
+
+        :return: Dictionary mapping prompt hashes to prompt texts.
+        """
+        if not os.path.exists(self.__prompts_path):
+            return {}
+        prompts = pd.read_parquet(self.__prompts_path)
+        return dict(zip(prompts[PROMPT_HASH_COLUMN], prompts[PROMPT_TEXT_COLUMN]))
+
+    def is_delta_encoded(self) -> bool:
+        """
+        Check whether the document columns of the history are delta-encoded.
+
+        :return: True if the documents are stored as deltas.
+        """
+        import pyarrow.parquet as pq
+
+        metadata = pq.read_schema(self.__history_path).metadata or {}
+        return metadata.get(DOCUMENT_ENCODING_METADATA_KEY) == DOCUMENT_ENCODING_DELTA
+
+    def read_documents(self) -> DocumentStore:
+        """
+        Load the documents into a DocumentStore without materializing them. Documents are keyed by
+        (game ID, player, column) and materialized on request with DocumentStore.get(key, round).
+
+        :return: DocumentStore holding the history's documents.
+        """
+        history_df = pd.read_parquet(self.__history_path, columns=[HISTORY_GAME_ID_COLUMN, HISTORY_PLAYER_COLUMN,
+                                                                   HISTORY_ROUND_COLUMN] + DOCUMENT_COLUMNS)
+        delta_encoded = self.is_delta_encoded()
+        store = DocumentStore()
+        for column in DOCUMENT_COLUMNS:
+            for game_id, player, round, document in zip(history_df[HISTORY_GAME_ID_COLUMN],
+                                                        history_df[HISTORY_PLAYER_COLUMN],
+                                                        history_df[HISTORY_ROUND_COLUMN],
+                                                        text_values(history_df[column])):
+                key = (game_id, player, column)
+                if delta_encoded:
+                    store.put_encoded(key, int(round), document)
+                else:
+                    store.put(key, int(round), document)
+        return store
+
+    def __materialize_documents(self, history_df: pd.DataFrame) -> None:
+        """
+        Replace the delta-encoded document columns with the full document texts, in place.
+
+        :param history_df: DataFrame containing the delta-encoded history.
+        """
+        for column in DOCUMENT_COLUMNS:
+            tips = {}
+            documents = []
+            for game_id, player, encoded in zip(history_df[HISTORY_GAME_ID_COLUMN], history_df[HISTORY_PLAYER_COLUMN],
+                                                text_values(history_df[column])):
+                key = (game_id, player)
+                document = decode_delta(tips.get(key), encoded)
+                if document is not None:
+                    tips[key] = document
+                documents.append(document)
+            history_df[column] = documents
+
+    def read(self, resolve_prompts: bool = True) -> pd.DataFrame:
+        """
+        Read the history, materializing delta-encoded documents.
+
+        :param resolve_prompts: Whether to replace the prompt hashes with the prompt texts.
+        :return: DataFrame containing the competition history.
+        """
+        try:
+            history_df = pd.read_parquet(self.__history_path)
+            for column in [HISTORY_PLAYER_COLUMN, HISTORY_QUERY_ID_COLUMN, HISTORY_GAME_ID_COLUMN]:
+                history_df[column] = history_df[column].astype(object)
+            if self.is_delta_encoded():
+                self.__materialize_documents(history_df)
+
+            if resolve_prompts:
+                prompts = self.read_prompts()
+                for column in PROMPT_COLUMNS:
+                    position = history_df.columns.get_loc(column + PROMPT_HASH_SUFFIX)
+                    history_df.insert(position, column, history_df.pop(column + PROMPT_HASH_SUFFIX).map(prompts))
+
+            return history_df
+        except Exception as e:
+            self.__logger.error(f"Error reading history from {self.__history_path}: {e}")
+            raise
+
+    def to_csv(self, csv_path: str) -> None:
+        """
+        Export the history to the CSV layout used by earlier versions of the platform.
+
+        :param csv_path: Path to the output CSV file.
+        """
+        self.read().to_csv(csv_path, index=False)
+        self.__logger.info(f"History exported to {csv_path}")
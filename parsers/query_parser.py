@@ -1,9 +1,9 @@
 import os
-import re
 import xml.etree.ElementTree as ET
 
 import pandas as pd
 
+from parsers.trectext_reader import TrecTextReader
 from utils.logger import setup_logger
 from constants.constants import (QUERY_PARSER_LOG_FILE, QUERY_PARSER_LOG_NAME, PROJECT_DIR,
                                  QUERY_DF_QUERY_COLUMN, QUERY_DF_QUERY_ID_COLUMN, QUERY_DF_DOCUMENT_COLUMN,
@@ -65,26 +65,18 @@ class QueryParser:
         :return: DataFrame containing parsed documents.
         """
         try:
-            with open(self.__docs_file_path, 'r', encoding="utf8") as file:
-                content = file.read()
+            reader = TrecTextReader(self.__docs_file_path)
         except IOError as e:
             self.__logger.error(f"Error reading TREC text file from {self.__docs_file_path}: {e}")
             raise
 
-        docs = re.findall(r'<DOC>(.*?)</DOC>', content, re.DOTALL)
         parsed_docs = []
-
-        if not docs:
-            self.__logger.error("No documents found in TREC text file.")
-            raise ValueError("No documents found in TREC text file.")
-
-        for doc in docs:
-            try:
-                query_id = re.search(r'<DOCNO>(.*?)</DOCNO>', doc).group(1).split('-')[2]
-                text = re.search(r'<TEXT>(.*?)</TEXT>', doc, re.DOTALL).group(1).strip()
-                parsed_docs.append((query_id, text))
-            except AttributeError as e:
-                self.__logger.error(f"Error parsing document: {e}")
+        with reader:
+            for docno, text in reader.iter_documents():
+                try:
+                    parsed_docs.append((docno.split('-')[2], text))
+                except IndexError as e:
+                    self.__logger.error(f"Error parsing document {docno}: {e}")
 
         return pd.DataFrame(parsed_docs, columns=[QUERY_DF_QUERY_ID_COLUMN, QUERY_DF_DOCUMENT_COLUMN])
 
@@ -1,9 +1,23 @@
 import pandas as pd
 
+from parsers.trectext_writer import TrecTextWriter
 from utils.logger import setup_logger
 from constants.constants import (TREC_PARSER_LOG_FILE, TREC_PARSER_LOG_NAME,
                                  HISTORY_PLAYER_COLUMN, HISTORY_ROUND_COLUMN, HISTORY_QUERY_ID_COLUMN,
-                                 HISTORY_DOCUMENT_COLUMN)
+                                 HISTORY_DOCUMENT_COLUMN, HISTORY_DOCNO_COLUMN)
+
+
+def build_docnos(history_df: pd.DataFrame, agent_mapping: dict) -> pd.Series:
+    """
+    Build the ROUND-xx-qid-yy document IDs of a history DataFrame with vectorized string operations.
+
+    :param history_df: DataFrame containing the round, query ID and player columns.
+    :param agent_mapping: Dictionary mapping agent names to author IDs.
+    :return: Series of document IDs aligned with the history.
+    """
+    rounds = history_df[HISTORY_ROUND_COLUMN].astype(int).astype(str).str.zfill(2)
+    author_ids = history_df[HISTORY_PLAYER_COLUMN].map(agent_mapping).astype(int).astype(str).str.zfill(2)
+    return "ROUND-" + rounds + "-" + history_df[HISTORY_QUERY_ID_COLUMN].astype(str) + "-" + author_ids
 
 
 class TrecParser:
@@ -39,6 +53,14 @@ class TrecParser:
 
         return agent_mapping
 
+    def create_docnos(self) -> pd.Series:
+        """
+        Create the document IDs of the combined history.
+
+        :return: Series of document IDs.
+        """
+        return build_docnos(self.__history_df, self.__agent_to_id)
+
     def create_trectext(self, output_file: str):
         """
         Create a TREC text file from the combined history DataFrame.
@@ -46,18 +68,13 @@ class TrecParser:
         :param output_file: Path to the output TREC text file.
         """
         try:
-            with open(output_file, 'w') as file:
-                for index, row in self.__history_df.iterrows():
-                    author_id = self.__agent_to_id[row[HISTORY_PLAYER_COLUMN]]
-                    docno = f"ROUND-{row[HISTORY_ROUND_COLUMN]:02d}-{row[HISTORY_QUERY_ID_COLUMN]}-{author_id:02d}"
-                    text = row[HISTORY_DOCUMENT_COLUMN].strip()
-
-                    file.write("<DOC>\n")
-                    file.write(f"<DOCNO>{docno}</DOCNO>\n")
-                    file.write("<TEXT>\n")
-                    file.write(f"{text}\n")
-                    file.write("</TEXT>\n")
-                    file.write("</DOC>\n")
+            if HISTORY_DOCNO_COLUMN in self.__history_df:
+                docnos = self.__history_df[HISTORY_DOCNO_COLUMN]
+            else:
+                docnos = self.create_docnos()
+
+            with TrecTextWriter(output_file) as writer:
+                writer.write_documents(docnos, self.__history_df[HISTORY_DOCUMENT_COLUMN])
         except Exception as e:
             self.__logger.error(f"Error creating TREC text file: {e}")
             raise
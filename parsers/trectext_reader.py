@@ -0,0 +1,274 @@
+import hashlib
+import mmap
+import os
+import re
+from typing import Iterator, List, Tuple, Union
+
+from utils.logger import setup_logger, get_competition_hash_folder
+from constants.constants import (TRECTEXT_READER_LOG_FILE, TRECTEXT_READER_LOG_NAME, TRECTEXT_INDEX_SUFFIX,
+                                 CACHE_FOLDER)
+
+DOC_PATTERN = re.compile(rb'<DOC>(.*?)</DOC>', re.DOTALL)
+DOCNO_PATTERN = re.compile(rb'<DOCNO>(.*?)</DOCNO>', re.DOTALL)
+TEXT_PATTERN = re.compile(rb'<TEXT>(.*?)</TEXT>', re.DOTALL)
+WHITESPACE = b" \t\r\n"
+
+
+class TrecTextReader:
+    """
+        Class responsible for random and streaming access to a TREC text file without loading it into memory.
+        The file is memory-mapped and a sidecar index maps every DOCNO to the byte ranges of its texts. The index is
+        kept in the cache folder of the competition, never next to the input file unless asked to. Documents sharing
+        a DOCNO are all kept: streaming yields each of them, random access returns the first.
+    """
+
+    def __init__(self, trectext_path: str, index_path: str = None, persist_index: bool = True,
+                 rebuild_index: bool = False):
+        """
+        Initialize the TrecTextReader and load (or build) the DOCNO offset index.
+
+        :param trectext_path: Path to the TREC text file.
+        :param index_path: Path to the sidecar index file, defaults to a file named after the TREC text file in the
+                           cache folder of the competition.
+        :param persist_index: Whether to write the index to its path after building it.
+        :param rebuild_index: Whether to ignore an existing index and scan the file again.
+        """
+        self.__logger = setup_logger(TRECTEXT_READER_LOG_NAME, TRECTEXT_READER_LOG_FILE)
+        self.__path = trectext_path
+        self.__index_path = index_path or self.__default_index_path(trectext_path)
+        self.__documents = []
+        self.__offsets = {}
+        self.__by_query = {}
+        self.__by_round = {}
+
+        try:
+            self.__file = open(self.__path, 'rb')
+        except IOError as e:
+            self.__logger.error(f"Error opening TREC text file {self.__path}: {e}")
+            raise
+        try:
+            stat = os.fstat(self.__file.fileno())
+            if stat.st_size == 0:
+                raise ValueError(f"TREC text file {self.__path} is empty.")
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, ValueError) as e:
+            self.__file.close()
+            self.__logger.error(f"Error opening TREC text file {self.__path}: {e}")
+            raise
+
+        self.__signature = f"{stat.st_size}\t{stat.st_mtime_ns}"
+        if rebuild_index or not self.__load_index():
+            self.__build_index()
+            if persist_index:
+                self.__save_index()
+
+        if not self.__offsets:
+            self.close()
+            self.__logger.error(f"No documents found in TREC text file {self.__path}.")
+            raise ValueError("No documents found in TREC text file.")
+
+    @staticmethod
+    def __default_index_path(trectext_path: str) -> str:
+        """
+        Get the default path of the sidecar index of a TREC text file, in the cache folder of the competition. The name
+        holds a hash of the file's absolute path, so files with the same name in different folders keep their own index.
+
+        :param trectext_path: Path to the TREC text file.
+        :return: Path to the sidecar index file.
+        """
+        path_hash = hashlib.md5(os.path.abspath(trectext_path).encode("utf8")).hexdigest()[:8]
+        return os.path.join(get_competition_hash_folder(), CACHE_FOLDER,
+                            f"{os.path.basename(trectext_path)}-{path_hash}{TRECTEXT_INDEX_SUFFIX}")
+
+    def __register(self, docno: str, start: int, end: int) -> None:
+        """
+        Add a document's byte range to the documents in file order, to the DOCNO index and to the query and round
+        indexes. A duplicate DOCNO keeps the ranges of all its documents.
+
+        :param docno: Document ID in the ROUND-xx-qid-yy format.
+        :param start: Offset of the first byte of the text.
+        :param end: Offset one past the last byte of the text.
+        """
+        position = len(self.__documents)
+        self.__documents.append((docno, start, end))
+        self.__offsets.setdefault(docno, []).append((start, end))
+        parts = docno.split('-')
+        if len(parts) == 4 and parts[1].isdigit():
+            self.__by_round.setdefault(int(parts[1]), []).append(position)
+            self.__by_query.setdefault(parts[2], []).append(position)
+
+    def __build_index(self) -> None:
+        """
+        Scan the memory-mapped file once and record the stripped text range of every document. The DOCNO and TEXT of
+        a document are searched within its <DOC> element, so a document without a TEXT is skipped.
+        """
+        self.__logger.info(f"Building DOCNO index for {self.__path}")
+        mm = self.__mmap
+        for match in DOC_PATTERN.finditer(mm):
+            docno = DOCNO_PATTERN.search(mm, match.start(1), match.end(1))
+            text = TEXT_PATTERN.search(mm, match.start(1), match.end(1))
+            if docno is None or text is None:
+                self.__logger.warning(f"Skipping a document without DOCNO or TEXT at byte {match.start()} of "
+                                      f"{self.__path}.")
+                continue
+            start, end = text.start(1), text.end(1)
+            while start < end and mm[start] in WHITESPACE:
+                start += 1
+            while end > start and mm[end - 1] in WHITESPACE:
+                end -= 1
+            self.__register(docno.group(1).decode("utf8").strip(), start, end)
+        self.__logger.info(f"Indexed {len(self.__documents)} documents in {self.__path}")
+        duplicates = len(self.__documents) - len(self.__offsets)
+        if duplicates:
+            self.__logger.warning(f"{duplicates} documents of {self.__path} repeat the DOCNO of an earlier document, "
+                                  f"random access by DOCNO returns the first of them.")
+
+    def __load_index(self) -> bool:
+        """
+        Load the sidecar index if it exists and matches the current size and modification time of the file.
+
+        :return: True if the index was loaded, False if it has to be rebuilt.
+        """
+        if not os.path.exists(self.__index_path):
+            return False
+        try:
+            with open(self.__index_path, 'r', encoding="utf8") as file:
+                if file.readline().rstrip("\n") != self.__signature:
+                    self.__logger.info(f"Index {self.__index_path} is stale, rebuilding.")
+                    return False
+                for line in file:
+                    docno, start, end = line.rstrip("\n").split("\t")
+                    self.__register(docno, int(start), int(end))
+            return True
+        except (IOError, ValueError) as e:
+            self.__logger.warning(f"Could not load index {self.__index_path}, rebuilding: {e}")
+            self.__documents, self.__offsets, self.__by_query, self.__by_round = [], {}, {}, {}
+            return False
+
+    def __save_index(self) -> None:
+        """
+        Persist the documents' ranges in file order as a tab separated sidecar file, headed by the file signature.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.__index_path) or ".", exist_ok=True)
+            with open(self.__index_path, 'w', encoding="utf8") as file:
+                file.write(f"{self.__signature}\n")
+                for docno, start, end in self.__documents:
+                    file.write(f"{docno}\t{start}\t{end}\n")
+        except IOError as e:
+            self.__logger.warning(f"Could not persist index {self.__index_path}: {e}")
+
+    def __len__(self) -> int:
+        return len(self.__offsets)
+
+    def __contains__(self, docno: str) -> bool:
+        return docno in self.__offsets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_byte_range(self, docno: str) -> Tuple[int, int]:
+        """
+        Get the byte range of a document's text, the first document with the DOCNO if it is repeated.
+
+        :param docno: Document ID.
+        :return: Tuple of start and end offsets.
+        """
+        return self.get_byte_ranges(docno)[0]
+
+    def get_byte_ranges(self, docno: str) -> List[Tuple[int, int]]:
+        """
+        Get the byte ranges of the texts of every document with a DOCNO, in file order.
+
+        :param docno: Document ID.
+        :return: List of tuples of start and end offsets.
+        """
+        try:
+            return self.__offsets[docno]
+        except KeyError:
+            self.__logger.error(f"Document '{docno}' not found in {self.__path}.")
+            raise
+
+    def get(self, docno: str) -> memoryview:
+        """
+        Get a zero-copy view of a document's text. The view must be released before the reader is closed.
+
+        :param docno: Document ID.
+        :return: Memoryview over the UTF-8 encoded text.
+        """
+        start, end = self.get_byte_range(docno)
+        return memoryview(self.__mmap)[start:end]
+
+    def get_text(self, docno: str) -> str:
+        """
+        Get a document's text as a string.
+
+        :param docno: Document ID.
+        :return: Decoded document text.
+        """
+        start, end = self.get_byte_range(docno)
+        return self.__mmap[start:end].decode("utf8")
+
+    def get_query_ids(self) -> list:
+        """
+        Get the query IDs present in the file, in order of first appearance.
+
+        :return: List of query IDs.
+        """
+        return list(self.__by_query)
+
+    def get_rounds(self) -> list:
+        """
+        Get the rounds present in the file, in ascending order.
+
+        :return: List of round numbers.
+        """
+        return sorted(self.__by_round)
+
+    def __iter_positions(self, positions, decode: bool) -> Iterator[Tuple[str, Union[str, memoryview]]]:
+        for position in positions:
+            docno, start, end = self.__documents[position]
+            yield docno, self.__mmap[start:end].decode("utf8") if decode else memoryview(self.__mmap)[start:end]
+
+    def iter_documents(self, decode: bool = True) -> Iterator[Tuple[str, Union[str, memoryview]]]:
+        """
+        Stream every document in file order, including the documents of a repeated DOCNO.
+
+        :param decode: Whether to yield decoded strings instead of zero-copy memoryviews.
+        :return: Iterator of (docno, text) tuples.
+        """
+        return self.__iter_positions(range(len(self.__documents)), decode)
+
+    def iter_query(self, query_id: str, decode: bool = True) -> Iterator[Tuple[str, Union[str, memoryview]]]:
+        """
+        Stream the documents of a single query in file order.
+
+        :param query_id: Query ID as it appears in the DOCNO.
+        :param decode: Whether to yield decoded strings instead of zero-copy memoryviews.
+        :return: Iterator of (docno, text) tuples.
+        """
+        return self.__iter_positions(self.__by_query.get(str(query_id), []), decode)
+
+    def iter_round(self, round: int, decode: bool = True) -> Iterator[Tuple[str, Union[str, memoryview]]]:
+        """
+        Stream the documents of a single round in file order.
+
+        :param round: Round number.
+        :param decode: Whether to yield decoded strings instead of zero-copy memoryviews.
+        :return: Iterator of (docno, text) tuples.
+        """
+        return self.__iter_positions(self.__by_round.get(int(round), []), decode)
+
+    def close(self) -> None:
+        """
+        Close the memory map and the underlying file.
+        """
+        if not self.__mmap.closed:
+            self.__mmap.close()
+        self.__file.close()
@@ -0,0 +1,61 @@
+from typing import Iterable
+
+from utils.logger import setup_logger
+from constants.constants import TRECTEXT_WRITER_LOG_FILE, TRECTEXT_WRITER_LOG_NAME, DEFAULT_TRECTEXT_BUFFER_SIZE
+
+
+class TrecTextWriter:
+    """
+        Class responsible for streaming documents to a TREC text file through a large write buffer,
+        so that documents can be appended round by round while the competition is running.
+    """
+
+    def __init__(self, output_file: str, append: bool = False, buffer_size: int = DEFAULT_TRECTEXT_BUFFER_SIZE):
+        """
+        Initialize the TrecTextWriter.
+
+        :param output_file: Path to the output TREC text file.
+        :param append: Whether to append to an existing file instead of truncating it.
+        :param buffer_size: Size in bytes of the write buffer.
+        """
+        self.__logger = setup_logger(TRECTEXT_WRITER_LOG_NAME, TRECTEXT_WRITER_LOG_FILE)
+        self.__output_file = output_file
+        try:
+            self.__file = open(output_file, 'a' if append else 'w', encoding="utf8", buffering=buffer_size)
+        except IOError as e:
+            self.__logger.error(f"Error opening TREC text file {output_file}: {e}")
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_documents(self, docnos: Iterable[str], documents: Iterable[str]) -> None:
+        """
+        Write documents to the file one at a time through its write buffer, so only the buffer is held in memory
+        whatever the number of documents.
+
+        :param docnos: Document IDs.
+        :param documents: Document texts, in the same order as the IDs.
+        """
+        try:
+            self.__file.writelines(f"<DOC>\n<DOCNO>{docno}</DOCNO>\n<TEXT>\n{str(document).strip()}\n</TEXT>\n"
+                                   f"</DOC>\n" for docno, document in zip(docnos, documents))
+        except Exception as e:
+            self.__logger.error(f"Error writing documents to {self.__output_file}: {e}")
+            raise
+
+    def flush(self) -> None:
+        """
+        Flush the buffered documents to disk, making them visible to readers of the file.
+        """
+        self.__file.flush()
+
+    def close(self) -> None:
+        """
+        Flush and close the file.
+        """
+        if not self.__file.closed:
+            self.__file.close()
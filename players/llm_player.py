@@ -1,8 +1,7 @@
-import pandas as pd
-
 from utils.logger import setup_logger
 from players.player import Player
 from LLMs.LLM import LLM
+from competition.feedback_index import FeedbackIndex
 from competition.prompt_manager import PromptManager
 from constants.constants import LLM_PLAYER_LOG_FILE, LLM_PLAYER_LOG_NAME
 
@@ -13,8 +12,10 @@ class LLMPlayer(Player):
         to generate documents and process feedback across rounds.
     """
 
+    __slots__ = ("prompt_manager", "__llm", "__logger", "__pairwise_feedback", "__all_feedback")
+
     def __init__(self, name: str, character: str, llm: LLM, prompt_format: str, query: str, query_id: int,
-                 init_document: str, feedback_func: callable):
+                 init_document: str, feedback_func: callable, prompt_manager: PromptManager = None):
         """
         Initialize a Player instance.
 
@@ -25,10 +26,13 @@ class LLMPlayer(Player):
         :param query_id: The ID of the query.
         :param init_document: Initial document text for the player.
         :param feedback_func: Function to generate feedback for the player.
+        :param prompt_manager: PromptManager of the prompt format, shared by the agent's players (a private one is
+                               created if not provided).
         """
         super().__init__(name, character, prompt_format, query, query_id, init_document, feedback_func)
         self.__llm = llm
-        self.prompt_manager = PromptManager(prompt_format)
+        self.prompt_manager = prompt_manager if prompt_manager is not None else PromptManager(prompt_format)
+        self.__pairwise_feedback, self.__all_feedback = None, None
         self.__logger = setup_logger(LLM_PLAYER_LOG_NAME, LLM_PLAYER_LOG_FILE)
 
     def generate_document(self, max_tokens: int, init_doc: str = None,
@@ -61,11 +65,11 @@ class LLMPlayer(Player):
             self.__logger.error(f"Error generating document: {e}")
             raise
 
-    def generate_feedback(self, feedback: pd.DataFrame) -> None:
+    def generate_feedback(self, feedback: FeedbackIndex) -> None:
         """
         Generate feedback for the next round based on the provided feedback.
 
-        :param feedback: Feedback for the current round.
+        :param feedback: FeedbackIndex of the game.
         """
         self.round += 1
         self.__pairwise_feedback, self.__all_feedback = self.feedback_func(feedback, self.name, self.round)
@@ -1,17 +1,21 @@
 from abc import ABC, abstractmethod
 
-import pandas as pd
-
+from competition.feedback_index import FeedbackIndex
 from utils.logger import setup_logger
-from constants.constants import PLAYER_LOG_FILE, PLAYER_LOG_NAME, PLAYER_HISTORY_COLUMNS
+from constants.constants import PLAYER_LOG_FILE, PLAYER_LOG_NAME
 
 
 class Player(ABC):
     """
         Abstract class representing a player in the game, responsible for
         generating documents and managing feedback across rounds.
+        A player is built for every agent and query, so its state is slotted: the strings and functions it holds are
+        shared with its agent, and its own state is its round, document and rank.
     """
 
+    __slots__ = ("name", "character", "prompt_format", "query", "query_id", "round", "document", "init_document",
+                 "rank", "feedback_func", "__logger")
+
     def __init__(self, name: str, character: str, prompt_format: str, query: str, query_id: int, init_document: str,
                  feedback_func: callable):
         """
@@ -33,7 +37,6 @@ class Player(ABC):
         self.round = 1
         self.document = None
         self.init_document = init_document
-        self.history = pd.DataFrame(columns=PLAYER_HISTORY_COLUMNS)
         self.rank = None
         self.feedback_func = feedback_func
         self.__logger = setup_logger(PLAYER_LOG_NAME, PLAYER_LOG_FILE)
@@ -99,10 +102,10 @@ class Player(ABC):
         pass
 
     @abstractmethod
-    def generate_feedback(self, feedback: pd.DataFrame) -> None:
+    def generate_feedback(self, feedback: FeedbackIndex) -> None:
         """
         Generate feedback for the next round based on the provided feedback.
 
-        :param feedback: Feedback for the current round.
+        :param feedback: FeedbackIndex of the game.
         """
         pass
@@ -3,5 +3,7 @@
 from .e5 import E5
 from .contriever import Contriever
 from .okapi import Okapi
+from .remote_ranker import RemoteRanker
+from .partitioned_ranker import PartitionedRanker
 
-__all__ = ['E5', 'Contriever', 'Okapi']
+__all__ = ['E5', 'Contriever', 'Okapi', 'RemoteRanker', 'PartitionedRanker']
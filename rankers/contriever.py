@@ -6,7 +6,7 @@ from torch.nn.functional import cosine_similarity
 
 from rankers.embedding_ranker import EmbeddingRanker
 from utils.logger import setup_logger
-from constants.constants import COMPETITION_LOG_FILE, COMPETITION_LOG_NAME
+from constants.constants import COMPETITION_LOG_FILE, COMPETITION_LOG_NAME, DEFAULT_RANKER_BATCH_SIZE
 
 
 class Contriever(EmbeddingRanker):
@@ -39,6 +39,23 @@ class Contriever(EmbeddingRanker):
         sentence_embeddings = token_embeddings.sum(dim=1) / mask.sum(dim=1)[..., None]
         return sentence_embeddings
 
+    def __encode(self, texts: List[str], batch_size: int) -> torch.Tensor:
+        """
+        Encode texts into mean-pooled embeddings, batch by batch.
+
+        :param texts: List of texts.
+        :param batch_size: Number of texts encoded together.
+        :return: Tensor of embeddings, one row per text.
+        """
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.__tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                      return_tensors='pt').to(self.device)
+            with torch.no_grad():
+                outputs = self.__model(**tokens)
+            embeddings.append(self.__mean_pooling(outputs.last_hidden_state, tokens["attention_mask"]))
+        return torch.cat(embeddings)
+
     def rank(self, query: str, documents: List[str]) -> Tuple[List[int], List[float]]:
         """
         Rank documents based on their similarity to the query.
@@ -72,3 +89,33 @@ class Contriever(EmbeddingRanker):
         except Exception as e:
             self.__logger.error(f"Error in ranking documents: {e}")
             raise
+
+    def rank_batch(self, queries_documents: List[Tuple[str, List[str]]],
+                   batch_size: int = DEFAULT_RANKER_BATCH_SIZE) -> List[Tuple[List[int], List[float]]]:
+        """
+        Rank the documents of several queries, encoding the documents of all of them in shared batches.
+
+        :param queries_documents: List of (query, documents) tuples.
+        :param batch_size: Number of texts encoded together.
+        :return: List of (ranks, scores) tuples, one per query.
+        """
+        try:
+            self.__logger.info(f"Ranking documents for {len(queries_documents)} queries in batches of {batch_size}")
+
+            # Encode the queries and the documents of every query at once
+            queries_embeddings = self.__encode([query for query, _ in queries_documents], batch_size)
+            docs_embeddings = self.__encode([doc for _, documents in queries_documents for doc in documents],
+                                            batch_size)
+
+            # Compute the similarity scores of each query's documents and rank them
+            results, offset = [], 0
+            for idx, (query, documents) in enumerate(queries_documents):
+                scores = cosine_similarity(docs_embeddings[offset:offset + len(documents)],
+                                           queries_embeddings[idx:idx + 1]).cpu().numpy()
+                results.append(super().tie_breaker(scores.flatten().tolist()))
+                offset += len(documents)
+
+            return results
+        except Exception as e:
+            self.__logger.error(f"Error in ranking documents: {e}")
+            raise
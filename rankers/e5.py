@@ -4,7 +4,7 @@ from sentence_transformers import SentenceTransformer
 
 from rankers.embedding_ranker import EmbeddingRanker
 from utils.logger import setup_logger
-from constants.constants import E5_LOG_FILE, E5_LOG_NAME
+from constants.constants import E5_LOG_FILE, E5_LOG_NAME, DEFAULT_RANKER_BATCH_SIZE
 
 
 class E5(EmbeddingRanker):
@@ -56,3 +56,36 @@ class E5(EmbeddingRanker):
         except Exception as e:
             self.__logger.error(f"Error in ranking documents: {e}")
             raise
+
+    def rank_batch(self, queries_documents: List[Tuple[str, List[str]]],
+                   batch_size: int = DEFAULT_RANKER_BATCH_SIZE) -> List[Tuple[List[int], List[float]]]:
+        """
+        Rank the documents of several queries, encoding the queries and documents of all of them in shared batches.
+
+        :param queries_documents: List of (query, documents) tuples.
+        :param batch_size: Number of texts encoded together.
+        :return: List of (ranks, scores) tuples, one per query.
+        """
+        try:
+            self.__logger.info(f"Ranking documents for {len(queries_documents)} queries in batches of {batch_size}")
+
+            # Prepare the input texts of every query, each query followed by its documents
+            input_texts = []
+            for query, documents in queries_documents:
+                input_texts.append(f"query: {query}")
+                input_texts.extend(f"passage: {doc}" for doc in documents)
+
+            # Generate the embeddings of all the texts at once
+            embeddings = self.__model.encode(input_texts, batch_size=batch_size, normalize_embeddings=True)
+
+            # Compute the similarity scores of each query's documents and rank them
+            results, offset = [], 0
+            for query, documents in queries_documents:
+                scores = embeddings[offset + 1:offset + 1 + len(documents)] @ embeddings[offset]
+                results.append(super().tie_breaker(scores.tolist()))
+                offset += 1 + len(documents)
+
+            return results
+        except Exception as e:
+            self.__logger.error(f"Error in ranking documents: {e}")
+            raise
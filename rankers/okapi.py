@@ -6,7 +6,7 @@ import ir_datasets
 
 from rankers.index_ranker import IndexRanker
 from utils.logger import setup_logger
-from constants.constants import OKAPI_RANKER_LOG_FILE, OKAPI_RANKER_LOG_NAME
+from constants.constants import OKAPI_RANKER_LOG_FILE, OKAPI_RANKER_LOG_NAME, DEFAULT_RANKER_BATCH_SIZE
 
 
 class Okapi(IndexRanker):
@@ -98,18 +98,48 @@ class Okapi(IndexRanker):
 
             # Initialize the IndexReader to read the index
             index_reader = IndexReader(self.index_path)
-
-            scores = []
-            for docno in docnos:
-                # Compute BM25 score for each document
-                bm25_score = index_reader.compute_bm25_term_weight(docno, query,
-                                                                   analyzer=get_lucene_analyzer(stemmer='krovetz'))
-                scores.append(bm25_score)
+            analyzer = get_lucene_analyzer(stemmer='krovetz')
 
             # Use the base class's tie breaker to rank documents
-            ranked_scores, scores = super().tie_breaker(scores)
+            ranked_scores, scores = super().tie_breaker(self.__score(index_reader, analyzer, query, docnos))
 
             return ranked_scores, scores
         except Exception as e:
             self.__logger.error(f"Error in ranking documents: {e}")
             raise
+
+    def rank_batch(self, queries_docnos: List[Tuple[str, List[str]]],
+                   batch_size: int = DEFAULT_RANKER_BATCH_SIZE) -> List[Tuple[List[int], List[float]]]:
+        from pyserini.index.lucene import IndexReader
+        from pyserini.analysis import get_lucene_analyzer
+        """
+        Rank the documents of several queries, sharing a single index reader and analyzer between them.
+
+        :param queries_docnos: List of (query, document IDs) tuples.
+        :param batch_size: Unused, documents are scored one by one from the index.
+        :return: List of (ranks, scores) tuples, one per query.
+        """
+        try:
+            self.__logger.info(f"Ranking documents for {len(queries_docnos)} queries")
+
+            index_reader = IndexReader(self.index_path)
+            analyzer = get_lucene_analyzer(stemmer='krovetz')
+
+            return [super().tie_breaker(self.__score(index_reader, analyzer, query, docnos))
+                    for query, docnos in queries_docnos]
+        except Exception as e:
+            self.__logger.error(f"Error in ranking documents: {e}")
+            raise
+
+    @staticmethod
+    def __score(index_reader, analyzer, query: str, docnos: List[str]) -> List[float]:
+        """
+        Compute the BM25 score of each document for the query.
+
+        :param index_reader: IndexReader of the index.
+        :param analyzer: Lucene analyzer of the index.
+        :param query: A single query string.
+        :param docnos: List of document IDs.
+        :return: List of BM25 scores.
+        """
+        return [index_reader.compute_bm25_term_weight(docno, query, analyzer=analyzer) for docno in docnos]
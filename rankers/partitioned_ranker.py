@@ -0,0 +1,45 @@
+from typing import List, Tuple
+
+from rankers.ranker import Ranker
+from utils.resources import CorePartition
+from constants.constants import DEFAULT_RANKER_BATCH_SIZE
+
+
+class PartitionedRanker(Ranker):
+    """
+        Ranker running the rankings of another ranker on a core partition of its own, so that it does not compete
+        for the cores of the models generating concurrently.
+    """
+
+    def __init__(self, model_name: str, ranker: Ranker, partition: CorePartition):
+        """
+        Initialize the PartitionedRanker.
+
+        :param model_name: The name of the model used for ranking.
+        :param ranker: Ranker scoring the documents.
+        :param partition: Core partition the rankings run on.
+        """
+        super().__init__(model_name)
+        self.__ranker = ranker
+        self.__partition = partition
+
+    def rank(self, query: str, documents: List[str]) -> Tuple[List[int], List[float]]:
+        """
+        Rank documents based on their similarity to the query, on the ranker's core partition.
+
+        :param query: A single query.
+        :param documents: List of documents.
+        :return: Ranks and scores of the documents.
+        """
+        return self.__partition.run(self.__ranker.rank, query, documents)
+
+    def rank_batch(self, queries_documents: List[Tuple[str, List[str]]],
+                   batch_size: int = DEFAULT_RANKER_BATCH_SIZE) -> List[Tuple[List[int], List[float]]]:
+        """
+        Rank the documents of several queries, on the ranker's core partition.
+
+        :param queries_documents: List of (query, documents) tuples.
+        :param batch_size: Number of texts encoded together, for rankers that batch their inputs.
+        :return: List of (ranks, scores) tuples, one per query.
+        """
+        return self.__partition.run(self.__ranker.rank_batch, queries_documents, batch_size)
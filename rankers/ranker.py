@@ -5,7 +5,9 @@ import numpy as np
 import torch
 
 from utils.logger import setup_logger
-from constants.constants import RANKER_LOG_FILE, RANKER_LOG_NAME
+from utils.metrics import get_metrics
+from constants.constants import (RANKER_LOG_FILE, RANKER_LOG_NAME, STAGE_RANKING, METRIC_RANKED_DOCUMENTS,
+                                 DEFAULT_RANKER_BATCH_SIZE)
 
 
 class Ranker(ABC):
@@ -22,6 +24,7 @@ class Ranker(ABC):
         """
         self.__model_name = model_name
         self.__logger = setup_logger(RANKER_LOG_NAME, RANKER_LOG_FILE)
+        self.__metrics = get_metrics()
         self.device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
         self.__logger.info(f"Ranker initialized with model: {model_name}")
 
@@ -36,6 +39,31 @@ class Ranker(ABC):
         """
         pass
 
+    def rank_batch(self, queries_documents: List[Tuple[str, List[str]]],
+                   batch_size: int = DEFAULT_RANKER_BATCH_SIZE) -> List[Tuple[List[int], List[float]]]:
+        """
+        Rank the documents of several queries. Rankers that can share work between queries (e.g. encode every text
+        in the same batches) override this method; by default every query is ranked on its own.
+
+        :param queries_documents: List of (query, documents) tuples.
+        :param batch_size: Number of texts encoded together, for rankers that batch their inputs.
+        :return: List of (ranks, scores) tuples, one per query.
+        """
+        return [self.rank(query, documents) for query, documents in queries_documents]
+
+    def timed_rank(self, query: str, documents: List[str]) -> Tuple[List[int], List[float]]:
+        """
+        Rank documents and record the ranking latency and the number of ranked documents in the competition metrics.
+
+        :param query: A single query string.
+        :param documents: List of documents (or document IDs for index-based rankers) to be ranked.
+        :return: Ranks and scores of the documents.
+        """
+        with self.__metrics.timer(STAGE_RANKING, ranker=self.__model_name):
+            ranks, scores = self.rank(query, documents)
+        self.__metrics.increment(METRIC_RANKED_DOCUMENTS, len(documents), ranker=self.__model_name)
+        return ranks, scores
+
     def tie_breaker(self, scores: List[float]) -> Tuple[List[int], List[float]]:
         """
         Break ties in scores by adding a small random value to each tied score.
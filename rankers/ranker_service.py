@@ -0,0 +1,242 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from rankers.contriever import Contriever
+from rankers.e5 import E5
+from utils.logger import setup_logger
+from utils.resources import pin_current_thread
+from utils.service import serve, resolve_authkey
+from constants.constants import (RANKER_SERVICE_LOG_FILE, RANKER_SERVICE_LOG_NAME, DEFAULT_RANKER_BATCH_SIZE,
+                                 DEFAULT_RANKER_SERVICE_BATCH_WINDOW, DEFAULT_RANKER_SERVICE_MAX_BATCH_QUERIES,
+                                 RANKER_SERVICE_AUTHKEY_ENV, DEFAULT_RANKER_SERVICE_PORT, LOCAL_HOST,
+                                 RANKER_SERVICE_RANK, RANKER_SERVICE_STATS)
+
+# Rankers the service can own, by ranker type (index-based rankers keep a per-competition index)
+RANKER_TYPES = {"e5": E5, "contriever": Contriever}
+
+
+class RankerService:
+    """
+        Class responsible for ranking the documents of several competitions with a single copy of each model.
+        The rank requests of a model are queued and batched across clients: a batch is closed once it holds
+        max_batch_queries queries or batch_window seconds after its first request, and all its texts are encoded
+        together by rank_batch.
+    """
+
+    def __init__(self, batch_window: float = DEFAULT_RANKER_SERVICE_BATCH_WINDOW,
+                 max_batch_queries: int = DEFAULT_RANKER_SERVICE_MAX_BATCH_QUERIES,
+                 batch_size: int = DEFAULT_RANKER_BATCH_SIZE):
+        """
+        Initialize the RankerService.
+
+        :param batch_window: Time in seconds a batch waits for other requests after its first one.
+        :param max_batch_queries: Maximum number of queries in a batch.
+        :param batch_size: Number of texts encoded together by the models.
+        """
+        self.__batch_window = batch_window
+        self.__max_batch_queries = max_batch_queries
+        self.__batch_size = batch_size
+        self.__models = {}
+        self.__stats = {}
+        self.__loading = {}
+        self.__lock = threading.Lock()
+        self.__logger = setup_logger(RANKER_SERVICE_LOG_NAME, RANKER_SERVICE_LOG_FILE)
+
+    def load(self, ranker_type: str, model_name: str) -> None:
+        """
+        Load a model and start its batching thread, unless it is already loaded. The model is loaded outside the
+        service lock, so the requests of the loaded models and the statistics are not held up meanwhile; concurrent
+        loads of the same model wait for the first one.
+
+        :param ranker_type: Type of the ranker (e.g. "e5").
+        :param model_name: Name of the model.
+        """
+        key = (ranker_type, model_name)
+        with self.__lock:
+            if key in self.__models:
+                return
+            if ranker_type not in RANKER_TYPES:
+                raise ValueError(f"Unknown ranker type {ranker_type}, the service serves: {sorted(RANKER_TYPES)}")
+            loading = self.__loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self.__lock:
+                if key in self.__models:
+                    return
+
+            ranker = RANKER_TYPES[ranker_type](model_name)
+            requests = queue.Queue()
+            thread = threading.Thread(target=self.__batch, args=(key, ranker, requests), daemon=True,
+                                      name=f"ranker-service-{ranker_type}")
+            with self.__lock:
+                self.__models[key] = (requests, thread)
+                self.__stats[key] = {"requests": 0, "batches": 0, "queries": 0, "texts": 0}
+                self.__loading.pop(key, None)
+            thread.start()
+        self.__logger.info(f"Ranker service loaded {ranker_type} model: {model_name}")
+
+    def rank(self, ranker_type: str, model_name: str, queries_documents: list) -> list:
+        """
+        Rank the documents of several queries with a model, batched with the requests of the other clients.
+
+        :param ranker_type: Type of the ranker (e.g. "e5").
+        :param model_name: Name of the model.
+        :param queries_documents: List of (query, documents) tuples.
+        :return: List of (ranks, scores) tuples, one per query.
+        """
+        self.load(ranker_type, model_name)
+        requests, _ = self.__models[(ranker_type, model_name)]
+        futures = []
+        for query, documents in queries_documents:
+            future = Future()
+            requests.put((query, documents, future))
+            futures.append(future)
+        with self.__lock:
+            self.__stats[(ranker_type, model_name)]["requests"] += 1
+        return [future.result() for future in futures]
+
+    def get_stats(self) -> dict:
+        """
+        Get the batching statistics of every model.
+
+        :return: Dictionary of the requests, batches, and mean queries and texts per batch, by ranker type and model.
+        """
+        with self.__lock:
+            return {f"{ranker_type}/{model_name}":
+                        {**stats,
+                         "mean_batch_queries": stats["queries"] / stats["batches"] if stats["batches"] else 0.0,
+                         "mean_batch_texts": stats["texts"] / stats["batches"] if stats["batches"] else 0.0}
+                    for (ranker_type, model_name), stats in self.__stats.items()}
+
+    def handle_request(self, operation: str, *args):
+        """
+        Handle a request of a RemoteRanker.
+
+        :param operation: Operation of the request ("rank" or "stats").
+        :param args: Arguments of the operation.
+        :return: Result of the operation.
+        """
+        if operation == RANKER_SERVICE_RANK:
+            return self.rank(*args)
+        if operation == RANKER_SERVICE_STATS:
+            return self.get_stats()
+        raise ValueError(f"Unknown ranker service operation: {operation}")
+
+    def close(self) -> None:
+        """
+        Stop the batching threads once the queued requests are ranked.
+        """
+        with self.__lock:
+            models = list(self.__models.values())
+            self.__models = {}
+        for requests, thread in models:
+            requests.put(None)
+            thread.join()
+        self.__logger.info(f"Ranker service closed: {self.get_stats()}")
+
+    def __batch(self, key: tuple, ranker, requests: queue.Queue) -> None:
+        """
+        Batching loop of a model: collect the requests of a batch window and rank them together.
+
+        :param key: Ranker type and model name.
+        :param ranker: Ranker of the model.
+        :param requests: Queue of (query, documents, future) requests, None to stop.
+        """
+        stopped = False
+        while not stopped:
+            request = requests.get()
+            if request is None:
+                break
+
+            batch = [request]
+            deadline = time.monotonic() + self.__batch_window
+            while len(batch) < self.__max_batch_queries:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopped = True
+                    break
+                batch.append(request)
+
+            try:
+                results = ranker.rank_batch([(query, documents) for query, documents, _ in batch], self.__batch_size)
+                for (_, _, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                self.__logger.error(f"Error ranking a batch of {len(batch)} queries: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+
+            with self.__lock:
+                stats = self.__stats[key]
+                stats["batches"] += 1
+                stats["queries"] += len(batch)
+                stats["texts"] += sum(1 + len(documents) for _, documents, _ in batch)
+
+
+def serve_rankers(service: RankerService, address: str, authkey: str = None) -> None:
+    """
+    Serve a ranker service on a local socket until interrupted.
+
+    :param service: RankerService to serve.
+    :param address: Address to listen on, as host:port.
+    :param authkey: Authentication key of the clients, the RANKER_SERVICE_AUTHKEY_ENV environment variable if not
+                    provided.
+    """
+    try:
+        serve(address, resolve_authkey(authkey, RANKER_SERVICE_AUTHKEY_ENV), service.handle_request,
+              setup_logger(RANKER_SERVICE_LOG_NAME, RANKER_SERVICE_LOG_FILE), "Ranker service")
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the embedding rankers to several competitions")
+    parser.add_argument("--address", type=str, default=f"{LOCAL_HOST}:{DEFAULT_RANKER_SERVICE_PORT}",
+                        help="Address to listen on, as host:port")
+    parser.add_argument("--ranker", type=str, nargs="*", default=[], metavar="TYPE=MODEL",
+                        help="Models to load at start (e.g. e5=intfloat/e5-large-v2), others are loaded on first use")
+    parser.add_argument("--batch_window_ms", type=float, default=1000 * DEFAULT_RANKER_SERVICE_BATCH_WINDOW,
+                        help="Time a batch waits for other requests after its first one, in milliseconds")
+    parser.add_argument("--max_batch_queries", type=int, default=DEFAULT_RANKER_SERVICE_MAX_BATCH_QUERIES,
+                        help="Maximum number of queries in a batch")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_RANKER_BATCH_SIZE,
+                        help="Number of texts encoded together")
+    parser.add_argument("--authkey", type=str, default=None,
+                        help=f"Authentication key of the clients (the {RANKER_SERVICE_AUTHKEY_ENV} environment "
+                             f"variable by default)")
+    parser.add_argument("--cores", type=str, default=None, help="Cores of the service's models (e.g. 8-11)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Torch threads of the service's models (the number of cores by default)")
+    parser.add_argument("--log_folder", type=str, default=".", help="Folder of the service logs")
+    args = parser.parse_args()
+
+    from utils.logger import set_competition_hash_folder
+    os.makedirs(args.log_folder, exist_ok=True)
+    set_competition_hash_folder(args.log_folder)
+
+    # Checked before loading the models
+    authkey = resolve_authkey(args.authkey, RANKER_SERVICE_AUTHKEY_ENV)
+
+    # The batching threads of the models inherit the cores of the main thread
+    if args.cores or args.threads:
+        pin_current_thread(args.cores, args.threads)
+
+    service = RankerService(args.batch_window_ms / 1000, args.max_batch_queries, args.batch_size)
+    for ranker in args.ranker:
+        ranker_type, _, model_name = ranker.partition("=")
+        service.load(ranker_type, model_name)
+    serve_rankers(service, args.address, authkey)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+from typing import List, Tuple
+
+from rankers.ranker import Ranker
+from utils.logger import setup_logger
+from utils.service import ServiceClient, resolve_authkey
+from constants.constants import (REMOTE_RANKER_LOG_FILE, REMOTE_RANKER_LOG_NAME, DEFAULT_RANKER_BATCH_SIZE,
+                                 RANKER_SERVICE_AUTHKEY_ENV, RANKER_SERVICE_RANK, RANKER_SERVICE_STATS)
+
+
+class RemoteRanker(Ranker):
+    """
+        Ranker client of a ranker service, which owns the model and batches the requests of every competition
+        using it.
+    """
+
+    def __init__(self, ranker_type: str, model_name: str, service: str, authkey: str = None):
+        """
+        Initialize the RemoteRanker.
+
+        :param ranker_type: Type of the ranker served (e.g. "e5").
+        :param model_name: The name of the model used for ranking.
+        :param service: Address of the ranker service, as host:port.
+        :param authkey: Authentication key of the ranker service, the RANKER_SERVICE_AUTHKEY_ENV environment variable
+                        if not provided.
+        """
+        super().__init__(model_name)
+        self.__ranker_type = ranker_type
+        self.__model_name = model_name
+        self.__client = ServiceClient(service, resolve_authkey(authkey, RANKER_SERVICE_AUTHKEY_ENV))
+        self.__logger = setup_logger(REMOTE_RANKER_LOG_NAME, REMOTE_RANKER_LOG_FILE)
+        self.__logger.info(f"Remote ranker initialized with {ranker_type} model {model_name} on service {service}")
+
+    def rank(self, query: str, documents: List[str]) -> Tuple[List[int], List[float]]:
+        """
+        Rank documents based on their similarity to the query.
+
+        :param query: A single query.
+        :param documents: List of documents.
+        :return: Ranks and scores of the documents.
+        """
+        return self.rank_batch([(query, documents)])[0]
+
+    def rank_batch(self, queries_documents: List[Tuple[str, List[str]]],
+                   batch_size: int = DEFAULT_RANKER_BATCH_SIZE) -> List[Tuple[List[int], List[float]]]:
+        """
+        Rank the documents of several queries on the service, batched with the requests of the other clients.
+
+        :param queries_documents: List of (query, documents) tuples.
+        :param batch_size: Unused, the service encodes its batches with its own batch size.
+        :return: List of (ranks, scores) tuples, one per query.
+        """
+        try:
+            return self.__client.request(RANKER_SERVICE_RANK, self.__ranker_type, self.__model_name,
+                                         [(query, list(documents)) for query, documents in queries_documents])
+        except Exception as e:
+            self.__logger.error(f"Error in ranking documents on the ranker service: {e}")
+            raise
+
+    def get_service_stats(self) -> dict:
+        """
+        Get the batching statistics of the ranker service.
+
+        :return: Dictionary of the statistics by ranker type and model.
+        """
+        return self.__client.request(RANKER_SERVICE_STATS)
@@ -1,6 +1,6 @@
 # __init__.py in utils
 
-from .logger import setup_logger
+from .logger import setup_logger, configure_logging, shutdown_logging
 from .utils import create_competition_folder
 
-__all__ = ['setup_logger', 'create_competition_folder']
+__all__ = ['setup_logger', 'configure_logging', 'shutdown_logging', 'create_competition_folder']
@@ -0,0 +1,167 @@
+import difflib
+import json
+import re
+
+from constants.constants import (DELTA_FULL_MARKER, DELTA_SAME_MARKER, DELTA_DIFF_MARKER,
+                                 DEFAULT_DELTA_KEYFRAME_INTERVAL)
+
+TOKEN_PATTERN = re.compile(r'\S+\s*|\s+')
+
+
+def tokenize(document: str) -> list:
+    """
+    Split a document into tokens of a word and its trailing whitespace (leading whitespace is a token of its own), so
+    that joining the tokens gives back the document. Keeping the whitespace with the words, rather than as tokens
+    repeated all over the document, keeps the diff fast.
+
+    :param document: Document text.
+    :return: List of tokens.
+    """
+    return TOKEN_PATTERN.findall(document)
+
+
+def encode_delta(base: str, document: str) -> str:
+    """
+    Encode a document relative to a base document.
+    The result is a reference marker when the texts are equal, a list of copy ranges and inserted text when the
+    delta is smaller than the document, and the full document otherwise.
+
+    :param base: Base document (the same player's document in the previous round), or None.
+    :param document: Document to encode.
+    :return: Encoded document.
+    """
+    if document is None:
+        return None
+    if base is None:
+        return DELTA_FULL_MARKER + document
+    if document == base:
+        return DELTA_SAME_MARKER
+
+    base_tokens, tokens = tokenize(base), tokenize(document)
+    matcher = difflib.SequenceMatcher(None, base_tokens, tokens, autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append("".join(tokens[j1:j2]))
+
+    delta = DELTA_DIFF_MARKER + json.dumps(ops, separators=(",", ":"), ensure_ascii=False)
+    return delta if len(delta) < len(document) else DELTA_FULL_MARKER + document
+
+
+def decode_delta(base: str, encoded: str) -> str:
+    """
+    Materialize a document from its encoding and its base document.
+
+    :param base: Base document the encoding was made against.
+    :param encoded: Encoded document.
+    :return: Document text.
+    """
+    if encoded is None:
+        return None
+    marker, payload = encoded[:1], encoded[1:]
+    if marker == DELTA_FULL_MARKER:
+        return payload
+    if marker == DELTA_SAME_MARKER:
+        return base
+    if marker == DELTA_DIFF_MARKER:
+        base_tokens = tokenize(base)
+        return "".join("".join(base_tokens[op[0]:op[1]]) if isinstance(op, list) else op
+                       for op in json.loads(payload))
+    raise ValueError(f"Unknown document encoding marker: {marker!r}")
+
+
+class DocumentStore:
+    """
+        Class responsible for storing every round of a player's document as a delta against the previous round.
+        Documents are materialized lazily on read; the latest document of each key is kept in full.
+    """
+
+    def __init__(self, keyframe_interval: int = DEFAULT_DELTA_KEYFRAME_INTERVAL):
+        """
+        Initialize the DocumentStore.
+
+        :param keyframe_interval: Maximum number of deltas between two fully stored documents of the same key,
+                                  bounding the work needed to materialize an old round.
+        """
+        self.__keyframe_interval = keyframe_interval
+        self.__entries = {}
+        self.__positions = {}
+        self.__tips = {}
+
+    def __len__(self) -> int:
+        return len(self.__positions)
+
+    def __contains__(self, key_round: tuple) -> bool:
+        return key_round in self.__positions
+
+    def put(self, key, round: int, document: str) -> str:
+        """
+        Store a document for a key (for example a (query ID, player) pair) and round.
+        Rounds of the same key must be stored in increasing order.
+
+        :param key: Hashable key identifying the document's owner.
+        :param round: Round number.
+        :param document: Document text.
+        :return: The stored encoding.
+        """
+        base, chain = self.__tips.get(key, (None, 0))
+        if chain >= self.__keyframe_interval:
+            base = None
+
+        encoded = encode_delta(base, document)
+        if encoded is not None and encoded[:1] == DELTA_FULL_MARKER:
+            chain = 0
+        else:
+            chain += 1
+
+        self.put_encoded(key, round, encoded)
+        self.__tips[key] = (document if document is not None else base, chain)
+        return encoded
+
+    def put_encoded(self, key, round: int, encoded: str) -> None:
+        """
+        Store an already encoded document without materializing it.
+
+        :param key: Hashable key identifying the document's owner.
+        :param round: Round number.
+        :param encoded: Encoded document, relative to the previous document stored for the key.
+        """
+        entries = self.__entries.setdefault(key, [])
+        self.__positions[(key, round)] = len(entries)
+        entries.append(encoded)
+        self.__tips.pop(key, None)
+
+    def get(self, key, round: int) -> str:
+        """
+        Materialize the document of a key in a given round.
+
+        :param key: Hashable key identifying the document's owner.
+        :param round: Round number.
+        :return: Document text.
+        """
+        position = self.__positions[(key, round)]
+        entries = self.__entries[key]
+        if position == len(entries) - 1 and key in self.__tips and entries[position] is not None:
+            return self.__tips[key][0]
+
+        start = position
+        while start > 0 and (entries[start] is None or entries[start][:1] != DELTA_FULL_MARKER):
+            start -= 1
+
+        document = None
+        for encoded in entries[start:position + 1]:
+            decoded = decode_delta(document, encoded)
+            document = decoded if decoded is not None else document
+        return document if entries[position] is not None else None
+
+    def get_encoded(self, key, round: int) -> str:
+        """
+        Get the stored encoding of a key's document in a given round.
+
+        :param key: Hashable key identifying the document's owner.
+        :param round: Round number.
+        :return: Encoded document.
+        """
+        return self.__entries[key][self.__positions[(key, round)]]
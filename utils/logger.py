@@ -1,25 +1,208 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
 
-from constants.constants import LOGS_FOLDER
+from constants.constants import (LOGS_FOLDER, LOG_FORMAT, CONFIG_LOGGING_ASYNC_HEADER, CONFIG_LOGGING_LEVEL_HEADER,
+                                 CONFIG_LOGGING_LEVELS_HEADER, CONFIG_LOGGING_SAMPLING_HEADER,
+                                 CONFIG_LOGGING_JSON_HEADER, CONFIG_LOGGING_CONSOLE_HEADER)
+
+# Loggers created so far, by name, so repeated lookups skip path handling entirely
+LOGGERS = {}
+
+# Log file and level of the loggers whose handlers were set up here, by name, to bind them again when the logging
+# settings or the competition folder change
+LOGGER_SETTINGS = {}
+
+# Log folders already created
+LOG_FOLDERS = set()
+
+# Logging settings, see configure_logging
+LOGGING_CONFIG = {CONFIG_LOGGING_ASYNC_HEADER: False, CONFIG_LOGGING_LEVEL_HEADER: logging.INFO,
+                  CONFIG_LOGGING_LEVELS_HEADER: {}, CONFIG_LOGGING_SAMPLING_HEADER: {},
+                  CONFIG_LOGGING_JSON_HEADER: False, CONFIG_LOGGING_CONSOLE_HEADER: True}
+
+# Background writer of the asynchronous mode
+LOG_QUEUE = None
+LOG_LISTENER = None
+
+
+# Output folder of the competition, the log files are written to its logs folder
+COMPETITION_HASH_FOLDER = None
 
 
 def set_competition_hash_folder(output_folder):
     global COMPETITION_HASH_FOLDER
+    changed = output_folder != COMPETITION_HASH_FOLDER
     COMPETITION_HASH_FOLDER = output_folder
+    if changed:
+        rebind_loggers()
+
 
-def setup_logger(name, log_file, level=logging.INFO) -> logging.Logger:
+def get_competition_hash_folder() -> str:
     """
-    Function to set up a logger; it can log to both file and console.
+    Get the output folder of the competition, set by set_competition_hash_folder.
 
-    :param name: Name of the logger.
-    :param log_file: Path to the log file.
-    :param level: Logging level.
-    :return: Custom logger.
+    :return: Path to the output folder of the competition.
     """
+    return COMPETITION_HASH_FOLDER
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+        Formatter writing every record as a single JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": self.formatTime(record), "logger": record.name, "level": record.levelname,
+                 "file": record.filename, "line": record.lineno, "message": record.getMessage()}
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
 
-    # Create a custom logger
-    logger = logging.getLogger(name)
+
+class SamplingFilter(logging.Filter):
+    """
+        Filter keeping a fixed fraction of the records below WARNING; warnings and errors always pass.
+        Sampling is deterministic (every n-th record for a rate of 1/n), so runs stay reproducible.
+    """
+
+    def __init__(self, rate: float):
+        """
+        Initialize the filter.
+
+        :param rate: Fraction of the records to keep, between 0 and 1.
+        """
+        super().__init__()
+        self.__rate = rate
+        self.__credit = 0.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        self.__credit += self.__rate
+        if self.__credit >= 1.0:
+            self.__credit -= 1.0
+            return True
+        return False
+
+
+class LogFileRouter(logging.Handler):
+    """
+        Handler of the background writer, routing every record to the file of the logger that emitted it
+        (and to the console), with one open file handler per log file.
+    """
+
+    def __init__(self, json_lines: bool, console: bool):
+        """
+        Initialize the router.
+
+        :param json_lines: Whether to write the log files as JSON lines.
+        :param console: Whether to also write the records to the console.
+        """
+        super().__init__()
+        self.__formatter = JsonLinesFormatter() if json_lines else logging.Formatter(LOG_FORMAT)
+        self.__console = logging.StreamHandler() if console else None
+        if self.__console:
+            self.__console.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.__files = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        log_file = getattr(record, "log_file", None)
+        if log_file is not None:
+            if log_file not in self.__files:
+                self.__files[log_file] = logging.FileHandler(log_file)
+                self.__files[log_file].setFormatter(self.__formatter)
+            self.__files[log_file].handle(record)
+        if self.__console:
+            self.__console.handle(record)
+
+    def close(self) -> None:
+        for handler in self.__files.values():
+            handler.close()
+        self.__files.clear()
+        super().close()
+
+
+class LogFileTagger(logging.Filter):
+    """
+        Filter tagging every record with the log file of its logger, used by the background writer to route it.
+    """
+
+    def __init__(self, log_file: str):
+        super().__init__()
+        self.__log_file = log_file
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.log_file = self.__log_file
+        return True
+
+
+def configure_logging(config: dict = None) -> None:
+    """
+    Configure the logging of the competition. Must be called before the components are created.
+
+    :param config: Dictionary of logging settings:
+                   - async: Whether to hand records to a queue drained by a single background writer.
+                   - level: Default logging level.
+                   - levels: Dictionary of logging levels by logger name.
+                   - sampling: Dictionary of the fraction of records below WARNING to keep, by logger name.
+                   - json: Whether to write the log files as JSON lines.
+                   - console: Whether to also write the records to the console.
+    """
+    global LOG_QUEUE, LOG_LISTENER
+
+    shutdown_logging(rebind=False)
+    LOGGING_CONFIG.update(config or {})
+
+    if LOGGING_CONFIG[CONFIG_LOGGING_ASYNC_HEADER]:
+        LOG_QUEUE = queue.SimpleQueue()
+        LOG_LISTENER = logging.handlers.QueueListener(
+            LOG_QUEUE, LogFileRouter(LOGGING_CONFIG[CONFIG_LOGGING_JSON_HEADER],
+                                     LOGGING_CONFIG[CONFIG_LOGGING_CONSOLE_HEADER]))
+        LOG_LISTENER.start()
+    rebind_loggers()
+
+
+def shutdown_logging(rebind: bool = True) -> None:
+    """
+    Flush the pending records and stop the background writer, if running. The loggers handing their records to it
+    then write to their log files directly.
+
+    :param rebind: Whether to bind the loggers to their log files again after stopping the background writer.
+    """
+    global LOG_QUEUE, LOG_LISTENER
+
+    if LOG_LISTENER is not None:
+        LOG_LISTENER.stop()
+        for handler in LOG_LISTENER.handlers:
+            handler.close()
+        LOG_QUEUE, LOG_LISTENER = None, None
+        if rebind:
+            rebind_loggers()
+
+
+atexit.register(shutdown_logging)
+
+
+def bind_logger(logger: logging.Logger, log_file: str, level: int = None) -> None:
+    """
+    Replace the handlers and filters of a logger with the ones of the current logging settings, writing to its log
+    file in the logs folder of the current competition.
+
+    :param logger: Logger to bind.
+    :param log_file: Name of the log file.
+    :param level: Logging level, used unless configure_logging set a level for the logger.
+    """
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    for logger_filter in list(logger.filters):
+        logger.removeFilter(logger_filter)
 
     # Path to the log folder
     log_folder = os.path.join(COMPETITION_HASH_FOLDER, LOGS_FOLDER)
@@ -28,28 +211,78 @@ def setup_logger(name, log_file, level=logging.INFO) -> logging.Logger:
     log_file = os.path.join(log_folder, log_file)
 
     # Create a log folder if it does not exist
-    os.makedirs(os.path.join(COMPETITION_HASH_FOLDER, os.path.dirname(log_file)), exist_ok=True)
+    if log_folder not in LOG_FOLDERS:
+        os.makedirs(os.path.join(COMPETITION_HASH_FOLDER, os.path.dirname(log_file)), exist_ok=True)
+        LOG_FOLDERS.add(log_folder)
 
-    # Check if the logger has handlers, to prevent adding duplicate handlers
-    if not logger.hasHandlers():
-        # Set the logging level
-        logger.setLevel(level)
+    # Set the logging level
+    levels = LOGGING_CONFIG[CONFIG_LOGGING_LEVELS_HEADER]
+    if logger.name in levels:
+        level = levels[logger.name]
+    elif level is None:
+        level = LOGGING_CONFIG[CONFIG_LOGGING_LEVEL_HEADER]
+    logger.setLevel(level)
 
+    # Keep a fraction of the low-level records of noisy components
+    sampling = LOGGING_CONFIG[CONFIG_LOGGING_SAMPLING_HEADER]
+    if logger.name in sampling and sampling[logger.name] < 1:
+        logger.addFilter(SamplingFilter(sampling[logger.name]))
+
+    if LOG_QUEUE is not None:
+        # Hand the records to the background writer, which routes them to the log file
+        queue_handler = logging.handlers.QueueHandler(LOG_QUEUE)
+        queue_handler.addFilter(LogFileTagger(log_file))
+        logger.addHandler(queue_handler)
+    else:
         # Create handlers
-        console_handler = logging.StreamHandler()
-        file_handler = logging.FileHandler(log_file)
+        handlers = [logging.FileHandler(log_file, delay=True)]
+        if LOGGING_CONFIG[CONFIG_LOGGING_CONSOLE_HEADER]:
+            handlers.append(logging.StreamHandler())
 
         # Define format to include time, folder, file name, line number, and message
-        formatter = logging.Formatter(
-            '%(asctime)s - %(pathname)s - %(filename)s - %(lineno)d - %(levelname)s - %(message)s'
-        )
+        formatter = logging.Formatter(LOG_FORMAT)
+
+        # Set the formatter for the handlers and add them to the logger
+        for handler in handlers:
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+        if LOGGING_CONFIG[CONFIG_LOGGING_JSON_HEADER]:
+            handlers[0].setFormatter(JsonLinesFormatter())
+
+
+def rebind_loggers() -> None:
+    """
+    Bind the loggers set up so far again, so they follow the current logging settings and competition folder
+    instead of writing to the handlers (and background writer) they were first given.
+    """
+    if COMPETITION_HASH_FOLDER is None:
+        return
+    for name, (log_file, level) in LOGGER_SETTINGS.items():
+        bind_logger(LOGGERS[name], log_file, level)
+
+
+def setup_logger(name, log_file, level=None) -> logging.Logger:
+    """
+    Function to set up a logger; it can log to both file and console.
 
-        # Set the formatter for both console and file handlers
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
+    :param name: Name of the logger.
+    :param log_file: Path to the log file.
+    :param level: Logging level, used unless configure_logging set a level for the logger (the configured default
+                  level if None).
+    :return: Custom logger.
+    """
+
+    # Loggers are set up once, later calls are a dictionary lookup
+    if name in LOGGERS:
+        return LOGGERS[name]
 
-        # Add handlers to the logger
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+    # Create a custom logger
+    logger = logging.getLogger(name)
+
+    # Check if the logger has handlers, to prevent adding duplicate handlers
+    if not logger.hasHandlers():
+        bind_logger(logger, log_file, level)
+        LOGGER_SETTINGS[name] = (log_file, level)
 
+    LOGGERS[name] = logger
     return logger
@@ -0,0 +1,302 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from constants.constants import (LATENCY_BUCKETS, METRICS_PROMETHEUS_PREFIX, METRICS_FILE_NAME,
+                                 METRICS_ROUNDS_FILE_NAME, METRICS_PROMETHEUS_FILE_NAME, STAGE_ROUND, STAGE_GENERATION,
+                                 STAGE_CLEANING, METRIC_COMPLETION_TOKENS, METRIC_DOCUMENTS)
+
+# Labels inherited by every observation made in the current context (e.g. the agent generating a document)
+CONTEXT_LABELS = contextvars.ContextVar("metrics_labels", default=())
+
+
+class Histogram:
+    """
+        A latency histogram with fixed, Prometheus-style cumulative buckets.
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        :param buckets: Upper bounds of the buckets, in seconds.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Record a value.
+
+        :param value: Observed value, in seconds.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add the observations of another histogram with the same buckets.
+
+        :param other: Histogram to merge.
+        """
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def cumulative_counts(self) -> list:
+        """
+        Get the cumulative bucket counts, the last one being the +Inf bucket.
+
+        :return: List of cumulative counts.
+        """
+        counts, total = [], 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def to_dict(self) -> dict:
+        """
+        Summarize the histogram.
+
+        :return: Dictionary with the count, sum, mean, max and cumulative bucket counts.
+        """
+        return {"count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else 0.0,
+                "max": self.max,
+                "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.cumulative_counts()))}
+
+
+class MetricsRegistry:
+    """
+        Class responsible for collecting the performance metrics of a competition: per-stage latency histograms and
+        counters (tokens, documents), labelled by agent, model or ranker. Metrics are kept both for the current round
+        and for the whole run. Every round's summary is appended to a JSON-lines file once, and the run totals are
+        written to a JSON file and to a Prometheus text-format file, so writing costs the same in every round.
+        A disabled registry ignores every observation.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty, disabled registry.
+        """
+        self.enabled = False
+        self.__lock = threading.Lock()
+        self.__round_histograms, self.__total_histograms = {}, {}
+        self.__round_counters, self.__total_counters = {}, {}
+        self.__rounds = []
+        self.__rounds_files = set()
+
+    def __reduce__(self):
+        # Components sent to another process (e.g. a shard worker) record to that process's registry
+        return get_metrics, ()
+
+    def enable(self, enabled: bool = True) -> None:
+        """
+        Enable or disable the collection of metrics.
+
+        :param enabled: Whether to collect metrics.
+        """
+        self.enabled = enabled
+
+    @staticmethod
+    def __key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted({**dict(CONTEXT_LABELS.get()), **labels}.items()))
+
+    @contextmanager
+    def labels(self, **labels):
+        """
+        Context manager adding labels to every observation made inside it.
+
+        :param labels: Labels to add.
+        """
+        token = CONTEXT_LABELS.set(tuple({**dict(CONTEXT_LABELS.get()), **labels}.items()))
+        try:
+            yield
+        finally:
+            CONTEXT_LABELS.reset(token)
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """
+        Context manager recording the latency of a stage.
+
+        :param stage: Name of the stage.
+        :param labels: Labels of the observation.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        """
+        Record the latency of a stage.
+
+        :param stage: Name of the stage.
+        :param seconds: Latency in seconds.
+        :param labels: Labels of the observation.
+        """
+        if not self.enabled:
+            return
+        key = self.__key(stage, labels)
+        with self.__lock:
+            for histograms in (self.__round_histograms, self.__total_histograms):
+                histograms.setdefault(key, Histogram()).observe(seconds)
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increment a counter.
+
+        :param name: Name of the counter.
+        :param value: Value to add.
+        :param labels: Labels of the counter.
+        """
+        if not self.enabled:
+            return
+        key = self.__key(name, labels)
+        with self.__lock:
+            for counters in (self.__round_counters, self.__total_counters):
+                counters[key] = counters.get(key, 0) + value
+
+    @staticmethod
+    def __summarize(histograms: dict, counters: dict) -> dict:
+        """
+        Summarize histograms and counters by stage and by agent, with the derived throughputs.
+
+        :param histograms: Dictionary of histograms by key.
+        :param counters: Dictionary of counters by key.
+        :return: Dictionary with the stages, agents and counters summaries.
+        """
+        stages = {}
+        for (stage, _), histogram in histograms.items():
+            stages.setdefault(stage, Histogram()).merge(histogram)
+
+        agents = {}
+        for (name, labels), value in counters.items():
+            agent = dict(labels).get("agent")
+            if agent is not None:
+                agent_summary = agents.setdefault(agent, {})
+                agent_summary[name] = agent_summary.get(name, 0) + value
+        for (stage, labels), histogram in histograms.items():
+            agent = dict(labels).get("agent")
+            if agent is not None and stage in (STAGE_GENERATION, STAGE_CLEANING):
+                agent_summary = agents.setdefault(agent, {})
+                seconds = f"{stage}_seconds"
+                agent_summary[seconds] = agent_summary.get(seconds, 0.0) + histogram.sum
+        for agent_summary in agents.values():
+            seconds = agent_summary.get(f"{STAGE_GENERATION}_seconds", 0.0)
+            agent_summary["tokens_per_second"] = \
+                agent_summary.get(METRIC_COMPLETION_TOKENS, 0) / seconds if seconds else 0.0
+
+        totals = {}
+        for (name, _), value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+        wall_time = stages[STAGE_ROUND].sum if STAGE_ROUND in stages else 0.0
+
+        return {"wall_time_seconds": wall_time,
+                "documents_per_second": totals.get(METRIC_DOCUMENTS, 0) / wall_time if wall_time else 0.0,
+                "stages": {stage: histogram.to_dict() for stage, histogram in stages.items()},
+                "agents": agents, "counters": totals}
+
+    def end_round(self, round_number: int, **info) -> dict:
+        """
+        Close the current round: summarize its metrics and start a new round. The summary is kept until the next
+        write.
+
+        :param round_number: Number of the round.
+        :param info: Additional information to store with the round (e.g. the query ID in game-by-game mode).
+        :return: Summary of the round.
+        """
+        with self.__lock:
+            summary = {"round": round_number, **info,
+                       **self.__summarize(self.__round_histograms, self.__round_counters)}
+            self.__rounds.append(summary)
+            self.__round_histograms, self.__round_counters = {}, {}
+        return summary
+
+    def write(self, output_folder: str) -> None:
+        """
+        Append the rounds closed since the last write to the rounds file (started over on the first write of the
+        process), and write the run totals to metrics.json and to a Prometheus text-format file. The totals files are
+        replaced atomically, so they can be scraped while the competition is running.
+
+        :param output_folder: Path to the output folder.
+        """
+        with self.__lock:
+            rounds, self.__rounds = self.__rounds, []
+            metrics = {"total": self.__summarize(self.__total_histograms, self.__total_counters)}
+            prometheus = self.__to_prometheus()
+
+        rounds_path = os.path.join(output_folder, METRICS_ROUNDS_FILE_NAME)
+        with open(rounds_path, "a" if rounds_path in self.__rounds_files else "w", encoding="utf8") as file:
+            file.writelines(json.dumps(summary) + "\n" for summary in rounds)
+        self.__rounds_files.add(rounds_path)
+
+        self.__replace(os.path.join(output_folder, METRICS_FILE_NAME), json.dumps(metrics, indent=4))
+        self.__replace(os.path.join(output_folder, METRICS_PROMETHEUS_FILE_NAME), prometheus)
+
+    def __to_prometheus(self) -> str:
+        """
+        Render the run totals in the Prometheus text exposition format.
+
+        :return: Text of the metrics.
+        """
+        def format_labels(labels: tuple, extra: tuple = ()) -> str:
+            labels = labels + extra
+            return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}" if labels else ""
+
+        def escape(value) -> str:
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        lines = [f"# TYPE {METRICS_PROMETHEUS_PREFIX}_stage_latency_seconds histogram"]
+        for (stage, labels), histogram in sorted(self.__total_histograms.items()):
+            labels = (("stage", stage),) + labels
+            metric = f"{METRICS_PROMETHEUS_PREFIX}_stage_latency_seconds"
+            for bound, count in zip([str(bound) for bound in histogram.buckets] + ["+Inf"],
+                                    histogram.cumulative_counts()):
+                lines.append(f"{metric}_bucket{format_labels(labels, (('le', bound),))} {count}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {histogram.sum}")
+            lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+
+        for name in sorted({name for name, _ in self.__total_counters}):
+            metric = f"{METRICS_PROMETHEUS_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(self.__total_counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __replace(path: str, text: str) -> None:
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf8") as file:
+            file.write(text)
+        os.replace(temporary_path, path)
+
+
+# Registry shared by every component of the process
+METRICS = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Get the metrics registry of the process.
+
+    :return: MetricsRegistry shared by every component.
+    """
+    return METRICS
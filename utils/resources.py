@@ -0,0 +1,142 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger import setup_logger
+from constants.constants import RESOURCES_LOG_FILE, RESOURCES_LOG_NAME
+
+# Torch intra-op thread count last set by pin_current_thread, shared by every thread of the process
+TORCH_THREADS = None
+
+
+def available_cores() -> list:
+    """
+    Get the cores the current process may run on.
+
+    :return: Sorted list of core IDs.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cores(cores) -> list:
+    """
+    Parse a core set, given as a list of core IDs or as a string of IDs and ranges (e.g. "0-3,8").
+
+    :param cores: Core set to parse.
+    :return: Sorted list of core IDs.
+    """
+    if isinstance(cores, int):
+        return [cores]
+    if not isinstance(cores, str):
+        return sorted({int(core) for core in cores})
+
+    parsed = set()
+    for part in cores.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        parsed.update(range(int(first), int(last or first) + 1))
+    return sorted(parsed)
+
+
+def split_cores(parts: int, cores: list = None) -> list:
+    """
+    Split a core set into contiguous slices of (nearly) equal sizes, one per part. When there are fewer cores than
+    parts, the parts share the cores round-robin.
+
+    :param parts: Number of slices.
+    :param cores: Cores to split (the available cores if not provided).
+    :return: List of core lists, one per part.
+    """
+    cores = available_cores() if cores is None else parse_cores(cores)
+    if len(cores) < parts:
+        return [[cores[part % len(cores)]] for part in range(parts)]
+    size, remainder = divmod(len(cores), parts)
+    slices, start = [], 0
+    for part in range(parts):
+        end = start + size + (part < remainder)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+def pin_current_thread(cores=None, threads: int = None) -> None:
+    """
+    Pin the current thread to a core set and set the torch intra-op thread count. Threads started afterwards by the
+    current thread (e.g. the OpenMP workers of torch) inherit the core set. The core set is per thread, but the torch
+    thread count is process-wide: when several threads are pinned with different counts, the last one applies to all
+    of them (a warning is logged), so the threads of core sets of different sizes should be run in separate processes
+    (e.g. a generation server or a ranker service) to size each pool to its cores.
+
+    :param cores: Core set, as a list of core IDs or a string of IDs and ranges (all cores if not provided).
+    :param threads: Number of torch intra-op threads (the number of cores of the core set if not provided).
+    """
+    logger = setup_logger(RESOURCES_LOG_NAME, RESOURCES_LOG_FILE)
+    cores = parse_cores(cores) if cores is not None else None
+    if cores:
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, cores)
+            except OSError as e:
+                logger.error(f"Error pinning thread to cores {cores}: {e}")
+                raise
+        else:
+            logger.warning("Core pinning is not supported on this platform, only the thread count is set")
+
+    global TORCH_THREADS
+    threads = threads or (len(cores) if cores else None)
+    if threads:
+        import torch
+        if TORCH_THREADS is not None and TORCH_THREADS != threads:
+            logger.warning(f"Torch intra-op threads are process-wide: {threads} threads replace the {TORCH_THREADS} "
+                           f"set for another thread")
+        torch.set_num_threads(threads)
+        TORCH_THREADS = threads
+    logger.info(f"Thread pinned to cores: {cores or 'all'}, torch threads: {threads or 'default'}")
+
+
+class CorePartition:
+    """
+        Dedicated thread pinned to a core set, running the calls of a model so that models running concurrently do
+        not share (and oversubscribe) the same cores. The calls are run one at a time, in the order they are made.
+        The torch thread count is process-wide (see pin_current_thread), so partitions of one process should use
+        the same number of threads.
+    """
+
+    def __init__(self, name: str, cores=None, threads: int = None):
+        """
+        Initialize the CorePartition.
+
+        :param name: Name of the partition (e.g. the agent or ranker using it).
+        :param cores: Core set, as a list of core IDs or a string of IDs and ranges (all cores if not provided).
+        :param threads: Number of torch intra-op threads (the number of cores of the core set if not provided).
+        """
+        self.name = name
+        self.cores = parse_cores(cores) if cores is not None else None
+        self.threads = threads or (len(self.cores) if self.cores else None)
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"partition-{name}",
+                                             initializer=pin_current_thread, initargs=(self.cores, self.threads))
+        self.__logger = setup_logger(RESOURCES_LOG_NAME, RESOURCES_LOG_FILE)
+        self.__logger.info(f"Core partition {name} created with cores: {self.cores or 'all'}, "
+                           f"threads: {self.threads or 'default'}")
+
+    def run(self, function: callable, *args, **kwargs):
+        """
+        Run a function on the partition's thread and wait for its result.
+
+        :param function: Function to run.
+        :param args: Positional arguments of the function.
+        :param kwargs: Keyword arguments of the function.
+        :return: Result of the function.
+        """
+        # The call runs in a copy of the caller's context, to keep its metrics labels
+        return self.__executor.submit(contextvars.copy_context().run, function, *args, **kwargs).result()
+
+    def close(self) -> None:
+        """
+        Stop the partition's thread once its calls are done.
+        """
+        self.__executor.shutdown()
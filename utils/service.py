@@ -0,0 +1,130 @@
+import ipaddress
+import os
+import socket
+import threading
+from multiprocessing.connection import Listener, Client
+
+from constants.constants import (LOCAL_HOST, SERVICE_BACKLOG, SERVICE_OK, SERVICE_ERROR,
+                                 SERVICE_MIN_REMOTE_AUTHKEY_LENGTH)
+
+
+def parse_address(address: str) -> tuple:
+    """
+    Parse a host:port address, the host defaulting to the local host.
+
+    :param address: Address as host:port or port.
+    :return: Tuple of the host and port.
+    """
+    host, _, port = str(address).rpartition(":")
+    return host or LOCAL_HOST, int(port)
+
+
+def resolve_authkey(authkey: str, environment_variable: str) -> str:
+    """
+    Get the authentication key of a service: the given key, or else the value of an environment variable. There is
+    no default key, since the service unpickles the requests of every client that authenticates.
+
+    :param authkey: Authentication key, or None to read the environment variable.
+    :param environment_variable: Name of the environment variable holding the key.
+    :return: Authentication key.
+    """
+    authkey = authkey or os.environ.get(environment_variable)
+    if not authkey:
+        raise ValueError(f"No authentication key given: pass one or set the {environment_variable} "
+                         f"environment variable")
+    return authkey
+
+
+def is_loopback(host: str) -> bool:
+    """
+    Check whether a host resolves to a loopback address.
+
+    :param host: Host name or IP address.
+    :return: True if the host is a loopback address, False otherwise.
+    """
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+class ServiceClient:
+    """
+        Client of a service listening on a local socket. Every thread uses a connection of its own, so the requests
+        of concurrent threads reach the service together.
+    """
+
+    def __init__(self, address: str, authkey: str):
+        """
+        Initialize the ServiceClient.
+
+        :param address: Address of the service, as host:port.
+        :param authkey: Authentication key of the service.
+        """
+        self.address = parse_address(address)
+        self.__authkey = authkey.encode()
+        self.__local = threading.local()
+
+    def request(self, *request):
+        """
+        Send a request to the service and wait for its result.
+
+        :param request: Arguments of the request.
+        :return: Result of the request.
+        """
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            connection = self.__local.connection = Client(self.address, authkey=self.__authkey)
+        try:
+            connection.send(request)
+            status, result = connection.recv()
+        except (EOFError, OSError):
+            self.__local.connection = None
+            raise
+        if status != SERVICE_OK:
+            raise RuntimeError(result)
+        return result
+
+
+def serve(address: str, authkey: str, handle_request: callable, logger, name: str) -> None:
+    """
+    Serve requests on a local socket until interrupted. Every connection is handled by a thread of its own, so the
+    requests of all the clients are handled concurrently. Requests are unpickled, so an authenticated client can run
+    code in the service: listening on a non-loopback address requires a secret key of at least
+    SERVICE_MIN_REMOTE_AUTHKEY_LENGTH characters.
+
+    :param address: Address to listen on, as host:port.
+    :param authkey: Authentication key of the clients.
+    :param handle_request: Function called with the arguments of a request, returning its result.
+    :param logger: Logger of the service.
+    :param name: Name of the service, for the logs.
+    """
+    def handle(connection) -> None:
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    connection.send((SERVICE_OK, handle_request(*request)))
+                except Exception as e:
+                    connection.send((SERVICE_ERROR, f"{type(e).__name__}: {e}"))
+
+    host, port = parse_address(address)
+    if not is_loopback(host) and len(authkey or "") < SERVICE_MIN_REMOTE_AUTHKEY_LENGTH:
+        raise ValueError(f"Refusing to listen on the non-loopback address {address} of the {name} without a secret "
+                         f"authentication key of at least {SERVICE_MIN_REMOTE_AUTHKEY_LENGTH} characters")
+
+    # Every thread of every client opens a connection, so they can arrive together
+    with Listener((host, port), backlog=SERVICE_BACKLOG, authkey=authkey.encode()) as listener:
+        logger.info(f"{name} listening on {address}")
+        while True:
+            try:
+                connection = listener.accept()
+            except KeyboardInterrupt:
+                break
+            except Exception as e:
+                logger.warning(f"Rejected {name} connection: {e}")
+                continue
+            threading.Thread(target=handle, args=(connection,), daemon=True).start()